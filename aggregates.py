@@ -0,0 +1,125 @@
+"""
+SmartQuiz - Incrementally maintained dashboard aggregates
+student_quiz_stats, quiz_stats and daily_activity are updated in the same
+transaction as every results insert, so dashboards read a handful of rows
+instead of scanning the whole results table.
+
+Backfill / repair:
+    flask --app app rebuild-aggregates
+"""
+
+PLACEHOLDER = {'mysql': '%s', 'sqlite': '?'}
+
+# Upsert syntax differs: MySQL uses ON DUPLICATE KEY, SQLite uses ON CONFLICT ... excluded
+_UPSERTS = {
+    'mysql': [
+        '''INSERT INTO student_quiz_stats
+               (user_id, quiz_id, attempts, rated_attempts, total_score, total_questions, ratio_sum, best_ratio, last_attempt_at)
+           VALUES ({ph}, {ph}, 1, {ph}, {ph}, {ph}, {ph}, {ph}, CURRENT_TIMESTAMP)
+           ON DUPLICATE KEY UPDATE
+               attempts = attempts + 1,
+               rated_attempts = rated_attempts + VALUES(rated_attempts),
+               total_score = total_score + VALUES(total_score),
+               total_questions = total_questions + VALUES(total_questions),
+               ratio_sum = ratio_sum + VALUES(ratio_sum),
+               best_ratio = GREATEST(best_ratio, VALUES(best_ratio)),
+               last_attempt_at = VALUES(last_attempt_at)''',
+        '''INSERT INTO quiz_stats
+               (quiz_id, attempts, rated_attempts, total_score, total_questions, ratio_sum, last_attempt_at)
+           VALUES ({ph}, 1, {ph}, {ph}, {ph}, {ph}, CURRENT_TIMESTAMP)
+           ON DUPLICATE KEY UPDATE
+               attempts = attempts + 1,
+               rated_attempts = rated_attempts + VALUES(rated_attempts),
+               total_score = total_score + VALUES(total_score),
+               total_questions = total_questions + VALUES(total_questions),
+               ratio_sum = ratio_sum + VALUES(ratio_sum),
+               last_attempt_at = VALUES(last_attempt_at)''',
+        '''INSERT INTO daily_activity (activity_date, user_id, attempts)
+           VALUES (CURRENT_DATE, {ph}, 1)
+           ON DUPLICATE KEY UPDATE attempts = attempts + 1''',
+    ],
+    'sqlite': [
+        '''INSERT INTO student_quiz_stats
+               (user_id, quiz_id, attempts, rated_attempts, total_score, total_questions, ratio_sum, best_ratio, last_attempt_at)
+           VALUES ({ph}, {ph}, 1, {ph}, {ph}, {ph}, {ph}, {ph}, CURRENT_TIMESTAMP)
+           ON CONFLICT(user_id, quiz_id) DO UPDATE SET
+               attempts = attempts + 1,
+               rated_attempts = rated_attempts + excluded.rated_attempts,
+               total_score = total_score + excluded.total_score,
+               total_questions = total_questions + excluded.total_questions,
+               ratio_sum = ratio_sum + excluded.ratio_sum,
+               best_ratio = MAX(best_ratio, excluded.best_ratio),
+               last_attempt_at = excluded.last_attempt_at''',
+        '''INSERT INTO quiz_stats
+               (quiz_id, attempts, rated_attempts, total_score, total_questions, ratio_sum, last_attempt_at)
+           VALUES ({ph}, 1, {ph}, {ph}, {ph}, {ph}, CURRENT_TIMESTAMP)
+           ON CONFLICT(quiz_id) DO UPDATE SET
+               attempts = attempts + 1,
+               rated_attempts = rated_attempts + excluded.rated_attempts,
+               total_score = total_score + excluded.total_score,
+               total_questions = total_questions + excluded.total_questions,
+               ratio_sum = ratio_sum + excluded.ratio_sum,
+               last_attempt_at = excluded.last_attempt_at''',
+        '''INSERT INTO daily_activity (activity_date, user_id, attempts)
+           VALUES (CURRENT_DATE, {ph}, 1)
+           ON CONFLICT(activity_date, user_id) DO UPDATE SET attempts = attempts + 1''',
+    ],
+}
+
+# Recomputation from results; works unchanged on MySQL and SQLite.
+# Also run by schema migration 4 to backfill existing results.
+BACKFILL = [
+    '''INSERT INTO student_quiz_stats
+           (user_id, quiz_id, attempts, rated_attempts, total_score, total_questions, ratio_sum, best_ratio, last_attempt_at)
+       SELECT user_id, quiz_id, COUNT(*),
+              SUM(CASE WHEN total_questions > 0 THEN 1 ELSE 0 END),
+              COALESCE(SUM(score), 0), COALESCE(SUM(total_questions), 0),
+              COALESCE(SUM(score * 1.0 / NULLIF(total_questions, 0)), 0),
+              COALESCE(MAX(score * 1.0 / NULLIF(total_questions, 0)), 0),
+              MAX(completed_at)
+       FROM results GROUP BY user_id, quiz_id''',
+    '''INSERT INTO quiz_stats
+           (quiz_id, attempts, rated_attempts, total_score, total_questions, ratio_sum, last_attempt_at)
+       SELECT quiz_id, COUNT(*),
+              SUM(CASE WHEN total_questions > 0 THEN 1 ELSE 0 END),
+              COALESCE(SUM(score), 0), COALESCE(SUM(total_questions), 0),
+              COALESCE(SUM(score * 1.0 / NULLIF(total_questions, 0)), 0),
+              MAX(completed_at)
+       FROM results GROUP BY quiz_id''',
+    '''INSERT INTO daily_activity (activity_date, user_id, attempts)
+       SELECT DATE(completed_at), user_id, COUNT(*)
+       FROM results GROUP BY DATE(completed_at), user_id''',
+]
+
+_REBUILD = [
+    "DELETE FROM student_quiz_stats",
+    "DELETE FROM quiz_stats",
+    "DELETE FROM daily_activity",
+] + BACKFILL
+
+
+def record_result(cursor, dialect, user_id, quiz_id, score, total_questions):
+    """Fold one new results row into the aggregates. Call inside the results insert transaction."""
+    ph = PLACEHOLDER[dialect]
+    score = score or 0
+    total_questions = total_questions or 0
+    rated = 1 if total_questions > 0 else 0
+    ratio = score / total_questions if total_questions > 0 else 0.0
+    student_sql, quiz_sql, daily_sql = (sql.format(ph=ph) for sql in _UPSERTS[dialect])
+    cursor.execute(student_sql, (user_id, quiz_id, rated, score, total_questions, ratio, ratio))
+    cursor.execute(quiz_sql, (quiz_id, rated, score, total_questions, ratio))
+    cursor.execute(daily_sql, (user_id,))
+
+
+def rebuild(conn):
+    """Recompute every aggregate table from results in one transaction"""
+    cursor = conn.cursor()
+    try:
+        for statement in _REBUILD:
+            cursor.execute(statement)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
@@ -1,11 +1,40 @@
-from flask import Flask, render_template, request, redirect, url_for, session, flash, send_from_directory, Response, jsonify
-from werkzeug.security import generate_password_hash, check_password_hash
+from flask import Flask, render_template, request, redirect, url_for, session, flash, Response, jsonify, g, has_app_context, make_response
 import mysql.connector
 from mysql.connector import Error
 from datetime import datetime, timedelta
 import os
+import io
+import hashlib
+import math
+import random
+import secrets
+import csv
+import json
+import threading
 from functools import wraps
 
+import schema
+import aggregates
+from db_pool import ConnectionPool, PoolTimeout, default_pool_size, pool_settings
+from attempt_store import create_attempt_store
+from question_cache import QuestionCache, QuizBundle
+import question_import
+from feed_cache import FeedCache
+import queries
+from queries import Repository, dashboard_query
+from analytics import ResultFrame, summarize, cohort_summary
+from metrics import Metrics
+from passwords import PasswordHasher, HasherBusy, hasher_settings
+from events import EventBus, format_event
+from session_probe import SessionProbe
+from cache_policy import CachePolicies, bump_versions, counter_source
+from assets import Assets
+from compress import Compress
+from notify import Dispatcher, dispatcher_settings, transports_from_env
+from jobs import JobQueue
+import click
+from flask.sessions import SecureCookieSessionInterface
+
 app = Flask(__name__, template_folder='templates', static_folder='static')
 app.secret_key = os.environ.get('SECRET_KEY', 'smartquiz-secret-key-2025')
 app.config['SECRET_KEY'] = app.secret_key
@@ -16,8 +45,53 @@ app.config['SESSION_COOKIE_HTTPONLY'] = True  # Prevent JavaScript access
 app.config['SESSION_COOKIE_SAMESITE'] = 'Lax'  # CSRF protection
 app.config['SESSION_COOKIE_NAME'] = 'smartquiz_session'
 
+# Per-route request latency and SQL counts, served at /metrics. Registered
+# first so its timer also covers the other before_request hooks.
+metrics = Metrics()
+metrics.init_app(app)
+
+# Server-Sent Events push channel (/events), relayed between workers on this machine
+event_bus = EventBus(directory=os.environ.get('EVENTS_SOCKET_DIR'),
+                     max_streams=int(os.environ.get('EVENTS_MAX_STREAMS', 48)))
+event_bus.init_app(app)
+metrics.gauge('smartquiz_event_bus', 'Server-Sent Events streams and relay counters', 'stat', event_bus.stats)
+
 # ==================== SESSION MANAGEMENT (FIXED) ====================
 
+class SmartQuizSessionInterface(SecureCookieSessionInterface):
+    """Cookie sessions, except that endpoints which set g.passive_session don't refresh the cookie.
+
+    Long-lived and background requests (the /events stream) must not keep an idle
+    session alive past its 30 minute timeout.
+    """
+
+    def should_set_cookie(self, app, session):
+        if g.get('passive_session'):
+            return False
+        return super().should_set_cookie(app, session)
+
+app.session_interface = SmartQuizSessionInterface()
+
+# /session_status and the /session_check beacon are answered in front of Flask
+# (no hooks, no database) from the signed cookie; the beacon feeds an active-user gauge
+session_probe = SessionProbe(app, app.wsgi_app, metrics=metrics)
+app.wsgi_app = session_probe
+metrics.gauge('smartquiz_active_users', 'Users seen by session probes in the last 5 minutes', 'role',
+              session_probe.presence.counts)
+
+# Shared CSS/JS, fingerprinted and precompressed from assets/ and served from /assets/
+# in front of Flask with year-long immutable caching (flask --app app build-assets)
+static_assets = Assets(app.wsgi_app, metrics=metrics)
+app.wsgi_app = static_assets
+static_assets.init_app(app)
+
+# gzip/brotli for HTML, JSON and CSV responses, outermost so it sees every response
+compressor = Compress(app.wsgi_app, min_size=int(os.environ.get('COMPRESS_MIN_SIZE', 1024)),
+                      level=int(os.environ.get('COMPRESS_LEVEL', 6)))
+app.wsgi_app = compressor
+metrics.gauge('smartquiz_compression', 'Compressed responses, bytes in/out and compression CPU time', 'stat',
+              compressor.stats)
+
 @app.before_request
 def make_session_permanent():
     """Make all sessions permanent and set cache control headers"""
@@ -30,23 +104,9 @@ def make_session_permanent():
 
 @app.after_request
 def set_cache_control(response):
-    """Set cache control headers based on authentication status"""
-    if 'user_id' in session:
-        
-        response.headers['Cache-Control'] = 'no-cache, no-store, must-revalidate, private, max-age=0' # <-- MODIFIED
-        response.headers['Pragma'] = 'no-cache'
-        response.headers['Expires'] = '0'
-        # Indicate response may vary based on cookies
-        existing_vary = response.headers.get('Vary')
-        if existing_vary:
-            if 'Cookie' not in [h.strip() for h in existing_vary.split(',')]:
-                response.headers['Vary'] = existing_vary + ', Cookie'
-        else:
-            response.headers['Vary'] = 'Cookie'
-    else:
-        # Public pages: allow public cache
-        response.headers['Cache-Control'] = 'public, max-age=3600'
-    
+    """Set cache control headers from the route's cache policy (see cache_policy.py)"""
+    response = cache.apply(response)
+
     # Ensure all HTML files are treated correctly
     if 'text/html' in response.content_type:
         response.headers['X-Content-Type-Options'] = 'nosniff'
@@ -72,23 +132,29 @@ def session_required(role=None):
     return decorator
 
 
-@app.route('/session_status')
-def session_status():
-    """Simple endpoint used by client-side JS to verify whether server-side session is still active."""
-    # Return uncached response so browsers / proxies don't cache session state
-    if 'user_id' in session:
-        resp = jsonify({'status': 'ok'})
-        resp.status_code = 200
-    else:
-        resp = jsonify({'status': 'expired'})
-        resp.status_code = 401
-
-    resp.headers['Cache-Control'] = 'no-cache, no-store, must-revalidate, max-age=0'
-    resp.headers['Pragma'] = 'no-cache'
-    resp.headers['Expires'] = '0'
-    # Vary by Cookie to prevent intermediaries from serving stale results
-    resp.headers['Vary'] = 'Cookie'
-    return resp
+def session_channel():
+    """Event channel shared by the tabs of the current login"""
+    return f"session:{session['user_id']}:{session.get('login_time')}"
+
+@app.route('/events')
+def events():
+    """Server-Sent Events: new notifications for everyone, session expiry for this login.
+
+    The page reconnects whenever a stream ends, so an expired session is
+    reported on the next reconnect (at most EventBus.max_age later).
+    """
+    g.passive_session = True
+    if 'user_id' not in session:
+        return Response(format_event('session', {'status': 'expired'}), mimetype='text/event-stream')
+    subscription = event_bus.subscribe(['notifications', session_channel()])
+    if subscription is None:
+        # The page falls back to checking /session_status
+        return Response('Too many event streams\n', status=503, mimetype='text/plain')
+    response = Response(event_bus.stream(subscription), mimetype='text/event-stream')
+    # Stop nginx-style proxies from buffering the stream
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
 # The 'no_cache' decorator definition you had can be removed, as the logic is now in @app.after_request and the explicit logout.
 # def no_cache(view):
 #     @wraps(view)
@@ -111,9 +177,7 @@ DB_CONFIG = {
     'database': 'smartquiz'
 }
 
-# ... (init_db, get_db, init_db_on_request remain the same) ...
-
-# Initialize database and create tables
+# Initialize database and apply pending schema migrations (see schema.py)
 def init_db():
     try:
         # Connect to MySQL without database first to create it
@@ -129,99 +193,137 @@ def init_db():
         cursor.execute(f"CREATE DATABASE IF NOT EXISTS {DB_CONFIG['database']}")
         conn.close()
         
-        # Now connect to the actual database
+        # Now connect to the actual database and bring the schema up to date
         conn = mysql.connector.connect(**DB_CONFIG)
-        cursor = conn.cursor()
-        
-        # Users table
-        cursor.execute('''CREATE TABLE IF NOT EXISTS users
-                         (id INT AUTO_INCREMENT PRIMARY KEY, 
-                          username VARCHAR(255) UNIQUE NOT NULL, 
-                          password VARCHAR(255) NOT NULL,
-                          role VARCHAR(50) NOT NULL, 
-                          email VARCHAR(255), 
-                          created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''')
-        
-        # Quizzes table
-        cursor.execute('''CREATE TABLE IF NOT EXISTS quizzes
-                         (id INT AUTO_INCREMENT PRIMARY KEY, 
-                          title VARCHAR(255) NOT NULL, 
-                          description TEXT,
-                          created_by INT NOT NULL, 
-                          created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, 
-                          duration INT,
-                          FOREIGN KEY(created_by) REFERENCES users(id))''')
-        
-        # Questions table
-        cursor.execute('''CREATE TABLE IF NOT EXISTS questions
-                         (id INT AUTO_INCREMENT PRIMARY KEY, 
-                          quiz_id INT NOT NULL, 
-                          question TEXT NOT NULL,
-                          option_a VARCHAR(255), 
-                          option_b VARCHAR(255), 
-                          option_c VARCHAR(255), 
-                          option_d VARCHAR(255),
-                          correct_answer VARCHAR(1), 
-                          FOREIGN KEY(quiz_id) REFERENCES quizzes(id) ON DELETE CASCADE)''')
-        
-        # Results table
-        cursor.execute('''CREATE TABLE IF NOT EXISTS results
-                         (id INT AUTO_INCREMENT PRIMARY KEY, 
-                          user_id INT NOT NULL, 
-                          quiz_id INT NOT NULL,
-                          score INT, 
-                          total_questions INT, 
-                          completed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                          FOREIGN KEY(user_id) REFERENCES users(id),
-                          FOREIGN KEY(quiz_id) REFERENCES quizzes(id) ON DELETE CASCADE)''')
-        
-        # Notifications table
-        cursor.execute('''CREATE TABLE IF NOT EXISTS notifications
-                         (id INT AUTO_INCREMENT PRIMARY KEY, 
-                          title VARCHAR(255), 
-                          message TEXT, 
-                          created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''')
-        
-        # Courses table
-        cursor.execute('''CREATE TABLE IF NOT EXISTS courses
-                         (id INT AUTO_INCREMENT PRIMARY KEY, 
-                          name VARCHAR(255) NOT NULL, 
-                          description TEXT, 
-                          created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''')
-        
-        
-        
-        conn.commit()
-        
-        # Check if admin user exists, if not create it
-        cursor.execute("SELECT id FROM users WHERE username = %s", ('admin',))
-        if not cursor.fetchone():
-            admin_password = generate_password_hash('admin123')
-            cursor.execute("INSERT INTO users (username, password, role, email) VALUES (%s, %s, %s, %s)",
-                          ('admin', admin_password, 'admin', 'admin@smartquiz.com'))
-            conn.commit()
-        
-        cursor.close()
+        applied = schema.migrate(conn, 'mysql')
         conn.close()
+        if applied:
+            print(f"Applied schema migrations: {applied}")
+        return True
     except Error as e:
         print(f"Error initializing database: {e}")
+        return False
+
+# Per-process connection pool; each gunicorn worker keeps its own warm connections
+db_pool = ConnectionPool(metrics.instrument(lambda: mysql.connector.connect(**DB_CONFIG)),
+                         ping=lambda conn: conn.ping(reconnect=False),
+                         **pool_settings())
+metrics.watch_pool(db_pool)
 
 def get_db():
+    """Return a pooled connection, reused for the rest of the current request"""
+    if has_app_context() and '_db_conn' in g:
+        return g._db_conn
     try:
-        conn = mysql.connector.connect(**DB_CONFIG)
-        return conn
-    except Error as e:
+        conn = db_pool.connection(scoped=has_app_context())
+    except (Error, PoolTimeout) as e:
         print(f"Error connecting to MySQL: {e}")
         return None
+    if has_app_context():
+        g._db_conn = conn
+    return conn
+
+@app.teardown_appcontext
+def release_db(exc):
+    conn = g.pop('_db_conn', None)
+    if conn is not None:
+        conn.release()
+
+# Shared queries (queries.py) run as prepared statements cached per pooled connection
+repo = Repository(get_db, 'mysql', cache_size=int(os.environ.get('DB_STATEMENT_CACHE', queries.STATEMENT_CACHE_SIZE)))
+metrics.gauge('smartquiz_prepared_statements', 'Prepared statement cache counters', 'stat', repo.stats)
+
+# Schema bootstrap runs once per process. Set SMARTQUIZ_AUTO_MIGRATE=0 to rely
+# solely on `flask --app app init-db` being run before gunicorn starts.
+_schema_ready = os.environ.get('SMARTQUIZ_AUTO_MIGRATE', '1') == '0'
+_schema_lock = threading.Lock()
 
-# Keep the database initialization in before_request (called on every request)
 @app.before_request
-def init_db_on_request():
-    init_db()
+def ensure_schema():
+    global _schema_ready
+    if _schema_ready:
+        return
+    with _schema_lock:
+        if not _schema_ready:
+            # Retry on the next request if the database was unreachable
+            _schema_ready = init_db()
+
+@app.cli.command('init-db')
+def init_db_command():
+    """Create the database and apply pending schema migrations."""
+    if not init_db():
+        raise SystemExit(1)
+    print("Database schema is up to date")
+
+@app.cli.command('rebuild-aggregates')
+def rebuild_aggregates_command():
+    """Recompute the dashboard aggregate tables from results."""
+    conn = mysql.connector.connect(**DB_CONFIG)
+    aggregates.rebuild(conn)
+    conn.close()
+    print("Aggregates rebuilt")
+
+# ==================== DASHBOARD QUERIES ====================
+# Queries shared with app_sqlite.py are defined once in queries.py (compiled to
+# MySQL here) and run through `repo`. Both places register theirs with
+# dashboard_query() so `python explain_check.py` can verify each one is
+# served by an index (see schema.py migration 5).
+
+# -------------------- Admin results report --------------------
+# Newest first, paged by keyset on (completed_at, id) so every page is an index
+# range read no matter how deep the admin scrolls.
+
+REPORT_PAGE_SIZE = 50
+REPORT_MAX_PAGE_SIZE = 200
+REPORT_TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+def report_filters(args):
+    """Parse the quiz / user / date range filters shared by the report page and CSV export"""
+    filters = {}
+    quiz_id = args.get('quiz_id', type=int)
+    if quiz_id:
+        filters['quiz_id'] = quiz_id
+    username = (args.get('user') or '').strip()
+    if username:
+        filters['user'] = username
+    for key in ('date_from', 'date_to'):
+        try:
+            filters[key] = datetime.strptime(args.get(key, ''), '%Y-%m-%d')
+        except ValueError:
+            pass
+    return filters
+
+def report_cursor(args):
+    """Keyset position (completed_at, id) of the last row on the previous page, or None"""
+    try:
+        return (datetime.strptime(args.get('before', ''), REPORT_TIMESTAMP_FORMAT), int(args.get('before_id', '')))
+    except ValueError:
+        return None
+
+_KEYSET = ('completed_at', 'completed_at', 'result_id')
+dashboard_query('admin_reports_page',
+    queries.report_query({}, after=(None, None), limit=REPORT_PAGE_SIZE + 1)[0], params=_KEYSET)
+dashboard_query('admin_reports_by_quiz',
+    queries.report_query({'quiz_id': 0}, after=(None, None), limit=REPORT_PAGE_SIZE + 1)[0], params=('quiz_id',) + _KEYSET)
+dashboard_query('admin_reports_by_user',
+    queries.report_query({'user': ''}, after=(None, None), limit=REPORT_PAGE_SIZE + 1)[0], params=('username',) + _KEYSET)
+
+# -------------------- HTTP cache validation --------------------
+# Pages with a cache policy get an ETag from these data versions and are answered
+# 304 before the view runs. Counters are bumped by the routes that write the data.
+
+cache = CachePolicies(get_db, {
+    'users': counter_source('users'),
+    'quizzes': counter_source('quizzes'),
+    'courses': counter_source('courses'),
+}, register_query=dashboard_query)
+cache.init_app(app)
+metrics.gauge('smartquiz_http_cache', 'Conditional page requests by outcome', 'outcome', cache.stats)
 
 # ==================== AUTHENTICATION ROUTES ====================
 
 @app.route('/')
+@cache.policy(public=True, max_age=300, stale_while_revalidate=60, versions=('courses',))
 def index():
     if 'user_id' in session:
         if session['role'] == 'admin':
@@ -234,13 +336,7 @@ def index():
     # Fetch courses from database
     courses = []
     try:
-        conn = get_db()
-        if conn:
-            c = conn.cursor(dictionary=True)
-            c.execute("SELECT id, name, description FROM courses ORDER BY created_at DESC LIMIT 10")
-            courses = c.fetchall()
-            c.close()
-            conn.close()
+        courses = repo.all(queries.RECENT_COURSES)
     except Exception as e:
         print(f"Error fetching courses: {e}")
     
@@ -263,18 +359,20 @@ def student_login_html():
 def signup_html():
     return render_template('signup.html')
 
-# Serve CSS, JS, and Images from htmls folder
-@app.route('/css/<path:filename>')
-def serve_css(filename):
-    return send_from_directory(os.path.join(os.path.dirname(__file__), '../../htmls/css'), filename)
-
-@app.route('/js/<path:filename>')
-def serve_js(filename):
-    return send_from_directory(os.path.join(os.path.dirname(__file__), '../../htmls/js'), filename)
+# KDF work runs in a bounded process pool (see passwords.py)
+password_hasher = PasswordHasher(**hasher_settings())
+metrics.gauge('smartquiz_password_hasher', 'Password hashing pool counters', 'stat', password_hasher.stats)
 
-@app.route('/images/<path:filename>')
-def serve_images(filename):
-    return send_from_directory(os.path.join(os.path.dirname(__file__), '../../htmls/images'), filename)
+def rehash_password(user_id, password):
+    """Upgrade a stored hash to the current method/cost after a successful login"""
+    try:
+        hashed = password_hasher.rehash(password)
+    except HasherBusy:
+        return  # try again on the next login
+    try:
+        repo.execute(queries.UPDATE_PASSWORD, (hashed, user_id), commit=True)
+    except (Error, RuntimeError) as e:
+        print(f"Error rehashing password for user {user_id}: {e}")
 
 @app.route('/login', methods=['GET', 'POST'])
 def login():
@@ -282,15 +380,28 @@ def login():
         username = request.form.get('username')
         password = request.form.get('password')
         
-        conn = get_db()
+        # Not the request's connection: it goes back to the pool before the password check,
+        # which can wait for a hasher slot, so a login storm can't starve quiz submissions
+        try:
+            conn = db_pool.connection()
+        except (Error, PoolTimeout) as e:
+            print(f"Error connecting to MySQL: {e}")
+            conn = None
         if conn:
-            cursor = conn.cursor(dictionary=True)
-            cursor.execute("SELECT * FROM users WHERE username = %s", (username,))
-            user = cursor.fetchone()
-            cursor.close()
-            conn.close()
-            
-            if user and check_password_hash(user['password'], password):
+            try:
+                user = repo.one(queries.USER_BY_USERNAME, (username,), conn=conn)
+            finally:
+                conn.release()
+
+            try:
+                valid = user is not None and password_hasher.verify(user['password'], password)
+            except HasherBusy:
+                flash('Lots of people are signing in right now. Please try again in a few seconds.', 'error')
+                return redirect(url_for('index'))
+
+            if valid:
+                if password_hasher.needs_rehash(user['password']):
+                    rehash_password(user['id'], password)
                 session.permanent = True
                 session['user_id'] = user['id']
                 session['username'] = user['username']
@@ -325,9 +436,9 @@ def signup():
         if conn:
             cursor = conn.cursor()
             try:
-                hashed_password = generate_password_hash(password)
-                cursor.execute("INSERT INTO users (username, password, role, email) VALUES (%s, %s, %s, %s)",
-                              (username, hashed_password, role, email))
+                hashed_password = password_hasher.hash(password)
+                repo.execute(queries.INSERT_USER, (username, hashed_password, role, email))
+                bump_versions(cursor, 'mysql', 'users')
                 conn.commit()
                 flash('Account created successfully! Please log in.', 'success')
                 return redirect(url_for('login'))
@@ -336,6 +447,8 @@ def signup():
                     flash('Username already exists', 'error')
                 else:
                     flash(f'Error: {err}', 'error')
+            except HasherBusy:
+                flash('The server is busy. Please try again in a few seconds.', 'error')
             finally:
                 cursor.close()
                 conn.close()
@@ -344,6 +457,9 @@ def signup():
 
 @app.route('/logout')
 def logout():
+    # Tell this login's other open tabs (via their /events streams) before forgetting who it was
+    if 'user_id' in session:
+        event_bus.publish(session_channel(), 'session', {'status': 'expired'})
     # Clear the session data
     session.clear()
 
@@ -355,6 +471,8 @@ def logout():
     response.headers['Cache-Control'] = 'no-cache, no-store, must-revalidate, private, max-age=0'
     response.headers['Pragma'] = 'no-cache'
     response.headers['Expires'] = '0'
+    # Drop pages this login left in the browser's HTTP cache (private, no-cache dashboards)
+    response.headers['Clear-Site-Data'] = '"cache"'
     
     # Ensure the session cookie is removed from the browser immediately
     cookie_name = app.config.get('SESSION_COOKIE_NAME', 'session')
@@ -375,17 +493,10 @@ def admin():
 @app.route('/admin/dashboard')
 @session_required(role='admin')
 def admin_dashboard():
-    conn = get_db()
-    c = conn.cursor(dictionary=True)
-    c.execute("SELECT COUNT(*) as count FROM users WHERE role='student'")
-    students = c.fetchone()['count']
-    c.execute("SELECT COUNT(*) as count FROM users WHERE role='lecturer'")
-    lecturers = c.fetchone()['count']
-    c.execute("SELECT COUNT(*) as count FROM quizzes")
-    quizzes = c.fetchone()['count']
-    c.execute("SELECT COUNT(*) as count FROM results")
-    results = c.fetchone()['count']
-    conn.close()
+    students = repo.one(queries.COUNT_USERS_BY_ROLE, ('student',))['count']
+    lecturers = repo.one(queries.COUNT_USERS_BY_ROLE, ('lecturer',))['count']
+    quizzes = repo.one(queries.COUNT_QUIZZES)['count']
+    results = int(repo.one(queries.TOTAL_ATTEMPTS)['count'])
     
     return render_template('admin_dashboard.html', 
                          students=students, lecturers=lecturers, 
@@ -396,11 +507,7 @@ def admin_users():
     if 'user_id' not in session or session['role'] != 'admin':
         return redirect(url_for('login'))
     
-    conn = get_db()
-    c = conn.cursor(dictionary=True)
-    c.execute("SELECT id, username, email, role FROM users")
-    users = c.fetchall()
-    conn.close()
+    users = repo.all(queries.ALL_USERS)
     
     return render_template('admin_users.html', users=users)
 
@@ -408,20 +515,27 @@ def admin_users():
 @app.route('/admin/user/<int:user_id>/edit', methods=['GET', 'POST'])
 @session_required(role='admin')
 def admin_edit_user(user_id):
-    conn = get_db()
-    c = conn.cursor(dictionary=True)
-
     if request.method == 'POST':
         username = request.form.get('username')
         email = request.form.get('email')
+        phone = (request.form.get('phone') or '').strip() or None
         password = request.form.get('password')
 
         try:
-            if password:
-                hashed = generate_password_hash(password)
-                c.execute("UPDATE users SET username=%s, email=%s, password=%s WHERE id=%s", (username, email, hashed, user_id))
+            # Hash before touching the database: no connection is held while waiting for the hasher
+            hashed = password_hasher.hash(password) if password else None
+        except HasherBusy:
+            flash('The server is busy. Please try again in a few seconds.', 'error')
+            return redirect(url_for('admin_users'))
+
+        conn = get_db()
+        c = conn.cursor()
+        try:
+            if hashed:
+                repo.execute(queries.UPDATE_USER_WITH_PASSWORD, (username, email, phone, hashed, user_id))
             else:
-                c.execute("UPDATE users SET username=%s, email=%s WHERE id=%s", (username, email, user_id))
+                repo.execute(queries.UPDATE_USER, (username, email, phone, user_id))
+            bump_versions(c, 'mysql', 'users')
             conn.commit()
             flash('User updated successfully.', 'success')
         except Error as e:
@@ -433,10 +547,7 @@ def admin_edit_user(user_id):
         return redirect(url_for('admin_users'))
 
     # GET
-    c.execute("SELECT id, username, email, role FROM users WHERE id = %s", (user_id,))
-    user = c.fetchone()
-    c.close()
-    conn.close()
+    user = repo.one(queries.USER_BY_ID, (user_id,))
     if not user:
         flash('User not found', 'error')
         return redirect(url_for('admin_users'))
@@ -449,46 +560,99 @@ def admin_edit_user(user_id):
 @session_required(role='admin')
 def admin_delete_user(user_id):
 
-    conn = get_db()
-    c = conn.cursor()
+    # Deleting a user with a long results history runs in the job worker (see jobs.py)
     try:
-        c.execute("DELETE FROM users WHERE id = %s", (user_id,))
-        conn.commit()
-        flash('User deleted.', 'info')
-    except Error as e:
-        conn.rollback()
+        # quizzes.created_by has no ON DELETE; refuse now rather than fail in the worker
+        owned = repo.one(queries.LECTURER_QUIZ_COUNT, (user_id,))['count']
+        if owned:
+            flash(f'Error deleting user: they own {owned} quiz(zes). Delete or reassign them first.', 'error')
+            return redirect(url_for('admin_users'))
+        job_id = job_queue.enqueue('delete_user', {'user_id': user_id}, created_by=session['user_id'])
+        flash(f'User deletion queued (job #{job_id}); it finishes in the background.', 'info')
+    except (Error, RuntimeError, PoolTimeout) as e:
         flash(f'Error deleting user: {e}', 'error')
-    finally:
-        c.close()
-        conn.close()
     return redirect(url_for('admin_users'))
 
 @app.route('/admin/reports')
 @session_required(role='admin')
 def admin_reports():
-    
-    conn = get_db()
-    c = conn.cursor(dictionary=True)
-    c.execute("""SELECT u.username, q.title, r.score, r.total_questions, r.completed_at 
-                 FROM results r 
-                 JOIN users u ON r.user_id = u.id 
-                 JOIN quizzes q ON r.quiz_id = q.id
-                 ORDER BY r.completed_at DESC""")
-    reports = c.fetchall()
-    conn.close()
-    
-    return render_template('admin_reports.html', reports=reports)
+    filters = report_filters(request.args)
+    per_page = min(max(request.args.get('per_page', REPORT_PAGE_SIZE, type=int), 1), REPORT_MAX_PAGE_SIZE)
+    after = report_cursor(request.args)
+
+    # One extra row tells us whether there is a next page
+    query, params = queries.report_query(filters, after=after, limit=per_page + 1)
+    reports = repo.all(query, params)
+    quizzes = repo.all(queries.QUIZ_TITLES)
+
+    next_args = None
+    if len(reports) > per_page:
+        reports = reports[:per_page]
+        last = reports[-1]
+        next_args = dict(request.args.to_dict(), before=last['completed_at'].strftime(REPORT_TIMESTAMP_FORMAT),
+                         before_id=last['id'])
+
+    # Filters as submitted, for the form, the CSV link and the pagination links
+    filter_args = {k: v for k, v in request.args.items() if k in ('quiz_id', 'user', 'date_from', 'date_to', 'per_page') and v}
+    return render_template('admin_reports.html', reports=reports, quizzes=quizzes, filters=filter_args,
+                           next_args=next_args, paged=after is not None)
+
+@app.route('/admin/reports.csv')
+@session_required(role='admin')
+def admin_reports_csv():
+    query, params = queries.report_query(report_filters(request.args))
+    try:
+        # A connection of its own: it stays busy for as long as the client keeps reading
+        conn = db_pool.connection()
+    except (Error, PoolTimeout) as e:
+        flash(f'Export failed: {e}', 'error')
+        return redirect(url_for('admin_reports'))
+
+    def generate():
+        # Unbuffered cursor: rows are streamed from the server in batches instead of
+        # being materialised in the worker, so memory stays flat for any table size
+        c = conn.cursor(buffered=False)
+        discard = False
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        try:
+            c.execute(query.compile('mysql'), params)
+            writer.writerow(['Result ID', 'Student', 'Quiz', 'Score', 'Total Questions', 'Date Completed'])
+            while True:
+                rows = c.fetchmany(1000)
+                if not rows:
+                    break
+                writer.writerows(rows)
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate(0)
+            if buffer.tell():
+                yield buffer.getvalue()
+        except Error as e:
+            discard = True
+            print(f"Error streaming report export: {e}")
+        finally:
+            try:
+                c.close()
+            except Error:
+                # Client disconnected mid-stream; the connection still has unread rows
+                discard = True
+            conn.release(discard=discard)
+
+    filename = f"smartquiz-report-{datetime.now().strftime('%Y%m%d-%H%M%S')}.csv"
+    response = Response(generate(), mimetype='text/csv',
+                        headers={'Content-Disposition': f'attachment; filename={filename}'})
+    # HEAD requests and responses closed before the first chunk never run generate(),
+    # so its finally can't be relied on to hand the connection back (release is idempotent)
+    response.call_on_close(conn.release)
+    return response
 
 # -------------------- Admin: Pending approvals / Approve/Reject --------------------
 @app.route('/admin/pending')
 @session_required(role='admin')
 def admin_pending():
 
-    conn = get_db()
-    c = conn.cursor(dictionary=True)
-    c.execute("SELECT id, username, email, role, created_at FROM users WHERE role = 'pending'")
-    pending = c.fetchall()
-    conn.close()
+    pending = repo.all(queries.PENDING_USERS)
     return render_template('admin_pending.html', pending=pending)
 
 @app.route('/admin/approve_user/<int:user_id>', methods=['POST'])
@@ -498,7 +662,8 @@ def admin_approve_user(user_id):
     new_role = request.form.get('role', 'student')
     conn = get_db()
     c = conn.cursor()
-    c.execute("UPDATE users SET role = %s WHERE id = %s", (new_role, user_id))
+    repo.execute(queries.SET_USER_ROLE, (new_role, user_id))
+    bump_versions(c, 'mysql', 'users')
     conn.commit()
     conn.close()
     flash('User approved.', 'success')
@@ -510,29 +675,87 @@ def admin_reject_user(user_id):
 
     conn = get_db()
     c = conn.cursor()
-    c.execute("DELETE FROM users WHERE id = %s", (user_id,))
+    repo.execute(queries.DELETE_USER, (user_id,))
+    bump_versions(c, 'mysql', 'users')
     conn.commit()
     conn.close()
     flash('User rejected and removed.', 'info')
     return redirect(url_for('admin_pending'))
 
+# -------------------- Notification feed cache --------------------
+def load_notification_feed():
+    """The latest admin broadcast notifications, or None on a database error"""
+    try:
+        return repo.all(queries.NOTIFICATION_FEED)
+    except (Error, RuntimeError) as e:
+        print(f"[ERROR] Failed to load notifications: {e}")
+        return None
+
+notification_feed = FeedCache(load_notification_feed, ttl=int(os.environ.get('NOTIFICATION_CACHE_TTL', 30)))
+metrics.gauge('smartquiz_notification_feed', 'Notification feed cache counters', 'stat', notification_feed.stats)
+# Admin changes reach every worker's feed cache through the event bus
+event_bus.on('notifications', lambda event, data: notification_feed.invalidate())
+
+# -------------------- Notification delivery --------------------
+
+def load_notification_recipients(after_id, limit):
+    """Next batch of users to send a notification to; runs on the dispatcher's threads"""
+    return repo.all(queries.NOTIFICATION_RECIPIENTS, (after_id, limit))
+
+notifier = Dispatcher(load_notification_recipients, transports_from_env(), **dispatcher_settings())
+metrics.gauge('smartquiz_notify', 'SMS/email notification delivery counters', 'stat', notifier.stats)
+
+_template_stamps = {}
+
+def template_stamp(template):
+    """Name and modification times of a page template and base.html, so a deploy changes the page's ETag"""
+    stamp = _template_stamps.get(template)
+    if stamp is None:
+        folder = os.path.join(app.root_path, app.template_folder)
+        mtimes = [os.path.getmtime(os.path.join(folder, name)) for name in (template, 'base.html')]
+        stamp = _template_stamps[template] = f"{template}:{':'.join(str(int(m)) for m in mtimes)}"
+    return stamp
+
+def notifications_page(template):
+    """Render the shared feed with a strong ETag, answering repeat visits with 304.
+
+    The tag covers the feed content and everything user-specific on the page
+    (the navbar), so a 304 needs neither the database nor a template render.
+    """
+    feed = notification_feed.get()
+    if feed is None:
+        flash('Could not load notifications. Please try again later.', 'error')
+        return render_template(template, notifications=[])
+    # Pending flash messages are part of the page, so it can't be served from the browser cache
+    if session.get('_flashes'):
+        return render_template(template, notifications=feed.items)
+    identity = f"{template_stamp(template)}|{session.get('user_id')}|{session.get('username')}|{session.get('role')}"
+    etag = f"{feed.etag}-{hashlib.sha256(identity.encode()).hexdigest()[:16]}"
+    if request.method == 'GET' and request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = make_response(render_template(template, notifications=feed.items))
+    response.set_etag(etag)
+    return response
+
 # -------------------- Admin: Notifications --------------------
 @app.route('/admin/notifications', methods=['GET', 'POST'])
 @session_required(role='admin')
 def admin_notifications():
 
-    conn = get_db()
-    c = conn.cursor(dictionary=True)
     if request.method == 'POST':
         title = request.form.get('title')
         message = request.form.get('message')
-        c.execute("INSERT INTO notifications (title, message) VALUES (%s, %s)", (title, message))
-        conn.commit()
-        flash('Notification created.', 'success')
+        notification_id = repo.execute(queries.INSERT_NOTIFICATION, (title, message), commit=True)
+        event_bus.publish('notifications', 'notification',
+                          {'id': notification_id, 'title': title, 'message': (message or '')[:200]})
+        # SMS/email delivery happens in the background (see notify.py)
+        if notifier.submit({'id': notification_id, 'title': title, 'message': message}):
+            flash('Notification created.', 'success')
+        else:
+            flash('Notification created, but SMS/email delivery is busy; it was not sent.', 'error')
 
-    c.execute("SELECT * FROM notifications ORDER BY created_at DESC")
-    notes = c.fetchall()
-    conn.close()
+    notes = repo.all(queries.ALL_NOTIFICATIONS)
     return render_template('admin_notifications.html', notes=notes)
 
 
@@ -541,18 +764,12 @@ def admin_notifications():
 def admin_delete_notification(notification_id):
     
 
-    conn = get_db()
-    c = conn.cursor()
     try:
-        c.execute("DELETE FROM notifications WHERE id = %s", (notification_id,))
-        conn.commit()
+        repo.execute(queries.DELETE_NOTIFICATION, (notification_id,), commit=True)
+        event_bus.publish('notifications', 'notification-deleted', {'id': notification_id})
         flash('Notification deleted.', 'info')
     except Error as e:
-        conn.rollback()
         flash(f'Error deleting notification: {e}', 'error')
-    finally:
-        c.close()
-        conn.close()
     return redirect(url_for('admin_notifications'))
 
 # -------------------- Admin: Course Management --------------------
@@ -560,18 +777,18 @@ def admin_delete_notification(notification_id):
 @session_required(role='admin')
 def admin_courses():
 
-    conn = get_db()
-    c = conn.cursor(dictionary=True)
     if request.method == 'POST':
         name = request.form.get('name')
         description = request.form.get('description')
-        c.execute("INSERT INTO courses (name, description) VALUES (%s, %s)", (name, description))
+        conn = get_db()
+        c = conn.cursor()
+        repo.execute(queries.INSERT_COURSE, (name, description))
+        bump_versions(c, 'mysql', 'courses')
         conn.commit()
+        c.close()
         flash('Course added.', 'success')
 
-    c.execute("SELECT * FROM courses ORDER BY created_at DESC")
-    courses = c.fetchall()
-    conn.close()
+    courses = repo.all(queries.ALL_COURSES)
     return render_template('admin_courses.html', courses=courses)
 
 
@@ -583,7 +800,8 @@ def admin_delete_course(course_id):
     conn = get_db()
     c = conn.cursor()
     try:
-        c.execute("DELETE FROM courses WHERE id = %s", (course_id,))
+        repo.execute(queries.DELETE_COURSE, (course_id,))
+        bump_versions(c, 'mysql', 'courses')
         conn.commit()
         flash('Course deleted.', 'info')
     except Error as e:
@@ -603,21 +821,14 @@ def admin_delete_course(course_id):
 @session_required(role='lecturer')
 def lecturer_dashboard():
     
-    conn = get_db()
-    c = conn.cursor(dictionary=True)
-    c.execute("SELECT * FROM quizzes WHERE created_by = %s", (session['user_id'],))
-    quizzes = c.fetchall()
+    quizzes = repo.all(queries.LECTURER_QUIZZES, (session['user_id'],))
 
     # Additional metrics for lecturer: total questions across quizzes and distinct students who attempted those quizzes
-    c.execute("SELECT COUNT(q.id) as total_questions FROM questions q JOIN quizzes qu ON q.quiz_id = qu.id WHERE qu.created_by = %s", (session['user_id'],))
-    total_questions_row = c.fetchone()
+    total_questions_row = repo.one(queries.LECTURER_QUESTION_COUNT, (session['user_id'],))
     total_questions = total_questions_row['total_questions'] if total_questions_row else 0
 
-    c.execute("SELECT COUNT(DISTINCT r.user_id) as total_students FROM results r JOIN quizzes qu ON r.quiz_id = qu.id WHERE qu.created_by = %s", (session['user_id'],))
-    total_students_row = c.fetchone()
+    total_students_row = repo.one(queries.LECTURER_STUDENT_COUNT, (session['user_id'],))
     total_students = total_students_row['total_students'] if total_students_row else 0
-
-    conn.close()
     
     return render_template('lecturer_dashboard.html', quizzes=quizzes, total_questions=total_questions, total_students=total_students)
 
@@ -632,11 +843,10 @@ def create_quiz():
         duration = request.form.get('duration', 30)
         
         conn = get_db()
+        quiz_id = repo.execute(queries.INSERT_QUIZ, (title, description, session['user_id'], duration))
         c = conn.cursor()
-        c.execute("INSERT INTO quizzes (title, description, created_by, duration) VALUES (%s, %s, %s, %s)",
-                  (title, description, session['user_id'], duration))
+        bump_versions(c, 'mysql', 'quizzes')
         conn.commit()
-        quiz_id = c.lastrowid
         conn.close()
         
         flash('Quiz created successfully!', 'success')
@@ -648,20 +858,14 @@ def create_quiz():
 @session_required(role='lecturer')
 def add_questions(quiz_id):
     
-    conn = get_db()
-    c = conn.cursor()
-    
+ 
     # 1. Fetch the current count of questions
-    c.execute("SELECT COUNT(id) FROM questions WHERE quiz_id = %s", (quiz_id,))
-    current_question_count = c.fetchone()[0]
+    current_question_count = repo.one(queries.QUESTION_COUNT, (quiz_id,))['count']
     
-    MAX_QUESTIONS = 20
-
     if request.method == 'POST':
         # 2. Check and enforce the MAXIMUM limit
-        if current_question_count >= MAX_QUESTIONS:
-            conn.close() # Close connection before redirecting
-            flash(f'Cannot add more questions. The maximum limit of {MAX_QUESTIONS} questions has been reached.', 'warning')
+        if current_question_count >= MAX_QUESTIONS_PER_QUIZ:
+            flash(f'Cannot add more questions. The maximum limit of {MAX_QUESTIONS_PER_QUIZ} questions has been reached.', 'warning')
             return redirect(url_for('add_questions', quiz_id=quiz_id))
          
         
@@ -673,10 +877,12 @@ def add_questions(quiz_id):
         option_d = request.form.get('option_d')
         # ... (rest of form data) ...
         correct_answer = request.form.get('correct_answer')
+        difficulty_level = request.form.get('difficulty_level') or None
         
-        c.execute("INSERT INTO questions (quiz_id, question, option_a, option_b, option_c, option_d, correct_answer) VALUES (%s, %s, %s, %s, %s, %s, %s)",
-                  (quiz_id, question, option_a, option_b, option_c, option_d, correct_answer))
-        conn.commit()
+        repo.execute(queries.INSERT_QUESTION,
+                     (quiz_id, question, option_a, option_b, option_c, option_d, correct_answer, difficulty_level),
+                     commit=True)
+        question_cache.invalidate(quiz_id)
         
         flash('Question added successfully!', 'success')
         # The count will be accurate upon the next load
@@ -685,13 +891,8 @@ def add_questions(quiz_id):
     # --- GET request logic (refreshed data) ---
     
     # Fetch questions list and quiz metadata
-    c.execute("SELECT * FROM questions WHERE quiz_id = %s", (quiz_id,))
-    questions = c.fetchall()
-    
-    c.execute("SELECT id, title, description, duration FROM quizzes WHERE id = %s", (quiz_id,))
-    quiz = c.fetchone()
-    
-    conn.close() 
+    questions = repo.all(queries.QUIZ_QUESTIONS, (quiz_id,))
+    quiz = repo.one(queries.QUIZ_BY_ID, (quiz_id,))
     
     if not quiz:
         flash('Quiz metadata not found.', 'error')
@@ -707,28 +908,81 @@ def add_questions(quiz_id):
                            quiz=quiz,
                            current_count=current_question_count,
                            min_count=20, # Pass minimum to template for display
-                           max_count=MAX_QUESTIONS)
+                           max_count=MAX_QUESTIONS_PER_QUIZ,
+                           import_columns=', '.join(question_import.FIELDS))
 
 
-@app.route('/lecturer/quiz/<int:quiz_id>/delete', methods=['POST'])
+@app.route('/lecturer/quiz/<int:quiz_id>/questions/import', methods=['POST'])
 @session_required(role='lecturer')
-def delete_quiz(quiz_id):
+def import_questions(quiz_id):
+    upload = request.files.get('questions_file')
+    if not upload or not upload.filename:
+        flash('Choose a CSV or JSON file to import.', 'error')
+        return redirect(url_for('add_questions', quiz_id=quiz_id))
+    data = upload.read(question_import.MAX_IMPORT_BYTES + 1)
+    if len(data) > question_import.MAX_IMPORT_BYTES:
+        flash(f'The file is larger than {question_import.MAX_IMPORT_BYTES // 1024} KB.', 'error')
+        return redirect(url_for('add_questions', quiz_id=quiz_id))
+    # Validate the whole file before touching the database
+    try:
+        questions = question_import.load(data, upload.filename)
+    except question_import.QuestionImportError as e:
+        for message in e.errors[:10]:
+            flash(message, 'error')
+        if len(e.errors) > 10:
+            flash(f'... and {len(e.errors) - 10} more problems. Nothing was imported.', 'error')
+        return redirect(url_for('add_questions', quiz_id=quiz_id))
+
     conn = get_db()
+    if not conn:
+        flash('Database connection error. Please try again later.', 'error')
+        return redirect(url_for('add_questions', quiz_id=quiz_id))
     c = conn.cursor(dictionary=True)
+    try:
+        # Lock the quiz row so concurrent imports can't both pass the limit check
+        quiz = repo.one(queries.QUIZ_OWNER_FOR_UPDATE, (quiz_id,))
+        if not quiz or quiz['created_by'] != session['user_id']:
+            conn.rollback()
+            flash('You do not have permission to edit this quiz.', 'error')
+            return redirect(url_for('lecturer_dashboard'))
+        current_count = repo.one(queries.QUESTION_COUNT, (quiz_id,))['count']
+        room = MAX_QUESTIONS_PER_QUIZ - current_count
+        if len(questions) > room:
+            conn.rollback()
+            flash(f'The file has {len(questions)} questions but this quiz only has room for {max(room, 0)} more '
+                  f'(limit {MAX_QUESTIONS_PER_QUIZ}). Nothing was imported.', 'error')
+            return redirect(url_for('add_questions', quiz_id=quiz_id))
+        imported = question_import.insert_questions(c, 'mysql', quiz_id, questions)
+        conn.commit()
+        question_cache.invalidate(quiz_id)
+        flash(f"Imported {imported} question{'s' if imported != 1 else ''}.", 'success')
+    except Error as e:
+        conn.rollback()
+        flash(f'Error importing questions: {e}', 'error')
+    finally:
+        c.close()
+        conn.close()
+    return redirect(url_for('add_questions', quiz_id=quiz_id))
+
+
+@app.route('/lecturer/quiz/<int:quiz_id>/delete', methods=['POST'])
+@session_required(role='lecturer')
+def delete_quiz(quiz_id):
     # Verify that the quiz belongs to this lecturer
-    c.execute("SELECT id, created_by FROM quizzes WHERE id = %s", (quiz_id,))
-    quiz = c.fetchone()
+    quiz = repo.one(queries.QUIZ_OWNER, (quiz_id,))
     
     if not quiz or quiz['created_by'] != session['user_id']:
         flash('You do not have permission to delete this quiz.', 'error')
-        c.close()
-        conn.close()
         return redirect(url_for('lecturer_dashboard'))
     
     # Delete quiz (questions will cascade delete due to ON DELETE CASCADE)
+    conn = get_db()
+    c = conn.cursor()
     try:
-        c.execute("DELETE FROM quizzes WHERE id = %s", (quiz_id,))
+        repo.execute(queries.DELETE_QUIZ, (quiz_id,))
+        bump_versions(c, 'mysql', 'quizzes')
         conn.commit()
+        question_cache.invalidate(quiz_id)
         flash('Quiz deleted successfully.', 'success')
     except Error as e:
         conn.rollback()
@@ -744,31 +998,13 @@ def delete_quiz(quiz_id):
 @session_required(role='lecturer')
 def lecturer_students():
     """View list of all students who attempted lecturer's quizzes"""
-    conn = get_db()
-    c = conn.cursor(dictionary=True)
     lecturer_id = session['user_id']
 
     # Get all students who have attempted any of this lecturer's quizzes
-    c.execute("""
-        SELECT DISTINCT u.id, u.username, u.email,
-               COUNT(DISTINCT r.id) as total_attempts,
-               COUNT(DISTINCT r.quiz_id) as quizzes_attempted,
-               MAX(r.completed_at) as last_attempt,
-               AVG(CAST(r.score AS FLOAT) / NULLIF(r.total_questions, 0)) * 100 as avg_score
-        FROM users u
-        JOIN results r ON u.id = r.user_id
-        JOIN quizzes q ON r.quiz_id = q.id
-        WHERE q.created_by = %s AND u.role = 'student'
-        GROUP BY u.id, u.username, u.email
-        ORDER BY MAX(r.completed_at) DESC
-    """, (lecturer_id,))
-    students = c.fetchall()
+    students = repo.all(queries.LECTURER_STUDENTS, (lecturer_id,))
 
     # Count total unique quizzes by this lecturer
-    c.execute("SELECT COUNT(*) as count FROM quizzes WHERE created_by = %s", (lecturer_id,))
-    total_lecturer_quizzes = c.fetchone()['count']
-
-    conn.close()
+    total_lecturer_quizzes = repo.one(queries.LECTURER_QUIZ_COUNT, (lecturer_id,))['count']
 
     return render_template(
         'lecturer_students.html',
@@ -782,145 +1018,48 @@ def lecturer_students():
 @session_required(role='lecturer')
 def lecturer_student_analytics(student_id):
     """View detailed analytics for a specific student's performance on lecturer's quizzes"""
-    conn = get_db()
-    c = conn.cursor(dictionary=True)
     lecturer_id = session['user_id']
 
     # Verify student exists
-    c.execute("SELECT id, username FROM users WHERE id = %s AND role='student'", (student_id,))
-    student = c.fetchone()
+    student = repo.one(queries.STUDENT_BY_ID, (student_id,))
     if not student:
         flash('Student not found', 'error')
         return redirect(url_for('lecturer_dashboard'))
 
-    # Get all quizzes created by this lecturer
-    c.execute("SELECT id, title FROM quizzes WHERE created_by = %s", (lecturer_id,))
-    lecturer_quizzes = {q['id']: q['title'] for q in c.fetchall()}
-
     # Get all results for this student on lecturer's quizzes
-    c.execute("""
-        SELECT r.id, r.quiz_id, r.score, r.total_questions, r.completed_at, q.title
-        FROM results r
-        JOIN quizzes q ON r.quiz_id = q.id
-        WHERE r.user_id = %s AND q.created_by = %s
-        ORDER BY r.completed_at DESC
-    """, (student_id, lecturer_id))
-    student_results = c.fetchall()
-
-    # Total attempts on this lecturer's quizzes
-    total_attempts = len(student_results)
-
-    # Calculate overall average score on lecturer's quizzes
-    if total_attempts > 0:
-        total_score = sum([r['score'] for r in student_results])
-        total_questions = sum([r['total_questions'] for r in student_results])
-        avg_score_pct = round((total_score / total_questions * 100) if total_questions > 0 else 0, 2)
-    else:
-        avg_score_pct = 0
-
-    # Best performance
-    best_score_pct = 0
-    best_quiz_title = 'N/A'
-    if student_results:
-        best_result = max(student_results, key=lambda x: (x['score'] / x['total_questions']) if x['total_questions'] > 0 else 0)
-        best_score_pct = round((best_result['score'] / best_result['total_questions'] * 100) if best_result['total_questions'] > 0 else 0, 2)
-        best_quiz_title = best_result['title']
-
-    # Quiz-by-quiz performance
-    quiz_performance = []
-    quiz_stats = {}
-    for result in student_results:
-        quiz_id = result['quiz_id']
-        if quiz_id not in quiz_stats:
-            quiz_stats[quiz_id] = {
-                'title': result['title'],
-                'attempts': 0,
-                'scores': [],
-                'dates': []
-            }
-        quiz_stats[quiz_id]['attempts'] += 1
-        score_pct = round((result['score'] / result['total_questions'] * 100) if result['total_questions'] > 0 else 0, 2)
-        quiz_stats[quiz_id]['scores'].append(score_pct)
-        quiz_stats[quiz_id]['dates'].append(result['completed_at'])
-
-    for quiz_id, stats in quiz_stats.items():
-        quiz_performance.append({
-            'title': stats['title'],
-            'attempts': stats['attempts'],
-            'best_score': max(stats['scores']) if stats['scores'] else 0,
-            'avg_score': round(sum(stats['scores']) / len(stats['scores']), 2) if stats['scores'] else 0,
-            'last_attempted': stats['dates'][0].strftime('%Y-%m-%d %H:%M') if stats['dates'] else 'N/A'
-        })
-
-    # Sort by most recent
-    quiz_performance.sort(key=lambda x: x['last_attempted'], reverse=True)
-
-    # Performance over time (last 15 attempts)
-    recent_attempts = sorted(student_results, key=lambda x: x['completed_at'])[-15:]
-    performance_data = {
-        'labels': [r['completed_at'].strftime('%m-%d %H:%M') if hasattr(r['completed_at'], 'strftime') else str(r['completed_at']) for r in recent_attempts],
-        'scores': [round((r['score'] / r['total_questions'] * 100) if r['total_questions'] > 0 else 0, 2) for r in recent_attempts]
-    }
+    student_results = repo.all(queries.LECTURER_STUDENT_RESULTS, (student_id, lecturer_id))
 
-    # Score distribution
-    score_counts = {'Excellent (80+)': 0, 'Good (60-79)': 0, 'Fair (40-59)': 0, 'Poor (<40)': 0}
-    for result in student_results:
-        score_pct = (result['score'] / result['total_questions'] * 100) if result['total_questions'] > 0 else 0
-        if score_pct >= 80:
-            score_counts['Excellent (80+)'] += 1
-        elif score_pct >= 60:
-            score_counts['Good (60-79)'] += 1
-        elif score_pct >= 40:
-            score_counts['Fair (40-59)'] += 1
-        else:
-            score_counts['Poor (<40)'] += 1
-
-    distribution_data = {
-        'labels': [k for k, v in score_counts.items() if v > 0] or ['No Data'],
-        'values': [v for v in score_counts.values() if v > 0] or [0]
-    }
-
-    # Improvement trend (comparing first half vs second half attempts)
-    improvement_trend = 0
-    if len(student_results) >= 4:
-        mid = len(student_results) // 2
-        first_half = sorted(student_results, key=lambda x: x['completed_at'])[:mid]
-        second_half = sorted(student_results, key=lambda x: x['completed_at'])[mid:]
-        
-        first_half_avg = sum([(r['score'] / r['total_questions']) for r in first_half]) / len(first_half) if first_half else 0
-        second_half_avg = sum([(r['score'] / r['total_questions']) for r in second_half]) / len(second_half) if second_half else 0
-        
-        improvement_trend = round((second_half_avg - first_half_avg) * 100, 2)
-
-    conn.close()
+    # All metrics computed in one vectorized pass (see analytics.py)
+    summary = summarize(ResultFrame.from_rows(student_results), recent=15,
+                        date_format='%Y-%m-%d %H:%M', trend=True)
 
     return render_template(
         'lecturer_student_analytics.html',
         student_name=student['username'],
         student_id=student_id,
-        total_attempts=total_attempts,
-        avg_score_pct=avg_score_pct,
-        best_score_pct=best_score_pct,
-        best_quiz_title=best_quiz_title,
-        improvement_trend=improvement_trend,
-        quiz_performance=quiz_performance,
-        performance_data=performance_data,
-        distribution_data=distribution_data
+        total_attempts=summary['total_attempts'],
+        avg_score_pct=summary['avg_score_pct'],
+        best_score_pct=summary['best_score_pct'],
+        best_quiz_title=summary['best_quiz_title'],
+        improvement_trend=summary['improvement_trend'],
+        quiz_performance=summary['quiz_performance'],
+        performance_data=summary['performance_data'],
+        distribution_data=summary['distribution_data']
     )
 
+# -------------------- Lecturer: Cohort Analytics --------------------
+@app.route('/lecturer/analytics/cohort')
+@session_required(role='lecturer')
+def lecturer_cohort_analytics():
+    """Class-wide score statistics across every attempt on this lecturer's quizzes (JSON)"""
+    rows = repo.all(queries.LECTURER_COHORT_RESULTS, (session['user_id'],))
+    return jsonify(cohort_summary(ResultFrame.from_rows(rows)))
+
 # -------------------- Lecturer: Notifications --------------------
 @app.route('/lecturer/notifications', methods=['GET', 'POST'])
 @session_required(role='lecturer')
 def lecturer_notifications():
-    conn = get_db()
-    c = conn.cursor(dictionary=True)
-    
-    # Fetch notifications (admin broadcast notifications)
-    c.execute("SELECT * FROM notifications ORDER BY created_at DESC LIMIT 20")
-    notifications = c.fetchall()
-    conn.close()
-    
-    return render_template('lecturer_notifications.html', notifications=notifications)
+    return notifications_page('lecturer_notifications.html')
 
 # ==================== STUDENT ROUTES ====================
 
@@ -929,145 +1068,44 @@ def lecturer_notifications():
 @session_required(role='student')
 def student_analytics():
     """Personal analytics for the logged-in student"""
-    conn = get_db()
-    c = conn.cursor(dictionary=True)
     user_id = session['user_id']
 
     # Get all results for this student
-    c.execute("""
-        SELECT r.id, r.quiz_id, r.score, r.total_questions, r.completed_at, q.title
-        FROM results r
-        JOIN quizzes q ON r.quiz_id = q.id
-        WHERE r.user_id = %s
-        ORDER BY r.completed_at DESC
-    """, (user_id,))
-    all_results = c.fetchall()
-
-    # Total quizzes attempted
-    total_attempts = len(all_results)
-    
-    # Get total available quizzes
-    c.execute("SELECT COUNT(*) as count FROM quizzes")
-    total_quizzes_available = c.fetchone()['count']
-
-    # Calculate overall average score
-    if total_attempts > 0:
-        total_score = sum([r['score'] for r in all_results])
-        total_questions = sum([r['total_questions'] for r in all_results])
-        avg_score_pct = round((total_score / total_questions * 100) if total_questions > 0 else 0, 2)
-    else:
-        avg_score_pct = 0
-
-    # Best performance
-    best_score_pct = 0
-    best_quiz_title = 'N/A'
-    if all_results:
-        best_result = max(all_results, key=lambda x: (x['score'] / x['total_questions']) if x['total_questions'] > 0 else 0)
-        best_score_pct = round((best_result['score'] / best_result['total_questions'] * 100) if best_result['total_questions'] > 0 else 0, 2)
-        best_quiz_title = best_result['title']
-
-    # Quiz-by-quiz performance
-    quiz_performance = []
-    quiz_stats = {}
-    for result in all_results:
-        quiz_id = result['quiz_id']
-        if quiz_id not in quiz_stats:
-            quiz_stats[quiz_id] = {
-                'title': result['title'],
-                'attempts': 0,
-                'scores': [],
-                'dates': []
-            }
-        quiz_stats[quiz_id]['attempts'] += 1
-        score_pct = round((result['score'] / result['total_questions'] * 100) if result['total_questions'] > 0 else 0, 2)
-        quiz_stats[quiz_id]['scores'].append(score_pct)
-        quiz_stats[quiz_id]['dates'].append(result['completed_at'])
-
-    for quiz_id, stats in quiz_stats.items():
-        quiz_performance.append({
-            'title': stats['title'],
-            'attempts': stats['attempts'],
-            'best_score': max(stats['scores']) if stats['scores'] else 0,
-            'avg_score': round(sum(stats['scores']) / len(stats['scores']), 2) if stats['scores'] else 0,
-            'last_attempted': stats['dates'][0].strftime('%Y-%m-%d') if stats['dates'] else 'N/A'
-        })
-
-    # Sort by attempts (most recent first by date within same attempt count)
-    quiz_performance.sort(key=lambda x: x['last_attempted'], reverse=True)
-
-    # Performance over time (last 10 attempts)
-    recent_attempts = sorted(all_results, key=lambda x: x['completed_at'])[-10:]
-    performance_data = {
-        'labels': [r['completed_at'].strftime('%m-%d %H:%M') if hasattr(r['completed_at'], 'strftime') else str(r['completed_at']) for r in recent_attempts],
-        'scores': [round((r['score'] / r['total_questions'] * 100) if r['total_questions'] > 0 else 0, 2) for r in recent_attempts]
-    }
+    all_results = repo.all(queries.STUDENT_RESULTS, (user_id,))
 
-    # Score distribution (categorize all scores)
-    score_counts = {'Excellent (80+)': 0, 'Good (60-79)': 0, 'Fair (40-59)': 0, 'Poor (<40)': 0}
-    for result in all_results:
-        score_pct = (result['score'] / result['total_questions'] * 100) if result['total_questions'] > 0 else 0
-        if score_pct >= 80:
-            score_counts['Excellent (80+)'] += 1
-        elif score_pct >= 60:
-            score_counts['Good (60-79)'] += 1
-        elif score_pct >= 40:
-            score_counts['Fair (40-59)'] += 1
-        else:
-            score_counts['Poor (<40)'] += 1
-
-    distribution_data = {
-        'labels': [k for k, v in score_counts.items() if v > 0] or ['No Data'],
-        'values': [v for v in score_counts.values() if v > 0] or [0]
-    }
-
-    # Current streak (consecutive days with attempts, if any)
-    current_streak = 0
-    if all_results:
-        sorted_dates = sorted(set([r['completed_at'].date() if hasattr(r['completed_at'], 'date') else r['completed_at'] for r in all_results]), reverse=True)
-        from datetime import datetime, timedelta
-        today = datetime.now().date()
-        for i, date in enumerate(sorted_dates):
-            expected_date = today - timedelta(days=i)
-            if date == expected_date:
-                current_streak += 1
-            else:
-                break
+    # Get total available quizzes
+    total_quizzes_available = repo.one(queries.COUNT_QUIZZES)['count']
 
-    conn.close()
+    # All metrics computed in one vectorized pass (see analytics.py)
+    summary = summarize(ResultFrame.from_rows(all_results), recent=10, date_format='%Y-%m-%d', streak=True)
 
     return render_template(
         'student_analytics.html',
-        total_quizzes_attempted=len(quiz_stats),
+        total_quizzes_attempted=summary['quizzes_attempted'],
         total_quizzes_available=total_quizzes_available,
-        total_attempts=total_attempts,
-        avg_score_pct=avg_score_pct,
-        best_score_pct=best_score_pct,
-        best_quiz_title=best_quiz_title,
-        current_streak=current_streak,
-        quiz_performance=quiz_performance,
-        performance_data=performance_data,
-        distribution_data=distribution_data
+        total_attempts=summary['total_attempts'],
+        avg_score_pct=summary['avg_score_pct'],
+        best_score_pct=summary['best_score_pct'],
+        best_quiz_title=summary['best_quiz_title'],
+        current_streak=summary['current_streak'],
+        quiz_performance=summary['quiz_performance'],
+        performance_data=summary['performance_data'],
+        distribution_data=summary['distribution_data']
     )
 
 
 @app.route('/student/dashboard')
 @session_required(role='student')
+@cache.policy(personal=True)
 def student_dashboard():
     
-    conn = get_db()
-    c = conn.cursor(dictionary=True)
-    c.execute("SELECT * FROM quizzes")
-    quizzes = c.fetchall()
-    c.execute("SELECT * FROM results WHERE user_id = %s ORDER BY completed_at DESC", (session['user_id'],))
-    results = c.fetchall()
+    quizzes = repo.all(queries.ALL_QUIZZES)
+    results = repo.all(queries.STUDENT_DASHBOARD_RESULTS, (session['user_id'],))
 
     # Student metrics: average score percent across results (if any)
-    c.execute("SELECT AVG(CAST(score AS FLOAT) / NULLIF(total_questions,0)) as avg_ratio FROM results WHERE user_id = %s", (session['user_id'],))
-    avg_row = c.fetchone()
+    avg_row = repo.one(queries.STUDENT_AVG, (session['user_id'],))
     avg_ratio = avg_row['avg_ratio'] if avg_row and avg_row['avg_ratio'] is not None else 0
     avg_percent = round(float(avg_ratio) * 100, 2) if avg_ratio else 0
-
-    conn.close()
     
     return render_template('student_dashboard.html', quizzes=quizzes, results=results, avg_percent=avg_percent)
 
@@ -1075,153 +1113,167 @@ def student_dashboard():
 @app.route('/student/notifications')
 @session_required(role='student')
 def student_notifications():
-    conn = get_db()
-    c = conn.cursor(dictionary=True)
-    
-    # Fetch notifications (admin broadcast notifications)
-    c.execute("SELECT * FROM notifications ORDER BY created_at DESC LIMIT 20")
-    notifications = c.fetchall()
-    conn.close()
-    
-    return render_template('student_notifications.html', notifications=notifications)
+    return notifications_page('student_notifications.html')
 
 # -------------------- Admin: Analytics --------------------
 @app.route('/admin/analytics')
 @session_required(role='admin')
+@cache.policy(personal=True)
 def admin_analytics():
-
-    conn = get_db()
-    c = conn.cursor(dictionary=True)
-    c.execute("SELECT COUNT(*) as total_students FROM users WHERE role='student'")
-    total_students = c.fetchone()['total_students']
-    c.execute("SELECT COUNT(*) as total_lecturers FROM users WHERE role='lecturer'")
-    total_lecturers = c.fetchone()['total_lecturers']
-    c.execute("SELECT COUNT(*) as total_quizzes FROM quizzes")
-    total_quizzes = c.fetchone()['total_quizzes']
-    c.execute("SELECT AVG(CAST(score AS FLOAT) / NULLIF(total_questions,0)) as avg_ratio FROM results")
-    avg_row = c.fetchone()
-    avg_ratio = avg_row['avg_ratio'] if avg_row and avg_row['avg_ratio'] is not None else 0
-    avg_score_pct = round(float(avg_ratio) * 100, 2) if avg_ratio else 0
-    conn.close()
-    
-    stats = {
-        'total_students': total_students,
-        'total_lecturers': total_lecturers,
-        'total_quizzes': total_quizzes,
-        'avg_score_pct': avg_score_pct
-    }
-    
+    stats = queries.overview_stats(repo)
     return render_template('admin_analytics.html', stats=stats)
 
 
 @app.route('/analytics')
 @session_required()
 def analytics():
+    return render_template('AnalyticsDashboard.html', **queries.analytics_dashboard(repo))
+
+# -------------------- Quiz attempt state --------------------
+# Attempt state is kept server-side (see attempt_store.py); the cookie only
+# carries quiz_attempt_<quiz_id> -> attempt ID.
+# The SQL store commits every write, so it gets a pool of its own rather than the
+# view's request connection. Being separate, it can't deadlock with requests that
+# already hold one of db_pool's connections. Every quiz step reads or writes it, so
+# it is sized like db_pool: one connection per thread that can be serving a view.
+attempt_pool = ConnectionPool(metrics.instrument(lambda: mysql.connector.connect(**DB_CONFIG)),
+                              ping=lambda conn: conn.ping(reconnect=False),
+                              **dict(pool_settings(),
+                                     size=int(os.environ.get('ATTEMPT_POOL_SIZE') or default_pool_size())))
+metrics.watch_pool(attempt_pool, name='attempt_pool')
+attempt_store = create_attempt_store(os.environ.get('ATTEMPT_STORE', 'sql'), connect=attempt_pool.connection,
+                                     dialect='mysql', ttl=int(os.environ.get('ATTEMPT_TTL', 6 * 3600)))
+
+def attempt_store_errors(retry=None):
+    """Turn attempt store database failures into a retry message instead of a 500.
+
+    retry -- endpoint (taking quiz_id) to send the student back to; POST routes pass
+             their question page so the open attempt is resumed, not restarted
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            try:
+                return f(*args, **kwargs)
+            except (Error, PoolTimeout) as e:
+                print(f"Error reaching the quiz attempt store: {e}")
+                message = 'The server is busy and could not load or save your quiz progress. Please try again in a few seconds.'
+                if request.path.startswith('/api/'):
+                    return api_error(message, 503)
+                flash(message, 'error')
+                if retry:
+                    return redirect(url_for(retry, quiz_id=kwargs['quiz_id']))
+                return redirect(url_for('student_dashboard'))
+        return decorated_function
+    return decorator
 
-    conn = get_db()
-    c = conn.cursor(dictionary=True)
+def start_attempt(quiz_id, quiz_state):
+    """Create a new attempt, replacing any unfinished one for the same quiz"""
+    key = f'quiz_attempt_{quiz_id}'
+    previous = session.get(key)
+    if previous:
+        attempt_store.delete(previous)
+    session[key] = attempt_store.create(session['user_id'], quiz_id, quiz_state)
+
+def load_attempt(quiz_id):
+    """Return (attempt_id, state) for the current user's open attempt, or (None, None)"""
+    attempt_id = session.get(f'quiz_attempt_{quiz_id}')
+    if not attempt_id:
+        return None, None
+    quiz_state = attempt_store.get(attempt_id, session['user_id'])
+    return (attempt_id, quiz_state) if quiz_state else (None, None)
+
+def end_attempt(quiz_id, attempt_id):
+    attempt_store.delete(attempt_id)
+    session.pop(f'quiz_attempt_{quiz_id}', None)
+
+# -------------------- Quiz question cache --------------------
+def load_quiz_bundle(quiz_id):
+    """Load a quiz and all of its questions (with answers) in two queries"""
+    try:
+        quiz = repo.one(queries.QUIZ_BY_ID, (quiz_id,))
+    except RuntimeError:
+        return None
+    questions = repo.all(queries.QUIZ_QUESTIONS, (quiz_id,)) if quiz else []
+    return QuizBundle.from_rows(quiz, questions) if quiz else None
 
-    # Basic stats
-    c.execute("SELECT COUNT(*) as total_students FROM users WHERE role='student'")
-    total_students = c.fetchone()['total_students']
-    c.execute("SELECT COUNT(*) as total_lecturers FROM users WHERE role='lecturer'")
-    total_lecturers = c.fetchone()['total_lecturers']
-    c.execute("SELECT COUNT(*) as total_quizzes FROM quizzes")
-    total_quizzes = c.fetchone()['total_quizzes']
-    c.execute("SELECT AVG(CAST(score AS FLOAT) / NULLIF(total_questions,0)) as avg_ratio FROM results")
-    avg_row = c.fetchone()
-    avg_ratio = avg_row['avg_ratio'] if avg_row and avg_row['avg_ratio'] is not None else 0
-    avg_score_pct = round(float(avg_ratio) * 100, 2) if avg_ratio else 0
-
-    # Monthly stats (last 6 months)
-    c.execute("SELECT DATE_FORMAT(completed_at, '%Y-%m') as month, COUNT(DISTINCT user_id) as unique_students, COUNT(*) as total_attempts FROM results WHERE completed_at >= DATE_SUB(CURDATE(), INTERVAL 6 MONTH) GROUP BY month ORDER BY month")
-    monthly_rows = c.fetchall()
-    monthly_labels = [r['month'] for r in monthly_rows]
-    monthly_unique_students = [r['unique_students'] for r in monthly_rows]
-    monthly_total_attempts = [r['total_attempts'] for r in monthly_rows]
-
-    # Top quizzes
-    c.execute("SELECT q.title, COUNT(r.id) as attempts, AVG(CAST(r.score AS FLOAT)/NULLIF(r.total_questions,0))*100 as avg_score FROM quizzes q LEFT JOIN results r ON q.id = r.quiz_id GROUP BY q.id ORDER BY attempts DESC LIMIT 6")
-    top_rows = c.fetchall()
-    quiz_labels = [r['title'] for r in top_rows]
-    quiz_attempts = [r['attempts'] or 0 for r in top_rows]
-    quiz_avg_scores = [round(r['avg_score'] or 0,2) for r in top_rows]
-
-    # Recent user activity (last 7 days)
-    c.execute("SELECT DATE(completed_at) as date, COUNT(DISTINCT user_id) as active_students, COUNT(*) as quiz_attempts FROM results WHERE completed_at >= DATE_SUB(CURDATE(), INTERVAL 7 DAY) GROUP BY DATE(completed_at) ORDER BY DATE(completed_at) DESC")
-    activity_rows = c.fetchall()
-    user_activity = []
-    for r in activity_rows:
-        user_activity.append({
-            'date': r['date'],
-            'active_students': r['active_students'],
-            'quiz_attempts': r['quiz_attempts']
-        })
+# Questions asked per attempt
+QUESTIONS_PER_ATTEMPT = 20
 
-    conn.close()
+# Size limit of a quiz's question bank (form and bulk import)
+MAX_QUESTIONS_PER_QUIZ = int(os.environ.get('MAX_QUESTIONS_PER_QUIZ', 20))
+
+question_cache = QuestionCache(load_quiz_bundle, ttl=int(os.environ.get('QUESTION_CACHE_TTL', 300)))
+metrics.gauge('smartquiz_question_cache', 'Question bundle cache counters', 'stat', question_cache.stats)
 
-    stats = {
-        'total_students': total_students,
-        'total_lecturers': total_lecturers,
-        'total_quizzes': total_quizzes,
-        'avg_score_pct': avg_score_pct
+def new_quiz_state(bundle, mode='paged'):
+    """Fresh attempt state for a quiz bundle, or None if the quiz has no questions"""
+    # Per-attempt seed: each student gets their own order, drawn in Python from the
+    # cached strata instead of ORDER BY FIELD(difficulty_level, ...), RAND() per attempt
+    shuffle_seed = secrets.randbits(64)
+    question_ids = bundle.draw(QUESTIONS_PER_ATTEMPT, random.Random(shuffle_seed))
+    if not question_ids:
+        return None
+    # Stored server-side; the session cookie only carries the attempt ID
+    return {
+        'question_ids': question_ids, # This attempt's questions, in order
+        'shuffle_seed': shuffle_seed,
+        'mode': mode,                 # 'paged' (one question per page) or 'bundle'
+        'current_index': 0,           # Index of the next question to ask
+        'answers': {},                # Stores user's answers and time taken
+        'score': 0,
+        'start_time': datetime.now().isoformat(),
+        'total_questions': len(question_ids)
     }
 
-    return render_template('AnalyticsDashboard.html',
-                           stats=stats,
-                           monthly_labels=monthly_labels,
-                           monthly_unique_students=monthly_unique_students,
-                           monthly_total_attempts=monthly_total_attempts,
-                           quiz_labels=quiz_labels,
-                           quiz_attempts=quiz_attempts,
-                           quiz_avg_scores=quiz_avg_scores,
-                           user_activity=user_activity)
+def save_attempt_result(quiz_id, quiz_state, total_questions):
+    """Write the results row, all per-question answers and the aggregates in one transaction.
+
+    Answers are only kept in the attempt state while the quiz is running and are
+    written here with a single multi-row insert. Returns the new result id, or None.
+    """
+    conn = get_db()
+    if not conn:
+        flash('Database connection error. Could not submit quiz results.', 'error')
+        return None
+    c = conn.cursor()
+    try:
+        result_id = repo.execute(queries.INSERT_RESULT,
+                                 (session['user_id'], quiz_id, quiz_state['score'], total_questions))
+        aggregates.record_result(c, 'mysql', session['user_id'], quiz_id, quiz_state['score'], total_questions)
+        answer_rows = [(result_id, int(question_id), answer['answer'], bool(answer['is_correct']),
+                        answer['time_taken'], answer['difficulty'])
+                       for question_id, answer in quiz_state['answers'].items()]
+        if answer_rows:
+            repo.executemany(queries.INSERT_ATTEMPT_ANSWER, answer_rows)
+        conn.commit()
+        return result_id
+    except Exception as e:
+        conn.rollback()
+        flash(f"[ERROR] Failed to insert results: {e}", 'error')
+        return None
+    finally:
+        c.close()
+        conn.close()
 
 # app.py (New / Modified Routes)
 
 @app.route('/student/quiz/<int:quiz_id>')
 @session_required(role='student')
+@attempt_store_errors()
 def take_quiz(quiz_id):
-    conn = get_db()
-    if not conn:
-        flash('Database connection error. Please try again.', 'error')
-        return redirect(url_for('student_dashboard'))
-    
-    c = conn.cursor(dictionary=True)
-    
-    # 1. Fetch Quiz Info
-    c.execute("SELECT * FROM quizzes WHERE id = %s", (quiz_id,))
-    quiz = c.fetchone()
-    if not quiz:
+    # Quiz and question IDs (bucketed by difficulty) come from the per-process
+    # bundle cache, so a whole class pressing "Start" costs at most one load
+    bundle = question_cache.get(quiz_id)
+    if not bundle:
         flash('Quiz not found.', 'error')
-        conn.close()
         return redirect(url_for('student_dashboard'))
-    
-    # 2. Get ALL question IDs for the quiz (to be managed dynamically)
-    # We will fetch a list of all IDs, sorted by a weighted random order,
-    # prioritizing a mix of difficulties for the initial set.
-    c.execute("""
-        SELECT id, difficulty_level 
-        FROM questions 
-        WHERE quiz_id = %s 
-        ORDER BY FIELD(difficulty_level, 'Medium', 'Easy', 'Hard'), RAND()
-    """, (quiz_id,))
-    all_question_data = c.fetchall()
-    conn.close()
 
-    if not all_question_data:
+    quiz_state = new_quiz_state(bundle)
+    if not quiz_state:
         flash('This quiz has no questions.', 'error')
         return redirect(url_for('student_dashboard'))
-
-    # Store necessary quiz state in the session
-    session[f'quiz_state_{quiz_id}'] = {
-        'question_ids': [q['id'] for q in all_question_data], # Full list of IDs
-        'current_index': 0,           # Index of the next question to ask
-        'answers': {},                # Stores user's answers and time taken
-        'score': 0,
-        'start_time': datetime.now().isoformat(),
-        'total_questions': len(all_question_data)
-    }
+    start_attempt(quiz_id, quiz_state)
 
     # Redirect to the first question
     return redirect(url_for('serve_question', quiz_id=quiz_id))
@@ -1229,9 +1281,9 @@ def take_quiz(quiz_id):
 
 @app.route('/student/quiz/<int:quiz_id>/question')
 @session_required(role='student')
+@attempt_store_errors()
 def serve_question(quiz_id):
-    state_key = f'quiz_state_{quiz_id}'
-    quiz_state = session.get(state_key)
+    attempt_id, quiz_state = load_attempt(quiz_id)
     # Debug info
     print(f"[DEBUG] serve_question: quiz_state={quiz_state}")
     if not quiz_state:
@@ -1248,29 +1300,17 @@ def serve_question(quiz_id):
         return redirect(url_for('submit_quiz', quiz_id=quiz_id))
 
     current_question_id = question_ids[current_index]
-    conn = get_db()
-    if not conn:
-        flash('Database connection error. Please try again.', 'error')
-        return redirect(url_for('student_dashboard'))
-    c = conn.cursor(dictionary=True)
-    # Fetch current question details
-    c.execute("SELECT * FROM questions WHERE id = %s", (current_question_id,))
-    question = c.fetchone()
-    c.execute("SELECT id, title, description, duration FROM quizzes WHERE id = %s", (quiz_id,))
-    quiz = c.fetchone()
-    conn.close()
+    # Fetch current question details from the cached quiz bundle
+    bundle, question = question_cache.lookup(quiz_id, current_question_id)
+    quiz = bundle.quiz if bundle else None
     # Start time for this specific question
     quiz_state['question_start_time'] = datetime.now().isoformat()
-    session[state_key] = quiz_state # Update session
+    attempt_store.save(attempt_id, quiz_state)
     # Pass only the current question as a list
     if not question:
         flash('Question not found.', 'error')
         return redirect(url_for('student_dashboard'))
-    # Ensure question contains an id
-    if 'id' not in question:
-        flash('Invalid question format.', 'error')
-        return redirect(url_for('student_dashboard'))
-    print(f"[DEBUG] serve_question: rendering question {question['id']}")
+    print(f"[DEBUG] serve_question: rendering question {question.id}")
     return render_template('take_quiz.html', 
                            quiz=quiz, 
                            questions=[question],
@@ -1279,9 +1319,9 @@ def serve_question(quiz_id):
 
 @app.route('/student/submit-quiz/<int:quiz_id>', methods=['POST'])
 @session_required(role='student')
+@attempt_store_errors(retry='serve_question')
 def submit_quiz(quiz_id):
-    state_key = f'quiz_state_{quiz_id}'
-    quiz_state = session.get(state_key)
+    attempt_id, quiz_state = load_attempt(quiz_id)
     
     if not quiz_state:
         # If no quiz state, this POST is likely from a manual end, proceed to final submission
@@ -1298,24 +1338,10 @@ def submit_quiz(quiz_id):
         # User wants to end the quiz now, finalize immediately
         total_questions = quiz_state['total_questions']
         score = quiz_state['score']
-        conn = get_db()
-        if not conn:
-            flash('Database connection error. Could not submit quiz results.', 'error')
-            return redirect(url_for('student_dashboard'))
-        try:
-            c = conn.cursor()
-            c.execute("INSERT INTO results (user_id, quiz_id, score, total_questions) VALUES (%s, %s, %s, %s)",
-                      (session['user_id'], quiz_id, score, total_questions))
-            conn.commit()
-            result_id = c.lastrowid
+        result_id = save_attempt_result(quiz_id, quiz_state, total_questions)
+        if result_id:
             flash(f"Quiz ended! Your final score: {score}/{total_questions}", 'success')
-        except Exception as e:
-            flash(f"[ERROR] Failed to insert results: {e}", 'error')
-            result_id = None
-        finally:
-            c.close()
-            conn.close()
-        session.pop(state_key, None)
+        end_attempt(quiz_id, attempt_id)
         
         # Redirect to result details page if result was saved successfully
         if result_id:
@@ -1331,25 +1357,18 @@ def submit_quiz(quiz_id):
         print(f"[DEBUG] current_question_id={current_question_id}, user_answer={user_answer}")
         start_time = datetime.fromisoformat(quiz_state.pop('question_start_time'))
         time_taken = (datetime.now() - start_time).total_seconds()
-        conn = get_db()
-        if not conn:
-            flash('Database connection error. Please try again.', 'error')
-            return redirect(url_for('student_dashboard'))
-        c = conn.cursor(dictionary=True)
-        c.execute("SELECT correct_answer, difficulty_level FROM questions WHERE id = %s", (current_question_id,))
-        question_data = c.fetchone()
+        _, question_data = question_cache.lookup(quiz_id, current_question_id)
         print(f"[DEBUG] question_data={question_data}")
-        conn.close()
         # Normalize answers for comparison: strip whitespace and convert to uppercase
         user_answer_normalized = user_answer.strip().upper() if user_answer else None
-        correct_answer_normalized = question_data['correct_answer'].strip().upper() if question_data and question_data['correct_answer'] else None
+        correct_answer_normalized = question_data.correct_answer.strip().upper() if question_data and question_data.correct_answer else None
         is_correct = (user_answer_normalized == correct_answer_normalized) if user_answer_normalized and correct_answer_normalized else False
         print(f"[DEBUG] is_correct={is_correct}, user_answer_normalized={user_answer_normalized}, correct_answer_normalized={correct_answer_normalized}")
         quiz_state['answers'][str(current_question_id)] = {
             'answer': user_answer,
             'is_correct': is_correct,
             'time_taken': time_taken,
-            'difficulty': question_data['difficulty_level'] if question_data else 'Unknown'
+            'difficulty': question_data.difficulty_level if question_data else 'Unknown'
         }
         if is_correct:
             quiz_state['score'] += 1
@@ -1358,29 +1377,15 @@ def submit_quiz(quiz_id):
             flash(f"Incorrect answer. ({current_index + 1}/{20})", 'error')
         # Always increment by 1 for next question
         quiz_state['current_index'] += 1
-        session[state_key] = quiz_state
+        attempt_store.save(attempt_id, quiz_state)
         # If quiz is finished, finalize
         if quiz_state['current_index'] >= 20:
             total_questions = 20
             score = quiz_state['score']
-            conn = get_db()
-            if not conn:
-                flash('Database connection error. Could not submit quiz results.', 'error')
-                return redirect(url_for('student_dashboard'))
-            try:
-                c = conn.cursor()
-                c.execute("INSERT INTO results (user_id, quiz_id, score, total_questions) VALUES (%s, %s, %s, %s)",
-                          (session['user_id'], quiz_id, score, total_questions))
-                conn.commit()
-                result_id = c.lastrowid
+            result_id = save_attempt_result(quiz_id, quiz_state, total_questions)
+            if result_id:
                 flash(f'Quiz submitted! Your final score: {score}/{total_questions}', 'success')
-            except Exception as e:
-                flash(f"[ERROR] Failed to insert results: {e}", 'error')
-                result_id = None
-            finally:
-                c.close()
-                conn.close()
-            session.pop(state_key, None)
+            end_attempt(quiz_id, attempt_id)
             
             # Redirect to result details page if result was saved successfully
             if result_id:
@@ -1393,18 +1398,401 @@ def submit_quiz(quiz_id):
 
     # --- FINAL SUBMISSION (The quiz is officially over) ---
     # (Handled above, no need for duplicate logic)
+# ==================== STUDENT: SINGLE-PAGE QUIZ MODE ====================
+# All of the attempt's questions (without answers) are delivered in one page;
+# the browser moves between them locally and the whole answer set is graded
+# in a single POST against the cached answer key.
+
+# Grace period on top of the quiz duration for slow networks / last-second submits
+BUNDLE_SUBMIT_GRACE = 60
+
+def client_seconds(value):
+    """Parse a client-reported duration in seconds; None if missing or not a finite number"""
+    try:
+        seconds = float(value)
+    except (TypeError, ValueError):
+        return None
+    return max(seconds, 0.0) if math.isfinite(seconds) else None
+
+def fit_times(reported, elapsed):
+    """Fit client-reported seconds per question into the time that really passed.
+
+    Reported times are scaled down if they add up to more than `elapsed`;
+    questions without a usable time share whatever is left evenly.
+    """
+    known = sum(t for t in reported if t is not None)
+    scale = elapsed / known if known > elapsed else 1.0
+    missing = [t for t in reported if t is None]
+    share = (elapsed - known * scale) / len(missing) if missing else 0.0
+    return [round(t * scale if t is not None else share, 3) for t in reported]
+
+def grade_bundle(bundle, quiz_state, form):
+    """Grade every answer of a single-page attempt into quiz_state.
+
+    Client-reported seconds per question are clamped and, if they add up to
+    more than the time the attempt was actually open (capped at the quiz
+    deadline), scaled down to fit.
+    """
+    start = datetime.fromisoformat(quiz_state['start_time'])
+    elapsed = (datetime.now() - start).total_seconds()
+    if bundle.quiz.get('duration'):
+        elapsed = min(elapsed, bundle.quiz['duration'] * 60 + BUNDLE_SUBMIT_GRACE)
+    elapsed = max(elapsed, 0.0)
+
+    times = fit_times([client_seconds(form.get(f'time_{question_id}', 0)) for question_id in quiz_state['question_ids']],
+                      elapsed)
+    reported = dict(zip(quiz_state['question_ids'], times))
+
+    score = 0
+    answers = {}
+    for question_id in quiz_state['question_ids']:
+        question = bundle.question(question_id)
+        user_answer = form.get(f'question_{question_id}')
+        user_answer_normalized = user_answer.strip().upper() if user_answer else None
+        correct_answer_normalized = question.correct_answer.strip().upper() if question and question.correct_answer else None
+        is_correct = bool(user_answer_normalized and user_answer_normalized == correct_answer_normalized)
+        score += is_correct
+        answers[str(question_id)] = {
+            'answer': user_answer,
+            'is_correct': is_correct,
+            'time_taken': reported[question_id],
+            'difficulty': question.difficulty_level if question else 'Unknown'
+        }
+    quiz_state['answers'] = answers
+    quiz_state['score'] = score
+    quiz_state['current_index'] = len(quiz_state['question_ids'])
+
+@app.route('/student/quiz/<int:quiz_id>/single-page')
+@session_required(role='student')
+@attempt_store_errors()
+def take_quiz_bundle(quiz_id):
+    bundle = question_cache.get(quiz_id)
+    if not bundle:
+        flash('Quiz not found.', 'error')
+        return redirect(url_for('student_dashboard'))
+
+    # A reload resumes the open single-page attempt instead of reshuffling it
+    attempt_id, quiz_state = load_attempt(quiz_id)
+    if not quiz_state or quiz_state.get('mode') != 'bundle':
+        quiz_state = new_quiz_state(bundle, mode='bundle')
+        if not quiz_state:
+            flash('This quiz has no questions.', 'error')
+            return redirect(url_for('student_dashboard'))
+        start_attempt(quiz_id, quiz_state)
+
+    # Question objects carry the answer key; only hand the template what the student may see
+    questions = []
+    for question_id in quiz_state['question_ids']:
+        question = bundle.question(question_id)
+        if question:
+            questions.append({'id': question.id, 'question': question.question,
+                              'option_a': question.option_a, 'option_b': question.option_b,
+                              'option_c': question.option_c, 'option_d': question.option_d})
+    return render_template('take_quiz_bundle.html', quiz=bundle.quiz, questions=questions)
+
+@app.route('/student/quiz/<int:quiz_id>/single-page', methods=['POST'])
+@session_required(role='student')
+@attempt_store_errors(retry='take_quiz_bundle')
+def submit_quiz_bundle(quiz_id):
+    attempt_id, quiz_state = load_attempt(quiz_id)
+    if not quiz_state or quiz_state.get('mode') != 'bundle':
+        flash('Quiz session expired. Please start the quiz again.', 'error')
+        return redirect(url_for('student_dashboard'))
+    bundle = question_cache.get(quiz_id)
+    if not bundle:
+        flash('Quiz not found.', 'error')
+        return redirect(url_for('student_dashboard'))
+
+    grade_bundle(bundle, quiz_state, request.form)
+    total_questions = quiz_state['total_questions']
+    result_id = save_attempt_result(quiz_id, quiz_state, total_questions)
+    if not result_id:
+        # Keep the attempt so the student can submit again
+        return redirect(url_for('take_quiz_bundle', quiz_id=quiz_id))
+    end_attempt(quiz_id, attempt_id)
+    flash(f"Quiz submitted! Your final score: {quiz_state['score']}/{total_questions}", 'success')
+    return redirect(url_for('view_result', result_id=result_id))
+
+# ==================== STUDENT: QUIZ AUTOSAVE API ====================
+# JSON alternative to the submit_quiz -> serve_question round trip for
+# one-question-per-page attempts: the page posts its answer(s) here and gets
+# the next question back, with no template render and no flash messages.
+# take_quiz.html uses it when JavaScript is available and falls back to the
+# plain form otherwise.
+#
+#   POST /api/quiz/<quiz_id>/answers
+#   {"answers": [{"question_id": 12, "answer": "B", "time_taken": 8.5}, ...], "finish": false}
+#
+# Answers must follow the attempt's question order; re-sending an answer that
+# was already recorded is a no-op, so the page can autosave as often as it likes.
+
+def api_error(message, status):
+    return jsonify({'status': 'error', 'error': message}), status
+
+def question_payload(question, number, total):
+    """What the page needs to show a question - never the answer key"""
+    return {
+        'id': question.id,
+        'number': number,
+        'total': total,
+        'question': question.question,
+        'options': {'A': question.option_a, 'B': question.option_b,
+                    'C': question.option_c, 'D': question.option_d},
+    }
+
+def record_answers(bundle, quiz_state, submitted):
+    """Grade answers for the next unanswered questions in order.
+
+    Returns (results, None) or (None, (message, HTTP status)). The time since the current question was served
+    is split between the answers using the client's own timings, as far as
+    they fit.
+    """
+    question_ids = quiz_state['question_ids']
+    pending = []
+    index = quiz_state['current_index']
+    for item in submitted:
+        if not isinstance(item, dict):
+            return None, ('Each answer must be an object', 400)
+        try:
+            question_id = int(item.get('question_id'))
+        except (TypeError, ValueError):
+            return None, ('question_id must be an integer', 400)
+        if question_id not in question_ids:
+            return None, (f'Question {question_id} is not part of this attempt', 400)
+        if str(question_id) in quiz_state['answers'] or any(question_id == p[0] for p in pending):
+            continue  # Already recorded (autosave retry)
+        if index >= len(question_ids) or question_ids[index] != question_id:
+            return None, (f'Question {question_id} is not the next question', 409)
+        answer = item.get('answer')
+        if answer is not None and not isinstance(answer, str):
+            return None, ('answer must be a string', 400)
+        pending.append((question_id, answer, client_seconds(item.get('time_taken'))))
+        index += 1
+
+    started = quiz_state.pop('question_start_time', None) if pending else None
+    elapsed = (datetime.now() - datetime.fromisoformat(started)).total_seconds() if started else 0.0
+    times = fit_times([p[2] for p in pending], max(elapsed, 0.0))
+
+    results = []
+    for (question_id, answer, _), time_taken in zip(pending, times):
+        question = bundle.question(question_id)
+        answer_normalized = answer.strip().upper() if answer else None
+        correct_normalized = question.correct_answer.strip().upper() if question and question.correct_answer else None
+        is_correct = bool(answer_normalized and answer_normalized == correct_normalized)
+        quiz_state['answers'][str(question_id)] = {
+            'answer': answer,
+            'is_correct': is_correct,
+            'time_taken': time_taken,
+            'difficulty': question.difficulty_level if question else 'Unknown'
+        }
+        quiz_state['score'] += is_correct
+        quiz_state['current_index'] += 1
+        results.append({'question_id': question_id, 'is_correct': is_correct})
+    return results, None
+
+@app.route('/api/quiz/<int:quiz_id>/answers', methods=['POST'])
+@attempt_store_errors()
+def api_quiz_answers(quiz_id):
+    if 'user_id' not in session or session.get('role') != 'student':
+        return api_error('Session expired', 401)
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict):
+        return api_error('Expected a JSON object', 400)
+    submitted = payload.get('answers', [])
+    if not isinstance(submitted, list):
+        return api_error('answers must be a list', 400)
+
+    attempt_id, quiz_state = load_attempt(quiz_id)
+    if not quiz_state:
+        return api_error('No open attempt for this quiz', 404)
+    if quiz_state.get('mode', 'paged') != 'paged':
+        return api_error('This attempt is submitted as a whole', 409)
+    bundle = question_cache.get(quiz_id)
+    if not bundle:
+        return api_error('Quiz not found', 404)
+
+    results, error = record_answers(bundle, quiz_state, submitted)
+    if error:
+        return api_error(*error)
+
+    question_ids = quiz_state['question_ids']
+    total_questions = quiz_state['total_questions']
+    if payload.get('finish') or quiz_state['current_index'] >= len(question_ids):
+        result_id = save_attempt_result(quiz_id, quiz_state, total_questions)
+        if not result_id:
+            # save_attempt_result flashed the reason; keep it out of the next page
+            session.pop('_flashes', None)
+            attempt_store.save(attempt_id, quiz_state)
+            return api_error('Could not save the results, please try again', 503)
+        end_attempt(quiz_id, attempt_id)
+        return jsonify({'status': 'finished', 'results': results, 'score': quiz_state['score'],
+                        'total_questions': total_questions,
+                        'result_url': url_for('view_result', result_id=result_id)})
+
+    _, question = question_cache.lookup(quiz_id, question_ids[quiz_state['current_index']])
+    if not question:
+        # Edited out of the quiz since the attempt started; the HTML flow reports this
+        attempt_store.save(attempt_id, quiz_state)
+        return api_error('Question not found', 410)
+    # The clock for the next question starts when it is first handed out
+    if results or 'question_start_time' not in quiz_state:
+        quiz_state['question_start_time'] = datetime.now().isoformat()
+        attempt_store.save(attempt_id, quiz_state)
+    return jsonify({'status': 'ok', 'results': results, 'answered': quiz_state['current_index'],
+                    'total_questions': total_questions,
+                    'question': question_payload(question, quiz_state['current_index'] + 1, total_questions)})
+
+# ==================== BACKGROUND JOBS ====================
+# Slow admin work is queued in the jobs table and run by the worker process
+# (`flask --app app jobs-worker`, the Procfile's worker: line), or with
+# JOBS_IN_PROCESS=1 by a thread in each web worker.
+
+# The queue checks out connections of its own, so enqueueing never commits a view's
+# open transaction and the worker's polls never sit in one stale snapshot
+job_queue = JobQueue(db_pool.connection)
+# Abandoned quiz attempts are purged with the worker's housekeeping (every 5 minutes)
+job_queue.maintenance.append(attempt_store.purge_expired)
+
+if os.environ.get('JOBS_IN_PROCESS', '0') == '1':
+    @app.before_request
+    def start_job_worker():
+        # Started from the first request so each forked gunicorn worker gets its own thread
+        job_queue.start_in_process(context=app.app_context)
+
+def job_counts():
+    try:
+        return job_queue.counts()
+    except (Error, RuntimeError, PoolTimeout):
+        return {}
+
+metrics.gauge('smartquiz_jobs', 'Background jobs by status', 'status', job_counts)
+
+# Results are deleted in slices so no single transaction holds locks for long
+DELETE_USER_BATCH = 1000
+
+@job_queue.task('delete_user', timeout=900)
+def delete_user_job(payload):
+    """Delete a user and their results, then refresh the aggregates they fed"""
+    user_id = payload['user_id']
+    deleted = 0
+    # A quiz may have been created since the job was queued; check before deleting anything
+    owned = repo.one(queries.LECTURER_QUIZ_COUNT, (user_id,))['count']
+    if owned:
+        raise ValueError(f'User {user_id} owns {owned} quiz(zes); delete or reassign them first')
+    conn = get_db()
+    c = conn.cursor()
+    try:
+        while True:
+            batch = repo.all(queries.USER_RESULT_BATCH, (user_id, DELETE_USER_BATCH))
+            if not batch:
+                break
+            # The batch is the user's oldest ids, so "up to the last one" deletes exactly these
+            repo.execute(queries.DELETE_USER_RESULTS_UPTO, (user_id, batch[-1]['id']))
+            conn.commit()
+            deleted += len(batch)
+        for query in queries.DELETE_USER_ROWS:
+            repo.execute(query, (user_id,))
+        repo.execute(queries.DELETE_USER, (user_id,))
+        bump_versions(c, 'mysql', 'users')
+        conn.commit()
+    except Error:
+        conn.rollback()
+        raise
+    finally:
+        c.close()
+        conn.close()
+    if deleted:
+        # quiz_stats sums every student's results; recompute it without this user's
+        job_queue.enqueue('rebuild_aggregates', {'reason': f'user {user_id} deleted'})
+    return {'results_deleted': deleted}
+
+@job_queue.task('rebuild_aggregates', timeout=1800, max_attempts=2, priority=-1)
+def rebuild_aggregates_job(payload):
+    conn = get_db()
+    try:
+        aggregates.rebuild(conn)
+    finally:
+        conn.close()
+    return {}
+
+@app.cli.command('jobs-worker')
+@click.option('--burst', is_flag=True, help='Exit once the queue is empty.')
+@click.option('--poll-interval', default=2.0, show_default=True, help='Seconds between polls of an empty queue.')
+def jobs_worker_command(burst, poll_interval):
+    """Run queued background jobs."""
+    # A fresh app context per poll/job: handlers' get_db() connections go back to the pool
+    # (and are health-checked) each time instead of living in the CLI command's context
+    job_queue.work(poll_interval=poll_interval, burst=burst, context=app.app_context)
+
+def job_json(job):
+    """A jobs row for the status API"""
+    return {
+        'id': job['id'],
+        'kind': job['kind'],
+        'status': job['status'],
+        'priority': job['priority'],
+        'attempts': job['attempts'],
+        'max_attempts': job['max_attempts'],
+        'result': json.loads(job['result']) if job['result'] else None,
+        'error': job['error'],
+        'created_at': job['created_at'].isoformat() if hasattr(job['created_at'], 'isoformat') else job['created_at'],
+        'finished_at': job['finished_at'],
+    }
+
+@app.route('/admin/jobs')
+@session_required(role='admin')
+def admin_jobs():
+    try:
+        jobs, counts = job_queue.recent(), job_queue.counts()
+    except (Error, RuntimeError, PoolTimeout) as e:
+        flash(f'Error loading jobs: {e}', 'error')
+        jobs, counts = [], {}
+    return render_template('admin_jobs.html', jobs=jobs, counts=counts)
+
+@app.route('/admin/jobs/rebuild-aggregates', methods=['POST'])
+@session_required(role='admin')
+def admin_rebuild_aggregates():
+    try:
+        job_id = job_queue.enqueue('rebuild_aggregates', {'reason': 'requested by admin'}, created_by=session['user_id'])
+        flash(f'Aggregate rebuild queued (job #{job_id}).', 'success')
+    except (Error, RuntimeError, PoolTimeout) as e:
+        flash(f'Error queueing job: {e}', 'error')
+    return redirect(url_for('admin_jobs'))
+
+# Status API polled by the admin jobs page:
+#   GET /api/jobs            -> {"counts": {...}, "jobs": [...newest 50...]}
+#   GET /api/jobs/<job_id>   -> {"job": {...}}
+@app.route('/api/jobs')
+def api_jobs():
+    if session.get('role') != 'admin':
+        return api_error('Session expired', 401)
+    try:
+        return jsonify({'status': 'ok', 'counts': job_queue.counts(),
+                        'jobs': [job_json(job) for job in job_queue.recent()]})
+    except (Error, RuntimeError, PoolTimeout) as e:
+        return api_error(f'Jobs unavailable: {e}', 503)
+
+@app.route('/api/jobs/<int:job_id>')
+def api_job(job_id):
+    if session.get('role') != 'admin':
+        return api_error('Session expired', 401)
+    try:
+        job = job_queue.get(job_id)
+    except (Error, RuntimeError, PoolTimeout) as e:
+        return api_error(f'Jobs unavailable: {e}', 503)
+    if not job:
+        return api_error('Job not found', 404)
+    return jsonify({'status': 'ok', 'job': job_json(job)})
+
 # ==================== STUDENT: VIEW RESULT DETAILS ====================
 @app.route('/student/result/<int:result_id>')
 @session_required(role='student')
 def view_result(result_id):
-    conn = get_db()
-    if not conn:
+    try:
+        result = repo.one(queries.STUDENT_RESULT, (result_id, session['user_id']))
+    except RuntimeError:
         flash('Database connection error.', 'error')
         return redirect(url_for('student_dashboard'))
-    c = conn.cursor(dictionary=True)
-    c.execute("SELECT r.*, q.title FROM results r JOIN quizzes q ON r.quiz_id = q.id WHERE r.id = %s AND r.user_id = %s", (result_id, session['user_id']))
-    result = c.fetchone()
-    conn.close()
     if not result:
         flash('Result not found or access denied.', 'error')
         return redirect(url_for('student_dashboard'))
@@ -3,13 +3,20 @@ SmartQuiz - SQLite Version for Replit
 This version uses SQLite instead of MySQL for easier deployment on Replit
 """
 
-from flask import Flask, render_template, request, redirect, url_for, session, flash, send_from_directory
+from flask import Flask, render_template, request, redirect, url_for, session, flash, send_from_directory, g, has_app_context
 from werkzeug.security import generate_password_hash, check_password_hash
 import sqlite3
 from datetime import datetime
 import os
+import threading
 from dotenv import load_dotenv
 
+import schema
+import queries
+from db_pool import ConnectionPool, pool_settings
+from queries import Repository
+from compress import Compress
+
 # Load environment variables
 load_dotenv()
 
@@ -19,6 +26,8 @@ DB_PATH = 'smartquiz.db'
 
 app = Flask(__name__, template_folder=TEMPLATES_DIR, static_folder=None)
 app.secret_key = os.getenv('SECRET_KEY', 'smartquiz-secret-key-2025')
+app.wsgi_app = Compress(app.wsgi_app, min_size=int(os.getenv('COMPRESS_MIN_SIZE', 1024)),
+                        level=int(os.getenv('COMPRESS_LEVEL', 6)))
 
 def dict_factory(cursor, row):
     """Convert database row to dictionary"""
@@ -27,104 +36,68 @@ def dict_factory(cursor, row):
         d[col[0]] = row[idx]
     return d
 
-def get_db():
-    """Get database connection"""
-    conn = sqlite3.connect(DB_PATH)
+def _connect():
+    # sqlite3 keeps this many compiled statements per connection
+    conn = sqlite3.connect(DB_PATH, check_same_thread=False,
+                           cached_statements=int(os.getenv('DB_STATEMENT_CACHE', queries.STATEMENT_CACHE_SIZE)))
     conn.row_factory = dict_factory
     return conn
 
+# Per-process connection pool, shared by all threads of a worker
+db_pool = ConnectionPool(_connect, ping=lambda conn: conn.execute('SELECT 1'), **pool_settings())
+
+def get_db():
+    """Get a pooled database connection, reused for the rest of the current request"""
+    if has_app_context() and '_db_conn' in g:
+        return g._db_conn
+    conn = db_pool.connection(scoped=has_app_context())
+    if has_app_context():
+        g._db_conn = conn
+    return conn
+
+@app.teardown_appcontext
+def release_db(exc):
+    """Return the request's connection to the pool"""
+    conn = g.pop('_db_conn', None)
+    if conn is not None:
+        conn.release()
+
+# Queries shared with app.py, compiled for SQLite (see queries.py)
+repo = Repository(get_db, 'sqlite')
+
 def init_db():
-    """Initialize database and create tables"""
+    """Initialize database and apply pending schema migrations (see schema.py)"""
     try:
         conn = get_db()
-        cursor = conn.cursor()
-        
-        # Users table
-        cursor.execute('''CREATE TABLE IF NOT EXISTS users
-                         (id INTEGER PRIMARY KEY AUTOINCREMENT, 
-                          username TEXT UNIQUE NOT NULL, 
-                          password TEXT NOT NULL,
-                          role TEXT NOT NULL, 
-                          email TEXT, 
-                          created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''')
-        
-        # Quizzes table
-        cursor.execute('''CREATE TABLE IF NOT EXISTS quizzes
-                         (id INTEGER PRIMARY KEY AUTOINCREMENT, 
-                          title TEXT NOT NULL, 
-                          description TEXT,
-                          created_by INTEGER NOT NULL, 
-                          created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, 
-                          duration INTEGER,
-                          FOREIGN KEY(created_by) REFERENCES users(id))''')
-        
-        # Questions table
-        cursor.execute('''CREATE TABLE IF NOT EXISTS questions
-                         (id INTEGER PRIMARY KEY AUTOINCREMENT, 
-                          quiz_id INTEGER NOT NULL, 
-                          question TEXT NOT NULL,
-                          option_a TEXT, 
-                          option_b TEXT, 
-                          option_c TEXT, 
-                          option_d TEXT,
-                          correct_answer TEXT, 
-                          FOREIGN KEY(quiz_id) REFERENCES quizzes(id) ON DELETE CASCADE)''')
-        
-        # Results table
-        cursor.execute('''CREATE TABLE IF NOT EXISTS results
-                         (id INTEGER PRIMARY KEY AUTOINCREMENT, 
-                          user_id INTEGER NOT NULL, 
-                          quiz_id INTEGER NOT NULL,
-                          score INTEGER, 
-                          total_questions INTEGER, 
-                          completed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                          FOREIGN KEY(user_id) REFERENCES users(id),
-                          FOREIGN KEY(quiz_id) REFERENCES quizzes(id) ON DELETE CASCADE)''')
-        
-        # Notifications table
-        cursor.execute('''CREATE TABLE IF NOT EXISTS notifications
-                         (id INTEGER PRIMARY KEY AUTOINCREMENT, 
-                          title TEXT, 
-                          message TEXT, 
-                          created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''')
-        
-        # Courses table
-        cursor.execute('''CREATE TABLE IF NOT EXISTS courses
-                         (id INTEGER PRIMARY KEY AUTOINCREMENT, 
-                          name TEXT NOT NULL, 
-                          description TEXT, 
-                          created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''')
-        
-        # Review submissions table
-        cursor.execute('''CREATE TABLE IF NOT EXISTS review_submissions
-                         (id INTEGER PRIMARY KEY AUTOINCREMENT, 
-                          user_id INTEGER NOT NULL, 
-                          title TEXT, 
-                          details TEXT,
-                          status TEXT DEFAULT 'pending', 
-                          submitted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                          FOREIGN KEY(user_id) REFERENCES users(id) ON DELETE CASCADE)''')
-        
-        conn.commit()
-        
-        # Create default admin user if it doesn't exist
-        cursor.execute("SELECT id FROM users WHERE username = ?", ('admin',))
-        if not cursor.fetchone():
-            admin_password = generate_password_hash('admin123')
-            cursor.execute("INSERT INTO users (username, password, role, email) VALUES (?, ?, ?, ?)",
-                          ('admin', admin_password, 'admin', 'admin@smartquiz.com'))
-            conn.commit()
-        
-        cursor.close()
+        applied = schema.migrate(conn, 'sqlite')
         conn.close()
+        if applied:
+            print(f"Applied schema migrations: {applied}")
         print("Database initialized successfully")
+        return True
     except Exception as e:
         print(f"Error initializing database: {e}")
+        return False
+
+# Schema bootstrap runs once per process instead of on every request
+_schema_ready = os.getenv('SMARTQUIZ_AUTO_MIGRATE', '1') == '0'
+_schema_lock = threading.Lock()
 
 @app.before_request
 def before_request():
-    """Initialize database before each request"""
-    init_db()
+    """Initialize database before the first request handled by this process"""
+    global _schema_ready
+    if _schema_ready:
+        return
+    with _schema_lock:
+        if not _schema_ready:
+            _schema_ready = init_db()
+
+@app.cli.command('init-db')
+def init_db_command():
+    """Create tables and apply pending schema migrations."""
+    if not init_db():
+        raise SystemExit(1)
 
 # ==================== AUTHENTICATION ROUTES ====================
 
@@ -151,12 +124,7 @@ def login():
         return redirect(url_for('index'))
     
     try:
-        conn = get_db()
-        cursor = conn.cursor()
-        cursor.execute("SELECT id, username, password, role FROM users WHERE username = ?", (username,))
-        user = cursor.fetchone()
-        cursor.close()
-        conn.close()
+        user = repo.one(queries.USER_BY_USERNAME, (username,))
         
         if user and check_password_hash(user['password'], password):
             session['user_id'] = user['id']
@@ -190,24 +158,14 @@ def signup():
         return redirect(url_for('index'))
     
     try:
-        conn = get_db()
-        cursor = conn.cursor()
-        
         # Check if user exists
-        cursor.execute("SELECT id FROM users WHERE username = ?", (username,))
-        if cursor.fetchone():
+        if repo.one(queries.USER_BY_USERNAME, (username,)):
             flash('Username already exists', 'danger')
-            cursor.close()
-            conn.close()
             return redirect(url_for('index'))
         
         # Create new user
         hashed_password = generate_password_hash(password)
-        cursor.execute("INSERT INTO users (username, password, role, email) VALUES (?, ?, ?, ?)",
-                      (username, hashed_password, role, email))
-        conn.commit()
-        cursor.close()
-        conn.close()
+        repo.execute(queries.INSERT_USER, (username, hashed_password, role, email), commit=True)
         
         flash('Account created successfully! Please login.', 'success')
         return redirect(url_for('index'))
@@ -231,21 +189,10 @@ def admin_dashboard():
         return redirect(url_for('index'))
     
     try:
-        conn = get_db()
-        cursor = conn.cursor()
-        
         # Get stats
-        cursor.execute("SELECT COUNT(*) as count FROM users")
-        user_count = cursor.fetchone()['count']
-        
-        cursor.execute("SELECT COUNT(*) as count FROM quizzes")
-        quiz_count = cursor.fetchone()['count']
-        
-        cursor.execute("SELECT COUNT(*) as count FROM results")
-        result_count = cursor.fetchone()['count']
-        
-        cursor.close()
-        conn.close()
+        user_count = repo.one(queries.COUNT_USERS)['count']
+        quiz_count = repo.one(queries.COUNT_QUIZZES)['count']
+        result_count = repo.one(queries.COUNT_RESULTS)['count']
         
         return render_template('AdminDashboard.jsp', 
                              user_count=user_count,
@@ -262,18 +209,25 @@ def admin_users():
         return redirect(url_for('index'))
     
     try:
-        conn = get_db()
-        cursor = conn.cursor()
-        cursor.execute("SELECT id, username, role, email, created_at FROM users ORDER BY created_at DESC")
-        users = cursor.fetchall()
-        cursor.close()
-        conn.close()
+        users = repo.all(queries.ALL_USERS)
         
         return render_template('admin_users.html', users=users)
     except Exception as e:
         flash(f'Error: {str(e)}', 'danger')
         return redirect(url_for('admin_dashboard'))
 
+@app.route('/analytics')
+def analytics():
+    """Site-wide analytics: the same queries as the MySQL app, compiled for SQLite"""
+    if 'user_id' not in session:
+        return redirect(url_for('index'))
+    
+    try:
+        return render_template('AnalyticsDashboard.html', **queries.analytics_dashboard(repo))
+    except Exception as e:
+        flash(f'Error: {str(e)}', 'danger')
+        return redirect(url_for('index'))
+
 # ==================== LECTURER ROUTES ====================
 
 @app.route('/lecturer/dashboard')
@@ -283,13 +237,7 @@ def lecturer_dashboard():
         return redirect(url_for('index'))
     
     try:
-        conn = get_db()
-        cursor = conn.cursor()
-        cursor.execute("SELECT id, title, created_at FROM quizzes WHERE created_by = ? ORDER BY created_at DESC", 
-                      (session['user_id'],))
-        quizzes = cursor.fetchall()
-        cursor.close()
-        conn.close()
+        quizzes = repo.all(queries.LECTURER_QUIZZES, (session['user_id'],))
         
         return render_template('LecturerDashboard.jsp', quizzes=quizzes)
     except Exception as e:
@@ -312,14 +260,8 @@ def create_quiz():
             return redirect(url_for('create_quiz'))
         
         try:
-            conn = get_db()
-            cursor = conn.cursor()
-            cursor.execute("INSERT INTO quizzes (title, description, created_by, duration) VALUES (?, ?, ?, ?)",
-                          (title, description, session['user_id'], duration))
-            conn.commit()
-            quiz_id = cursor.lastrowid
-            cursor.close()
-            conn.close()
+            quiz_id = repo.execute(queries.INSERT_QUIZ, (title, description, session['user_id'], duration),
+                                   commit=True)
             
             flash('Quiz created successfully!', 'success')
             return redirect(url_for('add_questions', quiz_id=quiz_id))
@@ -338,12 +280,7 @@ def student_dashboard():
         return redirect(url_for('index'))
     
     try:
-        conn = get_db()
-        cursor = conn.cursor()
-        cursor.execute("SELECT id, title, description FROM quizzes")
-        quizzes = cursor.fetchall()
-        cursor.close()
-        conn.close()
+        quizzes = repo.all(queries.ALL_QUIZZES)
         
         return render_template('student_dashboard.html', quizzes=quizzes)
     except Exception as e:
@@ -0,0 +1,184 @@
+"""
+SmartQuiz - Fingerprinted static assets
+CSS and JS shared by the templates live in assets/ and are built into
+static/dist/ as content-hashed copies (base.1f3c9a2e7b.css), each with a
+gzip and, if the brotli package is installed, a brotli version next to it.
+A manifest maps source names to built names, so templates link with
+{{ asset_url('base.css') }} and the browser fetches a URL whose content never
+changes. /assets/ is answered in front of Flask with year-long immutable
+caching and the smallest encoding the browser accepts.
+
+    flask --app app build-assets    (or: python assets.py)
+
+Run the build on deploy (the Procfile does, before gunicorn starts) and after
+editing assets/. The app itself only reads the manifest; it never writes to
+static/dist/, so workers can't race each other on a build.
+"""
+
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import sys
+import tempfile
+
+from flask import request
+from werkzeug.http import parse_accept_header
+from werkzeug.security import safe_join
+from werkzeug.utils import send_file
+from werkzeug.wrappers import Response
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+SOURCE_DIR = os.path.join(ROOT, 'assets')
+OUTPUT_DIR = os.path.join(ROOT, 'static', 'dist')
+MANIFEST = 'manifest.json'
+
+# Seconds browsers and proxies may keep a fingerprinted file
+MAX_AGE = 365 * 24 * 3600
+
+COMPRESSIBLE = ('.css', '.js', '.svg', '.json', '.txt')
+# (Content-Encoding, file suffix), best first
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+
+def _write(path, data):
+    """Write atomically, so a worker never serves a half-written file"""
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path))
+    with os.fdopen(fd, 'wb') as f:
+        f.write(data)
+    os.chmod(tmp, 0o644)
+    os.replace(tmp, path)
+
+
+def _sources(source):
+    for root, _, files in os.walk(source):
+        for name in sorted(files):
+            path = os.path.join(root, name)
+            yield os.path.relpath(path, source).replace(os.sep, '/'), path
+
+
+def build(source=SOURCE_DIR, output=OUTPUT_DIR):
+    """Fingerprint and precompress every file in source; returns the manifest {name: built name}"""
+    os.makedirs(output, exist_ok=True)
+    manifest = {}
+    for name, path in _sources(source):
+        with open(path, 'rb') as f:
+            data = f.read()
+        stem, ext = os.path.splitext(name)
+        built = f'{stem}.{hashlib.sha256(data).hexdigest()[:10]}{ext}'
+        target = os.path.join(output, built)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        # Same name means same content, so files left by earlier builds are kept as they are
+        variants = {target: lambda: data}
+        if ext in COMPRESSIBLE:
+            variants[target + '.gz'] = lambda: gzip.compress(data, compresslevel=9, mtime=0)
+            if brotli is not None:
+                variants[target + '.br'] = lambda: brotli.compress(data, quality=11)
+        for variant, encode in variants.items():
+            if not os.path.exists(variant):
+                _write(variant, encode())
+        manifest[name] = built
+    _write(os.path.join(output, MANIFEST), json.dumps(manifest, indent=2, sort_keys=True).encode())
+    return manifest
+
+
+class ManifestMissing(RuntimeError):
+    """Raised when the assets haven't been built, so there is no manifest to read"""
+
+
+class Assets:
+    """WSGI middleware serving the built files under /assets/ in front of the Flask app.
+
+    Like the session probes, asset requests never enter Flask: no hooks, no session
+    cookie (whose Vary: Cookie would defeat shared caches) and no database.
+    metrics -- optional Metrics registry; asset requests are counted in its request counter
+    """
+
+    def __init__(self, wsgi_app, source=SOURCE_DIR, output=OUTPUT_DIR, prefix='/assets/', metrics=None):
+        self.wsgi_app = wsgi_app
+        self.source = source
+        self.output = output
+        self.prefix = prefix
+        self.metrics = metrics
+        self.manifest = None
+        self.missing = None
+
+    def __call__(self, environ, start_response):
+        path = environ.get('PATH_INFO', '')
+        if not path.startswith(self.prefix):
+            return self.wsgi_app(environ, start_response)
+        response = self.send(environ, path[len(self.prefix):])
+        if self.metrics is not None:
+            self.metrics.requests.inc(endpoint='asset', method=environ.get('REQUEST_METHOD', ''),
+                                      status=response.status_code)
+        return response(environ, start_response)
+
+    def load(self):
+        """Read the manifest written by build(); raises ManifestMissing if there is none"""
+        path = os.path.join(self.output, MANIFEST)
+        try:
+            with open(path) as f:
+                self.manifest = json.load(f)
+        except FileNotFoundError:
+            raise ManifestMissing(f'{path} not found: build the assets with '
+                                  f'`flask --app app build-assets` (or `python assets.py`)') from None
+        self.missing = None
+
+    def url(self, name):
+        """URL of the current build of assets/<name>, for templates"""
+        if self.manifest is None:
+            raise ManifestMissing(self.missing)
+        return request.script_root + self.prefix + self.manifest[name]
+
+    def send(self, environ, filename):
+        """Response for one built file, precompressed if the browser accepts it"""
+        if environ.get('REQUEST_METHOD') not in ('GET', 'HEAD'):
+            return Response('Method Not Allowed\n', 405, {'Allow': 'GET, HEAD'}, mimetype='text/plain')
+        path = safe_join(self.output, filename) if filename != MANIFEST else None
+        if path is None or not os.path.isfile(path):
+            return Response('Not Found\n', 404, mimetype='text/plain')
+        mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        accepted = parse_accept_header(environ.get('HTTP_ACCEPT_ENCODING'))
+        encoding = None
+        for name, suffix in ENCODINGS:
+            if accepted[name] and os.path.isfile(path + suffix):
+                path, encoding = path + suffix, name
+                break
+        response = send_file(path, environ, mimetype=mimetype, conditional=True, etag=True, max_age=MAX_AGE)
+        response.cache_control.immutable = True
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        response.vary.add('Accept-Encoding')
+        return response
+
+    def init_app(self, app):
+        """Load the manifest, give templates asset_url() and register the build command"""
+        try:
+            self.load()
+        except ManifestMissing as e:
+            # Importing the app must still work, or `flask build-assets` couldn't run;
+            # every page that links an asset fails with this message until then
+            self.missing = str(e)
+            print(f"[WARNING] {e}", file=sys.stderr)
+        app.jinja_env.globals['asset_url'] = self.url
+
+        @app.cli.command('build-assets')
+        def build_assets_command():
+            """Fingerprint and precompress the files in assets/."""
+            self.manifest = build(self.source, self.output)
+            self.missing = None
+            for name, built in sorted(self.manifest.items()):
+                print(f"{name} -> {built}")
+
+
+if __name__ == '__main__':
+    for name, built in sorted(build().items()):
+        print(f"{name} -> {built}")
+    if brotli is None:
+        print("brotli is not installed; only gzip copies were written", file=sys.stderr)
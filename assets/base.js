@@ -0,0 +1,135 @@
+/**
+ * Session Management & Back Navigation Handler
+ * Prevents showing protected pages after logout when using browser back button
+ */
+
+// Flag to track if we should allow navigation
+var isSessionValid = true;
+var checkInProgress = false;
+
+// Verify session with server
+function verifySession() {
+    if (checkInProgress) return;
+    checkInProgress = true;
+
+    fetch('/session_status?t=' + Date.now(), { 
+        method: 'GET',
+        credentials: 'same-origin', 
+        cache: 'no-store',
+        headers: { 'Pragma': 'no-cache' }
+    })
+    .then(function (resp) {
+        checkInProgress = false;
+        if (resp.status === 401) {
+            isSessionValid = false;
+            window.location.replace('/login');
+        } else {
+            isSessionValid = true;
+        }
+    })
+    .catch(function () {
+        checkInProgress = false;
+        isSessionValid = false;
+        window.location.replace('/login');
+    });
+}
+
+// Push channel: new notifications and session expiry arrive over one
+// Server-Sent Events stream per page instead of polling /session_status
+var eventStream = null;
+
+function showNotificationToast(note) {
+    var toast = document.createElement('a');
+    toast.className = 'notification-toast';
+    var link = document.querySelector('.navbar a[href$="/notifications"]');
+    toast.href = link ? link.getAttribute('href') : '#';
+    var title = document.createElement('strong');
+    title.textContent = '📢 ' + note.title;
+    var message = document.createElement('div');
+    message.textContent = note.message;
+    toast.appendChild(title);
+    toast.appendChild(message);
+    document.body.appendChild(toast);
+    setTimeout(function () { toast.remove(); }, 10000);
+}
+
+function connectEvents() {
+    if (!window.EventSource || !document.querySelector('.navbar-user')) return;
+    if (eventStream) eventStream.close();
+    eventStream = new EventSource('/events');
+    eventStream.addEventListener('notification', function (event) {
+        showNotificationToast(JSON.parse(event.data));
+    });
+    eventStream.addEventListener('session', function (event) {
+        if (JSON.parse(event.data).status === 'expired') {
+            eventStream.close();
+            isSessionValid = false;
+            window.location.replace('/login');
+        }
+    });
+    eventStream.onerror = function () {
+        // CLOSED means the server refused the stream (e.g. 503): fall back to a one-off check
+        if (eventStream.readyState === EventSource.CLOSED) {
+            eventStream = null;
+            verifySession();
+        }
+    };
+}
+
+document.addEventListener('DOMContentLoaded', connectEvents);
+
+// Handle BFCache restoration (page shown after back/forward in browser history)
+window.addEventListener('pageshow', function (event) {
+    if (event.persisted && document.querySelector('.navbar-user')) {
+        // Only verify if this is an authenticated page; a fresh stream reports an expired session straight away
+        if (window.EventSource) {
+            connectEvents();
+        } else {
+            verifySession();
+        }
+    } else if (document.querySelector('.navbar-user')) {
+        // Dashboards may be kept in the HTTP cache (private, no-cache) and browsers
+        // can show them on back/forward without revalidating, so check the session
+        var nav = performance.getEntriesByType && performance.getEntriesByType('navigation')[0];
+        if (nav && nav.type === 'back_forward') {
+            verifySession();
+        }
+    }
+});
+
+// Handle browser back/forward button clicks
+window.addEventListener('popstate', function (event) {
+    // The open event stream already reports expiry; only poll without one
+    if (eventStream && eventStream.readyState !== EventSource.CLOSED) return;
+    // Small delay to ensure navigation is registered
+    setTimeout(function () {
+        verifySession();
+    }, 100);
+});
+
+// Intercept logout link for clean session termination
+document.addEventListener('DOMContentLoaded', function () {
+    var logoutLink = document.querySelector('a[href="/logout"]');
+    if (logoutLink) {
+        logoutLink.addEventListener('click', function (ev) {
+            ev.preventDefault();
+            isSessionValid = false;
+            fetch('/logout', { 
+                method: 'GET', 
+                credentials: 'same-origin', 
+                cache: 'no-store' 
+            })
+            .finally(function () {
+                // Replace history entry to prevent back button access
+                window.location.replace('/login');
+            });
+        });
+    }
+});
+
+// Presence beacon when the page unloads (tab close, navigate away); feeds the active-user gauge
+window.addEventListener('beforeunload', function () {
+    if (isSessionValid && document.querySelector('.navbar-user')) {
+        navigator.sendBeacon('/session_check', 'active');
+    }
+});
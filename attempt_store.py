@@ -0,0 +1,153 @@
+"""
+SmartQuiz - Server-side quiz attempt state
+The session cookie only carries an attempt ID; the attempt itself (question
+order, answers, timing, score) lives in one of these stores.
+
+    memory -- in-process LRU, fine for a single worker / development
+    sql    -- quiz_attempts table, shared by all gunicorn workers and
+              survives restarts; abandoned attempts are purged by the job
+              worker's maintenance (see jobs.py)
+"""
+
+import json
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+PLACEHOLDER = {'mysql': '%s', 'sqlite': '?'}
+
+
+class AttemptStore:
+    """Interface shared by the attempt store backends"""
+
+    def __init__(self, ttl=6 * 3600):
+        self.ttl = ttl
+
+    @staticmethod
+    def new_id():
+        return secrets.token_hex(16)
+
+    def create(self, user_id, quiz_id, state):
+        """Store a new attempt and return its ID"""
+        raise NotImplementedError
+
+    def get(self, attempt_id, user_id):
+        """Return the attempt state, or None if missing, expired or owned by someone else"""
+        raise NotImplementedError
+
+    def save(self, attempt_id, state):
+        raise NotImplementedError
+
+    def delete(self, attempt_id):
+        raise NotImplementedError
+
+    def purge_expired(self):
+        """Delete abandoned attempts older than the TTL (stores that evict on their own need not)"""
+
+
+class MemoryAttemptStore(AttemptStore):
+    """Bounded in-process LRU store"""
+
+    def __init__(self, max_entries=10000, ttl=6 * 3600):
+        super().__init__(ttl)
+        self.max_entries = max_entries
+        self._data = OrderedDict()  # attempt_id -> (user_id, quiz_id, state_json, updated_at)
+        self._lock = threading.Lock()
+
+    def create(self, user_id, quiz_id, state):
+        attempt_id = self.new_id()
+        with self._lock:
+            self._data[attempt_id] = (user_id, quiz_id, json.dumps(state), time.time())
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+        return attempt_id
+
+    def get(self, attempt_id, user_id):
+        with self._lock:
+            entry = self._data.get(attempt_id)
+            if not entry:
+                return None
+            owner, _, state_json, updated_at = entry
+            if time.time() - updated_at > self.ttl:
+                del self._data[attempt_id]
+                return None
+            self._data.move_to_end(attempt_id)
+        if owner != user_id:
+            return None
+        # Hand out a copy so callers can't mutate the stored state by accident
+        return json.loads(state_json)
+
+    def save(self, attempt_id, state):
+        with self._lock:
+            entry = self._data.get(attempt_id)
+            if entry:
+                self._data[attempt_id] = (entry[0], entry[1], json.dumps(state), time.time())
+                self._data.move_to_end(attempt_id)
+
+    def delete(self, attempt_id):
+        with self._lock:
+            self._data.pop(attempt_id, None)
+
+
+class SQLAttemptStore(AttemptStore):
+    """Attempts persisted in the quiz_attempts table (see schema.py).
+
+    connect -- callable checking out a connection the store owns (conn.close() hands it
+               back); the store commits its writes, so it must never be a view's
+               request connection with work of its own still open
+    """
+
+    def __init__(self, connect, dialect='mysql', ttl=6 * 3600):
+        super().__init__(ttl)
+        self._connect = connect
+        self._ph = PLACEHOLDER[dialect]
+
+    def _execute(self, sql, params, fetch=False):
+        conn = self._connect()
+        if not conn:
+            return None
+        cursor = conn.cursor()
+        try:
+            cursor.execute(sql.replace('?', self._ph), params)
+            row = cursor.fetchone() if fetch else None
+            if not fetch:
+                conn.commit()
+            return row
+        finally:
+            cursor.close()
+            conn.close()
+
+    def create(self, user_id, quiz_id, state):
+        attempt_id = self.new_id()
+        self._execute("INSERT INTO quiz_attempts (id, user_id, quiz_id, state, updated_at) VALUES (?, ?, ?, ?, ?)",
+                      (attempt_id, user_id, quiz_id, json.dumps(state), int(time.time())))
+        return attempt_id
+
+    def get(self, attempt_id, user_id):
+        row = self._execute("SELECT state FROM quiz_attempts WHERE id = ? AND user_id = ? AND updated_at >= ?",
+                            (attempt_id, user_id, int(time.time() - self.ttl)), fetch=True)
+        if not row:
+            return None
+        state_json = row['state'] if isinstance(row, dict) else row[0]
+        return json.loads(state_json)
+
+    def save(self, attempt_id, state):
+        self._execute("UPDATE quiz_attempts SET state = ?, updated_at = ? WHERE id = ?",
+                      (json.dumps(state), int(time.time()), attempt_id))
+
+    def delete(self, attempt_id):
+        self._execute("DELETE FROM quiz_attempts WHERE id = ?", (attempt_id,))
+
+    def purge_expired(self):
+        """Delete abandoned attempts older than the TTL"""
+        self._execute("DELETE FROM quiz_attempts WHERE updated_at < ?", (int(time.time() - self.ttl),))
+
+
+def create_attempt_store(backend, connect=None, dialect='mysql', ttl=6 * 3600):
+    """Build the store selected by the ATTEMPT_STORE setting"""
+    if backend == 'memory':
+        return MemoryAttemptStore(ttl=ttl)
+    if backend == 'sql':
+        return SQLAttemptStore(connect, dialect=dialect, ttl=ttl)
+    raise ValueError(f'Unknown attempt store backend: {backend}')
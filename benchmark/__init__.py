@@ -0,0 +1,16 @@
+"""
+SmartQuiz - Load-testing and benchmark harness
+Seeds a throwaway database, then drives the real Flask app with concurrent
+simulated students (take_quiz -> serve_question -> submit_quiz x20 -> result)
+alongside lecturer and admin dashboard traffic, and reports p50/p95/p99
+latency, queries per request and throughput per route.
+
+Usage:
+    python -m benchmark                                  # local MySQL, database smartquiz_bench
+    python -m benchmark --students 200 --concurrency 50  # bigger class
+    python -m benchmark --url http://localhost:8000      # against a running server (seed first)
+    python -m benchmark.seed --backend sqlite --path bench.db
+
+Run it with the same arguments before and after a change; the seed is fixed,
+so the dataset and the simulated answers are identical between runs.
+"""
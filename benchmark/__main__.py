@@ -0,0 +1,125 @@
+"""
+SmartQuiz benchmark - command line entry point (python -m benchmark --help)
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import redirect_stdout
+
+from benchmark import scenarios
+from benchmark.harness import AppClient, HTTPClient, QueryCounter, RouteStats, format_report
+from benchmark.seed import add_arguments, connect, existing_dataset, seed
+
+
+def _load_app(database):
+    """Import app.py pointed at the benchmark database"""
+    import app as smartquiz
+    smartquiz.DB_CONFIG['database'] = database
+    smartquiz.db_pool.close_all()
+    smartquiz.attempt_pool.close_all()
+    return smartquiz
+
+
+# How simulated students take a quiz
+ATTEMPT_MODES = {
+    'paged': scenarios.student_attempt,
+    'api': scenarios.student_attempt_api,
+    'single-page': scenarios.student_attempt_single_page,
+}
+
+
+def build_tasks(dataset, args):
+    """The full workload as (scenario, args) pairs, in a seed-determined order"""
+    rng = random.Random(args.seed)
+    tasks = []
+    attempt = ATTEMPT_MODES[args.attempt_mode]
+    for i in range(args.students):
+        username = dataset['students'][i % len(dataset['students'])]
+        for _ in range(args.attempts):
+            tasks.append((attempt, (username, rng.choice(dataset['quiz_ids']))))
+    for _ in range(args.dashboard_rounds):
+        for username in dataset['lecturers']:
+            tasks.append((scenarios.lecturer_dashboards, (username, dataset['student_ids'])))
+        tasks.append((scenarios.admin_dashboards, (dataset['admin'],)))
+    rng.shuffle(tasks)
+    return tasks
+
+
+def run(tasks, make_client, concurrency, seed=1):
+    """Execute tasks on `concurrency` threads. Returns (stats, wall seconds, failed scenarios)."""
+    stats = RouteStats()
+
+    def execute(index, task):
+        scenario, task_args = task
+        client = make_client()
+        # Per-task RNG so answers don't depend on thread scheduling
+        return scenario(client, stats, *task_args, random.Random(seed * 100003 + index))
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        outcomes = list(pool.map(execute, range(len(tasks)), tasks))
+    wall = time.perf_counter() - start
+    return stats, wall, outcomes.count(False)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmark',
+                                     description='Drive SmartQuiz with concurrent simulated users.')
+    add_arguments(parser)
+    parser.add_argument('--concurrency', type=int, default=10, help='simultaneous simulated users')
+    parser.add_argument('--attempts', type=int, default=1, help='quiz attempts per student')
+    parser.add_argument('--dashboard-rounds', type=int, default=2,
+                        help='dashboard passes per lecturer and for the admin')
+    parser.add_argument('--attempt-mode', choices=sorted(ATTEMPT_MODES), default='paged',
+                        help='paged: HTML form per question; api: JSON answers; single-page: one GET + one POST')
+    parser.add_argument('--url', help='benchmark a running server instead of the in-process app')
+    parser.add_argument('--no-seed', action='store_true', help='reuse the existing benchmark database')
+    parser.add_argument('--json', help='also write the per-route numbers to this file')
+    parser.add_argument('--verbose', action='store_true', help="keep the app's own console output")
+    args = parser.parse_args(argv)
+
+    if args.backend != 'mysql' and not args.url:
+        # app.py only talks to MySQL; seed SQLite with `python -m benchmark.seed` and point a server at it
+        parser.error('the in-process run needs --backend mysql (or use --url)')
+
+    conn = connect(args.backend, database=args.database, path=args.path, recreate=not args.no_seed)
+    if args.no_seed:
+        dataset = existing_dataset(conn, args.backend)
+    else:
+        print(f"Seeding {args.students} students, {args.quizzes} quizzes, {args.results} results ({args.backend})...")
+        dataset = seed(conn, args.backend, students=args.students, lecturers=args.lecturers,
+                       quizzes=args.quizzes, results=args.results, seed=args.seed)
+    conn.close()
+
+    if args.url:
+        make_client = lambda: HTTPClient(args.url)
+    else:
+        smartquiz = _load_app(args.database)
+        counter = QueryCounter()
+        counter.install(smartquiz.db_pool)
+        # Quiz attempt state is read and written on a pool of its own
+        counter.install(smartquiz.attempt_pool)
+        make_client = lambda: AppClient(smartquiz.app, counter)
+
+    tasks = build_tasks(dataset, args)
+    print(f"Running {len(tasks)} scenarios on {args.concurrency} threads...")
+    with open(os.devnull, 'w') as devnull, redirect_stdout(sys.stdout if args.verbose else devnull):
+        stats, wall, failed = run(tasks, make_client, args.concurrency, seed=args.seed)
+
+    rows = stats.rows(wall)
+    print(format_report(rows, wall))
+    if failed:
+        print(f"{failed} scenario(s) did not complete")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'args': vars(args), 'wall_seconds': wall, 'failed': failed, 'routes': rows}, f, indent=2)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
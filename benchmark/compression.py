@@ -0,0 +1,110 @@
+"""
+SmartQuiz benchmark - response compression
+Fetches the largest pages from a seeded database and measures, per encoder
+and level, the bytes saved against the CPU time spent compressing them. The
+transfer time saved is estimated for a given link speed, so the two columns
+can be compared directly:
+
+    python -m benchmark.compression --results 5000 --mbps 10
+    python -m benchmark.compression --files page1.html page2.json   # saved responses, no database
+"""
+
+import argparse
+import os
+import sys
+import time
+from contextlib import redirect_stdout
+
+from compress import ENCODERS
+
+# (encoder, level) pairs to compare; brotli only if the package is installed
+CONFIGS = [('gzip', 1), ('gzip', 6), ('gzip', 9)] + ([('br', 5), ('br', 11)] if 'br' in ENCODERS else [])
+
+
+def fetch_pages(args):
+    """Log in as each role and return {label: body bytes} for the heaviest pages"""
+    from benchmark.__main__ import _load_app
+    from benchmark.seed import BENCH_PASSWORD, connect, seed
+
+    conn = connect('mysql', database=args.database)
+    dataset = seed(conn, 'mysql', students=args.students, results=args.results)
+    conn.close()
+    smartquiz = _load_app(args.database)
+
+    pages = {
+        dataset['admin']: ['/admin/reports', '/admin/users', '/admin/dashboard', '/analytics'],
+        dataset['lecturers'][0]: ['/lecturer/students', f"/lecturer/student/{dataset['student_ids'][0]}/analytics",
+                                  '/lecturer/analytics/cohort'],
+        dataset['students'][0]: ['/student/analytics', '/student/dashboard'],
+    }
+    bodies = {}
+    with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+        for username, paths in pages.items():
+            client = smartquiz.app.test_client()
+            client.post('/login', data={'username': username, 'password': BENCH_PASSWORD})
+            for path in paths:
+                client.get(path)  # the first view after login also shows the flash message
+                response = client.get(path)
+                if response.status_code == 200:
+                    bodies[path] = response.get_data()
+    return bodies
+
+
+def measure(data, encoding, level, repeat):
+    """(compressed size, seconds of CPU per compression)"""
+    start = time.process_time()
+    for _ in range(repeat):
+        encoder = ENCODERS[encoding](level)
+        out = encoder.compress(data) + encoder.finish()
+    return len(out), (time.process_time() - start) / repeat
+
+
+def report(bodies, repeat, mbps):
+    bytes_per_ms = mbps * 1e6 / 8 / 1000
+    print(f"{'page':<42} {'encoder':<8} {'raw KB':>8} {'sent KB':>8} {'ratio':>6} "
+          f"{'cpu ms':>7} {'MB/s':>7} {'transfer ms saved':>18}")
+    totals = {}
+    for label, data in sorted(bodies.items(), key=lambda item: -len(item[1])):
+        for encoding, level in CONFIGS:
+            size, seconds = measure(data, encoding, level, repeat)
+            saved_ms = (len(data) - size) / bytes_per_ms
+            total = totals.setdefault(f'{encoding}-{level}', [0, 0, 0.0])
+            total[0] += len(data)
+            total[1] += size
+            total[2] += seconds
+            print(f"{label[:42]:<42} {f'{encoding}-{level}':<8} {len(data) / 1024:>8.1f} {size / 1024:>8.1f} "
+                  f"{len(data) / max(size, 1):>6.1f} {seconds * 1000:>7.2f} "
+                  f"{len(data) / max(seconds, 1e-9) / 1e6:>7.1f} {saved_ms:>18.1f}")
+    print(f"\nAll pages once ({mbps:g} Mbit/s link):")
+    for name, (raw, sent, seconds) in totals.items():
+        print(f"  {name:<8} {raw / 1024:>8.1f} KB -> {sent / 1024:>7.1f} KB  "
+              f"cpu {seconds * 1000:>6.2f} ms  transfer saved {(raw - sent) / bytes_per_ms:>7.1f} ms")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmark.compression',
+                                     description='Compare compression CPU cost with bandwidth saved.')
+    parser.add_argument('--students', type=int, default=200)
+    parser.add_argument('--results', type=int, default=5000, help='past results (drives report/analytics size)')
+    parser.add_argument('--database', default='smartquiz_bench', help='MySQL database to (re)create')
+    parser.add_argument('--files', nargs='+', help='benchmark these saved responses instead of the app')
+    parser.add_argument('--repeat', type=int, default=20, help='compressions per page and encoder')
+    parser.add_argument('--mbps', type=float, default=10.0, help='link speed for the transfer estimate')
+    args = parser.parse_args(argv)
+
+    if args.files:
+        bodies = {}
+        for path in args.files:
+            with open(path, 'rb') as f:
+                bodies[os.path.basename(path)] = f.read()
+    else:
+        bodies = fetch_pages(args)
+    if not bodies:
+        print("No pages to compress")
+        return 1
+    report(bodies, args.repeat, args.mbps)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
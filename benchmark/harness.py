@@ -0,0 +1,163 @@
+"""
+SmartQuiz benchmark - clients, query counting and latency statistics
+"""
+
+import threading
+import time
+from collections import defaultdict
+
+import numpy as np
+
+
+class QueryCounter:
+    """Counts cursor executes per thread by wrapping the connections a pool opens.
+
+    Each simulated user runs on its own thread and the in-process client serves
+    the request on that same thread, so the thread-local count between two
+    reset() calls is the number of queries one request issued.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def install(self, pool):
+        # Connections opened before now would go uncounted
+        pool.close_all()
+        connect = pool._connect
+        pool._connect = lambda: _CountingConnection(connect(), self)
+
+    def reset(self):
+        self._local.count = 0
+
+    def increment(self):
+        self._local.count = getattr(self._local, 'count', 0) + 1
+
+    @property
+    def count(self):
+        return getattr(self._local, 'count', 0)
+
+
+class _CountingConnection:
+    def __init__(self, raw, counter):
+        self._raw = raw
+        self._counter = counter
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+    def cursor(self, *args, **kwargs):
+        return _CountingCursor(self._raw.cursor(*args, **kwargs), self._counter)
+
+    def execute(self, *args, **kwargs):
+        # sqlite3 connections can execute directly
+        self._counter.increment()
+        return self._raw.execute(*args, **kwargs)
+
+
+class _CountingCursor:
+    def __init__(self, raw, counter):
+        self._raw = raw
+        self._counter = counter
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+    def __iter__(self):
+        return iter(self._raw)
+
+    def execute(self, *args, **kwargs):
+        self._counter.increment()
+        return self._raw.execute(*args, **kwargs)
+
+    def executemany(self, *args, **kwargs):
+        self._counter.increment()
+        return self._raw.executemany(*args, **kwargs)
+
+
+class AppClient:
+    """Drives the Flask app in-process through its test client (one cookie jar per user)"""
+
+    def __init__(self, app, counter=None):
+        self._client = app.test_client()
+        self._counter = counter
+
+    def request(self, method, path, data=None, json=None):
+        """Return (status, location header, body text, queries issued or None)"""
+        if self._counter:
+            self._counter.reset()
+        response = self._client.open(path, method=method, data=data, json=json)
+        body = response.get_data(as_text=True)
+        return response.status_code, response.headers.get('Location'), body, \
+            self._counter.count if self._counter else None
+
+
+class HTTPClient:
+    """Drives a running server over HTTP; query counts are not available"""
+
+    def __init__(self, base_url):
+        import requests
+        self._base = base_url.rstrip('/')
+        self._session = requests.Session()
+
+    def request(self, method, path, data=None, json=None):
+        response = self._session.request(method, self._base + path, data=data, json=json, allow_redirects=False)
+        return response.status_code, response.headers.get('Location'), response.text, None
+
+
+class RouteStats:
+    """Thread-safe collector of per-route latency, query counts and errors"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._latency = defaultdict(list)
+        self._queries = defaultdict(list)
+        self._errors = defaultdict(int)
+
+    def record(self, route, seconds, queries=None, error=False):
+        with self._lock:
+            self._latency[route].append(seconds)
+            if queries is not None:
+                self._queries[route].append(queries)
+            if error:
+                self._errors[route] += 1
+
+    def timed(self, client, route, method, path, data=None, json=None, expect=(200, 302)):
+        """Issue one request, record it under `route` and return (status, location, body)"""
+        start = time.perf_counter()
+        status, location, body, queries = client.request(method, path, data=data, json=json)
+        self.record(route, time.perf_counter() - start, queries, error=status not in expect)
+        return status, location, body
+
+    def rows(self, wall_seconds):
+        """One summary dict per route, busiest first"""
+        rows = []
+        with self._lock:
+            for route, samples in self._latency.items():
+                ms = np.asarray(samples) * 1000
+                p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+                queries = self._queries.get(route)
+                rows.append({
+                    'route': route,
+                    'requests': len(samples),
+                    'errors': self._errors.get(route, 0),
+                    'p50_ms': p50,
+                    'p95_ms': p95,
+                    'p99_ms': p99,
+                    'queries': float(np.mean(queries)) if queries else None,
+                    'rps': len(samples) / wall_seconds if wall_seconds else 0.0,
+                })
+        rows.sort(key=lambda r: -r['requests'])
+        return rows
+
+
+def format_report(rows, wall_seconds):
+    header = f"{'route':<42} {'reqs':>6} {'err':>4} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'q/req':>6} {'req/s':>8}"
+    lines = [header, '-' * len(header)]
+    for r in rows:
+        queries = f"{r['queries']:.1f}" if r['queries'] is not None else '-'
+        lines.append(f"{r['route']:<42} {r['requests']:>6} {r['errors']:>4} {r['p50_ms']:>8.1f} {r['p95_ms']:>8.1f} "
+                     f"{r['p99_ms']:>8.1f} {queries:>6} {r['rps']:>8.1f}")
+    total = sum(r['requests'] for r in rows)
+    lines.append('-' * len(header))
+    lines.append(f"{total} requests in {wall_seconds:.2f}s ({total / wall_seconds if wall_seconds else 0:.1f} req/s overall)")
+    return '\n'.join(lines)
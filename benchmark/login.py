@@ -0,0 +1,105 @@
+"""
+SmartQuiz benchmark - login storm
+Many students signing in at once, as at the start of an exam. Compare the
+hashing configurations by running it with different settings:
+
+    python -m benchmark.login --logins 500 --concurrency 100
+    PASSWORD_HASH_WORKERS=0 python -m benchmark.login ...   # inline hashing, for comparison
+    python -m benchmark.login --hasher-only --workers 0 2 4 # just the hasher, no database
+"""
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import redirect_stdout
+
+import numpy as np
+from werkzeug.security import generate_password_hash
+
+from passwords import HasherBusy, PasswordHasher, hasher_settings
+
+
+def hasher_storm(hasher, pwhash, password, logins, concurrency):
+    """Verify `logins` passwords from `concurrency` threads. Returns (latencies in s, rejected, wall s)."""
+    def attempt(_):
+        start = time.perf_counter()
+        try:
+            hasher.verify(pwhash, password)
+            return time.perf_counter() - start
+        except HasherBusy:
+            return None
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        outcomes = list(pool.map(attempt, range(logins)))
+    wall = time.perf_counter() - start
+    latencies = [o for o in outcomes if o is not None]
+    return latencies, len(outcomes) - len(latencies), wall
+
+
+def _summary(label, latencies, rejected, wall):
+    ms = np.asarray(latencies or [0.0]) * 1000
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+    return (f"{label:<24} {len(latencies):>6} ok {rejected:>5} busy  {len(latencies) / wall:>7.1f} logins/s  "
+            f"p50 {p50:>7.1f} ms  p95 {p95:>7.1f} ms  p99 {p99:>7.1f} ms")
+
+
+def run_hasher_only(args):
+    password = 'bench-password'
+    settings = hasher_settings()
+    pwhash = generate_password_hash(password, method=settings['method'])
+    print(f"{args.logins} verifications of {settings['method']} hashes, {args.concurrency} concurrent:")
+    for workers in args.workers:
+        hasher = PasswordHasher(method=settings['method'], workers=workers, max_pending=args.queue)
+        hasher.verify(pwhash, password)  # start the pool outside the measurement
+        print(_summary('inline' if workers == 0 else f'{workers} worker processes',
+                       *hasher_storm(hasher, pwhash, password, args.logins, args.concurrency)))
+        hasher.shutdown()
+
+
+def run_app(args):
+    from benchmark import scenarios
+    from benchmark.__main__ import _load_app
+    from benchmark.harness import AppClient, RouteStats, format_report
+    from benchmark.seed import connect, seed
+
+    conn = connect('mysql', database=args.database)
+    dataset = seed(conn, 'mysql', students=args.logins, results=0)
+    conn.close()
+    smartquiz = _load_app(args.database)
+    stats = RouteStats()
+
+    def sign_in(username):
+        return scenarios.login(AppClient(smartquiz.app), stats, username)
+
+    print(f"{args.logins} student logins, {args.concurrency} concurrent "
+          f"(hasher: {smartquiz.password_hasher.workers} workers, queue {smartquiz.password_hasher.max_pending}):")
+    start = time.perf_counter()
+    with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            outcomes = list(pool.map(sign_in, dataset['students']))
+    wall = time.perf_counter() - start
+    print(format_report(stats.rows(wall), wall))
+    print(f"{outcomes.count(True)} signed in, {outcomes.count(False)} turned away or failed, "
+          f"hasher {smartquiz.password_hasher.stats()}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmark.login', description='Benchmark a login storm.')
+    parser.add_argument('--logins', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--database', default='smartquiz_bench', help='MySQL database to (re)create')
+    parser.add_argument('--hasher-only', action='store_true', help='benchmark PasswordHasher without the app')
+    parser.add_argument('--workers', type=int, nargs='+', default=[0, 2], help='pool sizes for --hasher-only')
+    parser.add_argument('--queue', type=int, default=32, help='max pending hashes for --hasher-only')
+    args = parser.parse_args(argv)
+    if args.hasher_only:
+        run_hasher_only(args)
+    else:
+        run_app(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
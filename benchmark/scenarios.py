@@ -0,0 +1,129 @@
+"""
+SmartQuiz benchmark - simulated users
+Each scenario logs in with its own client (its own session cookie) and walks
+the same pages a real user would. Routes are recorded under their URL rule so
+requests for different quizzes/results aggregate together.
+"""
+
+import json
+import re
+from urllib.parse import urlsplit
+
+from benchmark.seed import BENCH_PASSWORD
+
+_QUESTION_FIELD = re.compile(r'name="question_(\d+)"')
+
+# take_quiz always asks 20 questions; allow a little slack before giving up
+MAX_QUESTIONS = 25
+
+
+def _path(location):
+    parts = urlsplit(location)
+    return parts.path + ('?' + parts.query if parts.query else '')
+
+
+def login(client, stats, username):
+    status, location, _ = stats.timed(client, '/login', 'POST', '/login',
+                                      data={'username': username, 'password': BENCH_PASSWORD})
+    return status == 302 and location is not None and _path(location) == '/'
+
+
+def student_attempt(client, stats, username, quiz_id, rng):
+    """Log in, take one full quiz attempt and look at the result and analytics. Returns True on success."""
+    if not login(client, stats, username):
+        return False
+    stats.timed(client, '/student/dashboard', 'GET', '/student/dashboard')
+    stats.timed(client, '/student/quiz/<quiz_id>', 'GET', f'/student/quiz/{quiz_id}', expect=(302,))
+
+    result_location = None
+    for _ in range(MAX_QUESTIONS):
+        status, _, body = stats.timed(client, '/student/quiz/<quiz_id>/question', 'GET',
+                                      f'/student/quiz/{quiz_id}/question', expect=(200,))
+        match = _QUESTION_FIELD.search(body)
+        if status != 200 or not match:
+            return False
+        _, location, _ = stats.timed(client, '/student/submit-quiz/<quiz_id>', 'POST',
+                                     f'/student/submit-quiz/{quiz_id}',
+                                     data={f'question_{match.group(1)}': rng.choice('ABCD')}, expect=(302,))
+        if location and '/student/result/' in location:
+            result_location = location
+            break
+    if not result_location:
+        return False
+
+    stats.timed(client, '/student/result/<result_id>', 'GET', _path(result_location), expect=(200,))
+    stats.timed(client, '/student/analytics', 'GET', '/student/analytics', expect=(200,))
+    return True
+
+
+def student_attempt_api(client, stats, username, quiz_id, rng):
+    """Same as student_attempt, but answer through the JSON API like the page does with JavaScript"""
+    if not login(client, stats, username):
+        return False
+    stats.timed(client, '/student/dashboard', 'GET', '/student/dashboard')
+    stats.timed(client, '/student/quiz/<quiz_id>', 'GET', f'/student/quiz/{quiz_id}', expect=(302,))
+    status, _, body = stats.timed(client, '/student/quiz/<quiz_id>/question', 'GET',
+                                  f'/student/quiz/{quiz_id}/question', expect=(200,))
+    match = _QUESTION_FIELD.search(body)
+    if status != 200 or not match:
+        return False
+
+    question_id = int(match.group(1))
+    for _ in range(MAX_QUESTIONS):
+        answer = {'question_id': question_id, 'answer': rng.choice('ABCD'), 'time_taken': rng.uniform(2, 30)}
+        status, _, body = stats.timed(client, '/api/quiz/<quiz_id>/answers', 'POST', f'/api/quiz/{quiz_id}/answers',
+                                      json={'answers': [answer]}, expect=(200,))
+        if status != 200:
+            return False
+        reply = json.loads(body)
+        if reply['status'] == 'finished':
+            stats.timed(client, '/student/result/<result_id>', 'GET', _path(reply['result_url']), expect=(200,))
+            stats.timed(client, '/student/analytics', 'GET', '/student/analytics', expect=(200,))
+            return True
+        question_id = reply['question']['id']
+    return False
+
+
+def student_attempt_single_page(client, stats, username, quiz_id, rng):
+    """Same as student_attempt, but fetch all questions at once and submit them in one POST"""
+    if not login(client, stats, username):
+        return False
+    stats.timed(client, '/student/dashboard', 'GET', '/student/dashboard')
+    status, _, body = stats.timed(client, '/student/quiz/<quiz_id>/single-page', 'GET',
+                                  f'/student/quiz/{quiz_id}/single-page', expect=(200,))
+    question_ids = _QUESTION_FIELD.findall(body)
+    if status != 200 or not question_ids:
+        return False
+    answers = {}
+    for question_id in dict.fromkeys(question_ids):
+        answers[f'question_{question_id}'] = rng.choice('ABCD')
+        answers[f'time_{question_id}'] = f'{rng.uniform(2, 30):.3f}'
+    _, location, _ = stats.timed(client, '/student/quiz/<quiz_id>/single-page', 'POST',
+                                 f'/student/quiz/{quiz_id}/single-page', data=answers, expect=(302,))
+    if not location or '/student/result/' not in location:
+        return False
+
+    stats.timed(client, '/student/result/<result_id>', 'GET', _path(location), expect=(200,))
+    stats.timed(client, '/student/analytics', 'GET', '/student/analytics', expect=(200,))
+    return True
+
+
+def lecturer_dashboards(client, stats, username, student_ids, rng):
+    if not login(client, stats, username):
+        return False
+    stats.timed(client, '/lecturer/dashboard', 'GET', '/lecturer/dashboard', expect=(200,))
+    stats.timed(client, '/lecturer/students', 'GET', '/lecturer/students', expect=(200,))
+    stats.timed(client, '/lecturer/student/<student_id>/analytics', 'GET',
+                f'/lecturer/student/{rng.choice(student_ids)}/analytics')
+    stats.timed(client, '/lecturer/analytics/cohort', 'GET', '/lecturer/analytics/cohort', expect=(200,))
+    return True
+
+
+def admin_dashboards(client, stats, username, rng):
+    if not login(client, stats, username):
+        return False
+    stats.timed(client, '/admin/dashboard', 'GET', '/admin/dashboard', expect=(200,))
+    stats.timed(client, '/admin/reports', 'GET', '/admin/reports', expect=(200,))
+    stats.timed(client, '/admin/analytics', 'GET', '/admin/analytics', expect=(200,))
+    stats.timed(client, '/analytics', 'GET', '/analytics', expect=(200,))
+    return True
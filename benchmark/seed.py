@@ -0,0 +1,163 @@
+"""
+SmartQuiz benchmark - dataset seeding
+Every quiz gets the question bank from create_python_quiz.py, so attempts in
+the benchmark look exactly like the real Python quiz.
+
+    python -m benchmark.seed                                # MySQL database smartquiz_bench
+    python -m benchmark.seed --backend sqlite --path bench.db
+"""
+
+import argparse
+import random
+from datetime import datetime, timedelta
+
+from werkzeug.security import generate_password_hash
+
+import aggregates
+import schema
+from create_python_quiz import python_questions
+
+# Every seeded account shares this password; it is hashed once per seed run
+BENCH_PASSWORD = 'bench-password'
+
+PLACEHOLDER = {'mysql': '%s', 'sqlite': '?'}
+
+_BENCH_USERS = "SELECT id FROM users WHERE role = ? AND username LIKE 'bench_%' ORDER BY id"
+_BENCH_QUIZZES = "SELECT id FROM quizzes WHERE description = 'Benchmark quiz' ORDER BY id"
+
+
+def _insert_many(conn, dialect, sql, rows, batch=5000):
+    cursor = conn.cursor()
+    sql = sql.replace('?', PLACEHOLDER[dialect])
+    for start in range(0, len(rows), batch):
+        cursor.executemany(sql, rows[start:start + batch])
+    conn.commit()
+    cursor.close()
+
+
+def _ids(conn, dialect, sql, params=()):
+    cursor = conn.cursor()
+    cursor.execute(sql.replace('?', PLACEHOLDER[dialect]), params)
+    ids = [row['id'] if isinstance(row, dict) else row[0] for row in cursor.fetchall()]
+    cursor.close()
+    return ids
+
+
+def seed(conn, dialect, students=100, lecturers=5, quizzes=10, results=2000, seed=1):
+    """Fill a migrated database with benchmark accounts, quizzes and past results.
+
+    Returns a dict describing the dataset: usernames per role, quiz_ids and student_ids.
+    """
+    rng = random.Random(seed)
+    now = datetime.now()
+    password = generate_password_hash(BENCH_PASSWORD)
+
+    admin = 'bench_admin'
+    lecturer_names = [f'bench_lecturer_{i}' for i in range(lecturers)]
+    student_names = [f'bench_student_{i}' for i in range(students)]
+    _insert_many(conn, dialect, "INSERT INTO users (username, password, role, email) VALUES (?, ?, ?, ?)",
+                 [(admin, password, 'admin', 'bench_admin@example.com')] +
+                 [(name, password, 'lecturer', f'{name}@example.com') for name in lecturer_names] +
+                 [(name, password, 'student', f'{name}@example.com') for name in student_names])
+    lecturer_ids = _ids(conn, dialect, _BENCH_USERS, ('lecturer',))
+    student_ids = _ids(conn, dialect, _BENCH_USERS, ('student',))
+
+    _insert_many(conn, dialect, "INSERT INTO quizzes (title, description, created_by, duration) VALUES (?, ?, ?, ?)",
+                 [(f'Python Programming Fundamentals #{i + 1}', 'Benchmark quiz', lecturer_ids[i % len(lecturer_ids)], 60)
+                  for i in range(quizzes)])
+    quiz_ids = _ids(conn, dialect, _BENCH_QUIZZES)
+
+    _insert_many(conn, dialect,
+                 "INSERT INTO questions (quiz_id, question, option_a, option_b, option_c, option_d, correct_answer, "
+                 "difficulty_level) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                 [(quiz_id, q['question'], q['option_a'], q['option_b'], q['option_c'], q['option_d'], q['correct_answer'],
+                   q['difficulty_level'])
+                  for quiz_id in quiz_ids for q in python_questions])
+
+    total = len(python_questions)
+    history = []
+    for _ in range(results):
+        completed_at = now - timedelta(seconds=rng.randint(0, 90 * 24 * 3600))
+        history.append((rng.choice(student_ids), rng.choice(quiz_ids), rng.randint(0, total), total,
+                        completed_at.strftime('%Y-%m-%d %H:%M:%S')))
+    _insert_many(conn, dialect,
+                 "INSERT INTO results (user_id, quiz_id, score, total_questions, completed_at) VALUES (?, ?, ?, ?, ?)",
+                 history)
+    aggregates.rebuild(conn)
+
+    return {
+        'admin': admin,
+        'lecturers': lecturer_names,
+        'students': student_names,
+        'student_ids': student_ids,
+        'quiz_ids': quiz_ids,
+    }
+
+
+def existing_dataset(conn, dialect):
+    """Describe a database seeded earlier (for --no-seed runs)"""
+    cursor = conn.cursor()
+    cursor.execute("SELECT username, role FROM users WHERE username LIKE 'bench_%' ORDER BY id")
+    users = [(row[0], row[1]) if not isinstance(row, dict) else (row['username'], row['role']) for row in cursor.fetchall()]
+    cursor.close()
+    return {
+        'admin': next(name for name, role in users if role == 'admin'),
+        'lecturers': [name for name, role in users if role == 'lecturer'],
+        'students': [name for name, role in users if role == 'student'],
+        'student_ids': _ids(conn, dialect, _BENCH_USERS, ('student',)),
+        'quiz_ids': _ids(conn, dialect, _BENCH_QUIZZES),
+    }
+
+
+def connect(backend, database='smartquiz_bench', path='bench.db', recreate=True):
+    """Open (and by default recreate) the benchmark database, migrated to the latest schema"""
+    if backend == 'mysql':
+        import mysql.connector
+        from app import DB_CONFIG
+        server = {k: v for k, v in DB_CONFIG.items() if k != 'database'}
+        conn = mysql.connector.connect(**server)
+        cursor = conn.cursor()
+        if recreate:
+            cursor.execute(f"DROP DATABASE IF EXISTS {database}")
+        cursor.execute(f"CREATE DATABASE IF NOT EXISTS {database}")
+        cursor.close()
+        conn.close()
+        conn = mysql.connector.connect(**dict(server, database=database))
+    else:
+        import os
+        import sqlite3
+        if recreate and os.path.exists(path):
+            os.remove(path)
+        conn = sqlite3.connect(path)
+        conn.row_factory = sqlite3.Row
+    schema.migrate(conn, backend)
+    return conn
+
+
+def add_arguments(parser):
+    parser.add_argument('--backend', choices=['mysql', 'sqlite'], default='mysql')
+    parser.add_argument('--database', default='smartquiz_bench', help='MySQL database to (re)create')
+    parser.add_argument('--path', default='bench.db', help='SQLite file to (re)create')
+    parser.add_argument('--students', type=int, default=100)
+    parser.add_argument('--lecturers', type=int, default=5)
+    parser.add_argument('--quizzes', type=int, default=10)
+    parser.add_argument('--results', type=int, default=2000, help='historical results to seed')
+    parser.add_argument('--seed', type=int, default=1)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Seed a SmartQuiz benchmark database.')
+    add_arguments(parser)
+    args = parser.parse_args(argv)
+
+    conn = connect(args.backend, database=args.database, path=args.path)
+    dataset = seed(conn, args.backend, students=args.students, lecturers=args.lecturers,
+                   quizzes=args.quizzes, results=args.results, seed=args.seed)
+    conn.close()
+    print(f"Seeded {len(dataset['students'])} students, {len(dataset['lecturers'])} lecturers, "
+          f"{len(dataset['quiz_ids'])} quizzes x {len(python_questions)} questions, {args.results} results "
+          f"(password: {BENCH_PASSWORD})")
+
+
+if __name__ == '__main__':
+    main()
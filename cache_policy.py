@@ -0,0 +1,198 @@
+"""
+SmartQuiz - Per-route HTTP cache policy
+Views declare how their responses may be cached with @cache.policy(...);
+everything else gets the defaults below. A policy with `versions` also gets
+a strong ETag built from cheap data-version lookups (one query), so a repeat
+visit is answered 304 Not Modified before the view runs its own queries or
+renders anything.
+
+Data versions come from named sources registered by the app, e.g. a counter
+in the data_versions table that writes bump in their own transaction
+(bump_versions), or MAX(id) of an insert-only table.
+
+Defaults, for routes without a policy:
+    redirects, pages showing flash messages, logged-in pages -> no-store
+    anonymous pages                                          -> public, max-age=3600
+
+Logged-in pages that are allowed into the browser cache are 'private,
+no-cache' (always revalidated), and logout sends Clear-Site-Data so nothing
+protected can be shown from the cache afterwards. Pages showing a user's own
+or aggregate personal data are declared `personal` and stay no-store: a
+shared computer's disk cache must never hold them, so they get no ETag.
+"""
+
+import hashlib
+import os
+from functools import wraps
+
+from flask import Response, g, request, session
+from flask.globals import request_ctx
+
+_BUMP = {
+    'mysql': "INSERT INTO data_versions (name, version) VALUES (%s, 1) "
+             "ON DUPLICATE KEY UPDATE version = version + 1",
+    'sqlite': "INSERT INTO data_versions (name, version) VALUES (?, 1) "
+              "ON CONFLICT(name) DO UPDATE SET version = version + 1",
+}
+
+NO_STORE = 'no-cache, no-store, must-revalidate, private, max-age=0'
+
+
+def bump_versions(cursor, dialect, *names):
+    """Mark named data as changed; run inside the writing transaction (caller commits)"""
+    for name in names:
+        cursor.execute(_BUMP[dialect], (name,))
+
+
+def counter_source(name):
+    """Version source reading a data_versions counter"""
+    return f"(SELECT version FROM data_versions WHERE name = '{name}')", ()
+
+
+def _templates_stamp(folder):
+    """Changes whenever a template is edited, so a deploy changes every ETag"""
+    digest = hashlib.sha256()
+    for root, _, files in sorted(os.walk(folder)):
+        for name in sorted(files):
+            path = os.path.join(root, name)
+            digest.update(f'{path}:{os.path.getmtime(path)}'.encode())
+    return digest.hexdigest()[:12]
+
+
+class CachePolicy:
+    """How one route's responses may be cached.
+
+    public                 -- shared caches may store it (otherwise private to the browser)
+    max_age                -- seconds it may be used without revalidation (0: always revalidate)
+    stale_while_revalidate -- seconds a stale copy may be shown while revalidating in the background
+    versions               -- names of data-version sources the page depends on (enables ETag/304)
+    personal               -- shows personal data: never stored (no-store), so versions are ignored
+    """
+
+    __slots__ = ('public', 'max_age', 'stale_while_revalidate', 'versions', 'personal', 'sql', 'params')
+
+    def __init__(self, public=False, max_age=0, stale_while_revalidate=0, versions=(), personal=False):
+        self.public = public
+        self.max_age = max_age
+        self.stale_while_revalidate = stale_while_revalidate
+        self.versions = () if personal else tuple(versions)
+        self.personal = personal
+        self.sql = None
+        self.params = ()
+
+    def header(self):
+        if self.personal:
+            return NO_STORE
+        parts = ['public' if self.public else 'private']
+        parts.append(f'max-age={self.max_age}' if self.max_age else 'no-cache')
+        if self.stale_while_revalidate:
+            parts.append(f'stale-while-revalidate={self.stale_while_revalidate}')
+        return ', '.join(parts)
+
+
+class CachePolicies:
+    """Registry of route policies plus apply(), which the after_request hook calls.
+
+    get_db         -- callable returning the request's database connection
+    sources        -- {name: (scalar SQL subquery, (session keys used as its parameters))}
+    register_query -- optional dashboard_query, so each page's version query is EXPLAIN-checked
+    """
+
+    def __init__(self, get_db, sources, register_query=None):
+        self._get_db = get_db
+        self.sources = sources
+        self._register_query = register_query
+        self._stamp = ''
+        self.hits = 0
+        self.misses = 0
+
+    def policy(self, public=False, max_age=0, stale_while_revalidate=0, versions=(), personal=False):
+        """Decorator declaring a view's cache policy; put it below @session_required"""
+        policy = CachePolicy(public, max_age, stale_while_revalidate, versions, personal)
+        if policy.versions:
+            # All of a page's versions are read with a single query
+            columns, params = [], []
+            for index, name in enumerate(policy.versions):
+                sql, keys = self.sources[name]
+                columns.append(f'{sql} AS v{index}')
+                params.extend(keys)
+            policy.sql = 'SELECT ' + ', '.join(columns)
+            policy.params = tuple(params)
+
+        def decorator(view):
+            if policy.sql and self._register_query:
+                self._register_query(f'cache_versions_{view.__name__}', policy.sql, params=policy.params)
+
+            @wraps(view)
+            def wrapped(*args, **kwargs):
+                g.cache_policy = policy
+                if policy.sql and request.method in ('GET', 'HEAD') and not session.get('_flashes'):
+                    etag = self._etag(policy)
+                    if etag:
+                        g.cache_etag = etag
+                        if request.if_none_match.contains(etag):
+                            self.hits += 1
+                            return Response(status=304)
+                        self.misses += 1
+                return view(*args, **kwargs)
+            return wrapped
+        return decorator
+
+    def _etag(self, policy):
+        conn = self._get_db()
+        if not conn:
+            return None
+        cursor = conn.cursor()
+        try:
+            cursor.execute(policy.sql, tuple(session.get(key) for key in policy.params))
+            row = cursor.fetchone()
+        except Exception as e:
+            print(f"[WARN] Cache version lookup failed: {e}")
+            return None
+        finally:
+            cursor.close()
+        values = list(row.values()) if isinstance(row, dict) else list(row or ())
+        # The navbar shows who is logged in, so that is part of the page too
+        identity = (request.endpoint, session.get('user_id'), session.get('username'), session.get('role'), self._stamp)
+        return hashlib.sha256(repr((identity, values)).encode()).hexdigest()[:32]
+
+    def apply(self, response):
+        """after_request: set Cache-Control (and the ETag) for the response"""
+        policy = g.pop('cache_policy', None)
+        etag = g.pop('cache_etag', None)
+        logged_in = 'user_id' in session
+        # Flash messages rendered into this page (or still waiting) make it one-off
+        flashed = bool(request_ctx.flashes) or bool(session.get('_flashes'))
+
+        if response.status_code == 304 and policy is not None:
+            cache_control = policy.header()
+            if etag:
+                response.set_etag(etag)
+        elif response.status_code in (301, 302, 303, 307, 308) or flashed or response.status_code >= 400:
+            cache_control = NO_STORE
+        elif policy is not None:
+            cache_control = policy.header()
+            if etag and response.status_code == 200:
+                response.set_etag(etag)
+        elif logged_in and response.get_etag()[0]:
+            # Views that validate themselves (e.g. the notification pages)
+            cache_control = 'private, no-cache'
+        elif logged_in:
+            cache_control = NO_STORE
+        else:
+            cache_control = 'public, max-age=3600'
+
+        response.headers['Cache-Control'] = cache_control
+        if cache_control == NO_STORE:
+            response.headers['Pragma'] = 'no-cache'
+            response.headers['Expires'] = '0'
+        # Pages differ between logged-in users and anonymous visitors
+        response.vary.add('Cookie')
+        return response
+
+    def stats(self):
+        return {'not_modified': self.hits, 'modified': self.misses}
+
+    def init_app(self, app):
+        """Fingerprint the templates; call apply() from the app's after_request hook"""
+        self._stamp = _templates_stamp(os.path.join(app.root_path, app.template_folder))
@@ -0,0 +1,258 @@
+"""
+SmartQuiz - Response compression
+WSGI middleware that gzips (or, if the brotli package is installed, brotli
+compresses) HTML, JSON, CSV and other text responses for browsers that
+accept it. Bodies with a known length are compressed in one go. Streamed
+bodies (e.g. the CSV export) are compressed chunk by chunk, and each chunk
+is flushed so the client keeps receiving data as it is produced.
+
+Skipped: Server-Sent Events, responses already encoded (the precompressed
+/assets/ files), bodies under min_size, HEAD requests, 1xx/204/206/304
+responses and anything marked Cache-Control: no-transform.
+
+Compressed responses get a '-gzip' / '-br' suffix on their ETag, because
+they are a different representation. The suffix is removed from
+If-None-Match before the app sees it, so the app's own 304 checks keep
+working.
+
+    COMPRESS_MIN_SIZE   smallest body in bytes worth compressing (default 1024)
+    COMPRESS_LEVEL      gzip level 1-9 (default 6); brotli uses the matching quality
+"""
+
+import re
+import time
+import zlib
+
+from werkzeug.datastructures import Headers
+from werkzeug.http import parse_accept_header, parse_cache_control_header
+from werkzeug.wsgi import ClosingIterator
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_TYPES = (
+    'text/html', 'text/plain', 'text/css', 'text/csv', 'text/javascript',
+    'application/json', 'application/javascript', 'application/xml', 'image/svg+xml',
+)
+
+_ETAG_SUFFIX = re.compile(r'-(?:gzip|br)"')
+
+
+class _Gzip:
+    name = 'gzip'
+
+    def __init__(self, level):
+        self._z = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data):
+        return self._z.compress(data)
+
+    def flush(self):
+        return self._z.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self._z.flush()
+
+
+class _Brotli:
+    name = 'br'
+
+    def __init__(self, level):
+        # Brotli's quality 0-11; gzip's default level 6 maps to quality 5
+        self._c = brotli.Compressor(quality=min(11, max(0, level - 1)))
+
+    def compress(self, data):
+        return self._c.process(data)
+
+    def flush(self):
+        return self._c.flush()
+
+    def finish(self):
+        return self._c.finish()
+
+
+ENCODERS = {'gzip': _Gzip}
+if brotli is not None:
+    ENCODERS['br'] = _Brotli
+
+
+def negotiate(accept_encoding, available=None):
+    """Best encoding the client accepts, or None; brotli is preferred on equal quality"""
+    accepted = parse_accept_header(accept_encoding)
+    best, best_quality = None, 0
+    for name in ('br', 'gzip'):
+        if name not in (available or ENCODERS):
+            continue
+        quality = accepted[name]
+        if quality > best_quality:
+            best, best_quality = name, quality
+    return best
+
+
+class Compress:
+    """WSGI middleware compressing text responses.
+
+    min_size      -- bodies smaller than this many bytes are sent as they are
+    level         -- zlib level 1-9
+    content_types -- media types that may be compressed
+    """
+
+    def __init__(self, wsgi_app, min_size=1024, level=6, content_types=COMPRESSIBLE_TYPES):
+        self.wsgi_app = wsgi_app
+        self.min_size = min_size
+        self.level = level
+        self.content_types = frozenset(content_types)
+        self.compressed = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.seconds = 0.0
+
+    def __call__(self, environ, start_response):
+        encoding = negotiate(environ.get('HTTP_ACCEPT_ENCODING'))
+        if encoding is None or environ.get('REQUEST_METHOD') == 'HEAD':
+            return self.wsgi_app(environ, start_response)
+
+        if_none_match = environ.get('HTTP_IF_NONE_MATCH')
+        revalidating = bool(if_none_match and _ETAG_SUFFIX.search(if_none_match))
+        if revalidating:
+            environ['HTTP_IF_NONE_MATCH'] = _ETAG_SUFFIX.sub('"', if_none_match)
+
+        captured = []
+
+        def capture(status, headers, exc_info=None):
+            # Nothing is sent until _respond has seen the headers, so a later call just replaces them
+            captured[:] = [status, headers, exc_info]
+            return self._no_write
+
+        body = self.wsgi_app(environ, capture)
+        # The app's close() must run even if the client goes away before the first chunk
+        return ClosingIterator(self._respond(body, captured, encoding, start_response, revalidating),
+                               getattr(body, 'close', None))
+
+    @staticmethod
+    def _no_write(data):
+        raise RuntimeError('Compress does not support the WSGI write() callable')
+
+    def _eligible(self, status, headers):
+        code = int(status.split(None, 1)[0])
+        if code < 200 or code in (204, 206, 304):
+            return False
+        if 'Content-Encoding' in headers or 'Content-Range' in headers:
+            return False
+        mimetype = headers.get('Content-Type', '').split(';', 1)[0].strip().lower()
+        if mimetype not in self.content_types:
+            return False
+        if 'no-transform' in parse_cache_control_header(headers.get('Cache-Control')):
+            return False
+        length = headers.get('Content-Length')
+        return not (length and length.isdigit() and int(length) < self.min_size)
+
+    def _respond(self, body, captured, encoding, start_response, revalidating=False):
+        iterator = iter(body)
+        # Apps may call start_response lazily, when the first chunk is produced
+        chunks = []
+        while not captured:
+            chunk = next(iterator, None)
+            if chunk is None:
+                break
+            chunks.append(chunk)
+        status, raw_headers, exc_info = captured
+        headers = Headers(raw_headers)
+
+        if not self._eligible(status, headers):
+            if revalidating and status.startswith('304') and 'ETag' in headers:
+                # The client revalidated a compressed copy; confirm it under the tag it holds
+                headers['ETag'] = headers['ETag'].rstrip('"') + f'-{encoding}"'
+            start_response(status, headers.to_wsgi_list(), exc_info)
+            yield from chunks
+            yield from iterator
+            return
+
+        headers['Vary'] = _add_vary(headers.get('Vary', ''))
+        if 'Content-Length' in headers:
+            # The whole body is at hand (or about to be); compress it in one go
+            data = b''.join(chunks) + b''.join(iterator)
+            compressed = self._encode(encoding, data)
+            if len(compressed) >= len(data):
+                start_response(status, headers.to_wsgi_list(), exc_info)
+                yield data
+                return
+            self._set_encoded(headers, encoding, len(compressed))
+            start_response(status, headers.to_wsgi_list(), exc_info)
+            yield compressed
+            return
+
+        # Streamed body: hold it back until it is clearly worth compressing
+        size = sum(len(c) for c in chunks)
+        while size < self.min_size:
+            chunk = next(iterator, None)
+            if chunk is None:
+                headers['Content-Length'] = str(size)
+                start_response(status, headers.to_wsgi_list(), exc_info)
+                yield b''.join(chunks)
+                return
+            chunks.append(chunk)
+            size += len(chunk)
+        self._set_encoded(headers, encoding, None)
+        start_response(status, headers.to_wsgi_list(), exc_info)
+        yield from self._stream(encoding, chunks, iterator)
+
+    def _set_encoded(self, headers, encoding, length):
+        headers['Content-Encoding'] = encoding
+        if length is None:
+            headers.remove('Content-Length')
+        else:
+            headers['Content-Length'] = str(length)
+        if 'ETag' in headers:
+            headers['ETag'] = headers['ETag'].rstrip('"') + f'-{encoding}"'
+
+    def _encode(self, encoding, data):
+        start = time.perf_counter()
+        encoder = ENCODERS[encoding](self.level)
+        compressed = encoder.compress(data) + encoder.finish()
+        self._count(len(data), len(compressed), time.perf_counter() - start)
+        return compressed
+
+    def _stream(self, encoding, chunks, iterator):
+        encoder = ENCODERS[encoding](self.level)
+        bytes_in = bytes_out = 0
+        spent = 0.0
+        try:
+            for chunk in _chain(chunks, iterator):
+                if not chunk:
+                    continue
+                start = time.perf_counter()
+                out = encoder.compress(chunk) + encoder.flush()
+                spent += time.perf_counter() - start
+                bytes_in += len(chunk)
+                bytes_out += len(out)
+                yield out
+            out = encoder.finish()
+            bytes_out += len(out)
+            yield out
+        finally:
+            self._count(bytes_in, bytes_out, spent)
+
+    def _count(self, bytes_in, bytes_out, seconds):
+        self.compressed += 1
+        self.bytes_in += bytes_in
+        self.bytes_out += bytes_out
+        self.seconds += seconds
+
+    def stats(self):
+        return {'responses': self.compressed, 'bytes_in': self.bytes_in, 'bytes_out': self.bytes_out,
+                'cpu_seconds': round(self.seconds, 6)}
+
+
+def _chain(chunks, iterator):
+    yield from chunks
+    yield from iterator
+
+
+def _add_vary(value):
+    names = [v.strip() for v in value.split(',') if v.strip()]
+    if 'accept-encoding' not in (n.lower() for n in names) and '*' not in names:
+        names.append('Accept-Encoding')
+    return ', '.join(names)
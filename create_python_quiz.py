@@ -1,6 +1,21 @@
+"""
+Create the sample Python quiz, or seed quizzes in bulk from question files.
+
+    python create_python_quiz.py                                  # the Python quiz below
+    python create_python_quiz.py --quizzes 50                     # 50 copies of it
+    python create_python_quiz.py bank.csv more.json --per-quiz 200 --title "Question Bank"
+
+Files use the format described in question_import.py. All quizzes and
+questions are written in one transaction, questions with batched executemany.
+"""
+
+import argparse
+
 import mysql.connector
 from werkzeug.security import generate_password_hash
 
+import question_import
+
 # Database configuration
 DB_CONFIG = {
     'host': 'localhost',
@@ -193,88 +208,114 @@ python_questions = [
     }
 ]
 
-def create_python_quiz():
+def chunk_questions(questions, per_quiz=None, copies=1):
+    """Split a question list into per-quiz banks, repeated `copies` times"""
+    per_quiz = per_quiz or len(questions)
+    banks = [questions[start:start + per_quiz] for start in range(0, len(questions), per_quiz)]
+    return banks * copies
+
+
+def seed_quizzes(conn, banks, lecturer_username='lecturer_python', title='Python Programming Fundamentals',
+                 description=None, duration=60, batch=5000):
+    """Create one quiz per question bank in a single transaction. Returns (lecturer_id, quiz_ids)."""
+    cursor = conn.cursor(dictionary=True)
     try:
-        conn = mysql.connector.connect(**DB_CONFIG)
-        cursor = conn.cursor(dictionary=True)
-        
-        print("=" * 60)
-        print("CREATE PYTHON QUIZ")
-        print("=" * 60)
-        
-        # First, create a lecturer account if it doesn't exist
-        lecturer_username = "lecturer_python"
-        lecturer_password = generate_password_hash('123456')
-        lecturer_email = "lecturer_python@gmail.com"
-        
-        print(f"\n[STEP 1] Checking for lecturer account...")
         cursor.execute("SELECT id FROM users WHERE username = %s AND role = 'lecturer'", (lecturer_username,))
         lecturer = cursor.fetchone()
-        
         if not lecturer:
             print(f"[INFO] Creating new lecturer account: {lecturer_username}")
             cursor.execute(
                 "INSERT INTO users (username, password, role, email) VALUES (%s, %s, %s, %s)",
-                (lecturer_username, lecturer_password, 'lecturer', lecturer_email)
+                (lecturer_username, generate_password_hash('123456'), 'lecturer', f'{lecturer_username}@gmail.com')
             )
-            conn.commit()
-            cursor.execute("SELECT id FROM users WHERE username = %s", (lecturer_username,))
-            lecturer = cursor.fetchone()
-            print(f"✓ Lecturer account created with ID: {lecturer['id']}")
+            lecturer_id = cursor.lastrowid
         else:
-            print(f"✓ Lecturer account found with ID: {lecturer['id']}")
-        
-        lecturer_id = lecturer['id']
-        
-        # Create the quiz
-        print(f"\n[STEP 2] Creating Python quiz...")
-        quiz_title = "Python Programming Fundamentals"
-        quiz_description = "A comprehensive quiz covering Python basics, data structures, functions, OOP, and advanced concepts"
-        quiz_duration = 60
-        
-        cursor.execute(
-            "INSERT INTO quizzes (title, description, created_by, duration) VALUES (%s, %s, %s, %s)",
-            (quiz_title, quiz_description, lecturer_id, quiz_duration)
-        )
-        conn.commit()
-        
-        cursor.execute("SELECT LAST_INSERT_ID() as quiz_id")
-        quiz = cursor.fetchone()
-        quiz_id = quiz['quiz_id']
-        print(f"✓ Quiz created with ID: {quiz_id}")
-        
-        # Insert questions
-        print(f"\n[STEP 3] Adding {len(python_questions)} questions to the quiz...")
-        inserted_count = 0
-        
-        for i, q in enumerate(python_questions, 1):
+            lecturer_id = lecturer['id']
+
+        quiz_ids = []
+        for number, _ in enumerate(banks, 1):
+            quiz_title = title if len(banks) == 1 else f"{title} #{number}"
             cursor.execute(
-                "INSERT INTO questions (quiz_id, question, option_a, option_b, option_c, option_d, correct_answer) VALUES (%s, %s, %s, %s, %s, %s, %s)",
-                (quiz_id, q['question'], q['option_a'], q['option_b'], q['option_c'], q['option_d'], q['correct_answer'])
+                "INSERT INTO quizzes (title, description, created_by, duration) VALUES (%s, %s, %s, %s)",
+                (quiz_title, description, lecturer_id, duration)
             )
-            inserted_count += 1
-            print(f"  {i}. {q['question'][:50]}... [{q['difficulty_level']}]")
-        
+            quiz_ids.append(cursor.lastrowid)
+
+        rows = [(quiz_id,) + tuple(q.get(name) for name in question_import.FIELDS)
+                for quiz_id, bank in zip(quiz_ids, banks) for q in bank]
+        sql = question_import.INSERT_QUESTION.replace('?', question_import.PLACEHOLDER['mysql'])
+        for start in range(0, len(rows), batch):
+            cursor.executemany(sql, rows[start:start + batch])
         conn.commit()
+        return lecturer_id, quiz_ids
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
         cursor.close()
+
+
+def create_python_quiz(files=(), quizzes=1, per_quiz=None, title=None, description=None, duration=60,
+                       lecturer_username="lecturer_python"):
+    try:
+        print("=" * 60)
+        print("CREATE PYTHON QUIZ" if not files else "SEED QUIZZES")
+        print("=" * 60)
+
+        # Validate every file before connecting, so a bad row never leaves half a bank behind
+        print(f"\n[STEP 1] Loading questions...")
+        if files:
+            questions = []
+            for path in files:
+                with open(path, 'rb') as f:
+                    loaded = question_import.load(f.read(), path)
+                print(f"✓ {path}: {len(loaded)} questions")
+                questions.extend(loaded)
+        else:
+            questions = question_import.validate(python_questions)
+            print(f"✓ Built-in Python questions: {len(questions)}")
+        title = title or ("Python Programming Fundamentals" if not files else "Question Bank")
+        if description is None and not files:
+            description = "A comprehensive quiz covering Python basics, data structures, functions, OOP, and advanced concepts"
+        banks = chunk_questions(questions, per_quiz, quizzes)
+
+        print(f"\n[STEP 2] Creating {len(banks)} quiz(zes) with {sum(map(len, banks))} questions...")
+        conn = mysql.connector.connect(**DB_CONFIG)
+        lecturer_id, quiz_ids = seed_quizzes(conn, banks, lecturer_username, title, description, duration)
         conn.close()
-        
+
         print("\n" + "=" * 60)
         print("QUIZ CREATION SUMMARY")
         print("=" * 60)
-        print(f"Quiz Title: {quiz_title}")
-        print(f"Quiz ID: {quiz_id}")
+        print(f"Quiz Title: {title}")
+        print(f"Quiz IDs: {', '.join(map(str, quiz_ids))}")
         print(f"Lecturer: {lecturer_username} (ID: {lecturer_id})")
-        print(f"Duration: {quiz_duration} minutes")
-        print(f"Questions: {inserted_count}")
-        print(f"Difficulty Distribution: Easy, Medium, Hard")
-        print("\n✓ Python quiz created successfully!")
+        print(f"Duration: {duration} minutes")
+        print(f"Questions per quiz: {', '.join(str(len(bank)) for bank in banks)}")
+        print(f"\n✓ {len(quiz_ids)} quiz(zes) created successfully!")
         print(f"\nQuiz Details:")
         print(f"  - Lecturer Login: {lecturer_username} / 123456")
-        print(f"  - Quiz ID: {quiz_id}")
-        
+
+    except question_import.QuestionImportError as e:
+        for message in e.errors:
+            print(f"[ERROR] {message}")
     except Exception as e:
         print(f"[ERROR] {e}")
 
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Create the sample Python quiz or seed quizzes from question files.')
+    parser.add_argument('files', nargs='*', help='CSV/JSON question files (default: the built-in Python questions)')
+    parser.add_argument('--quizzes', type=int, default=1, help='create this many copies of every quiz')
+    parser.add_argument('--per-quiz', type=int, help='split the questions into quizzes of this size')
+    parser.add_argument('--title', help='quiz title (numbered when several quizzes are created)')
+    parser.add_argument('--description')
+    parser.add_argument('--duration', type=int, default=60, help='minutes')
+    parser.add_argument('--lecturer', default='lecturer_python', help='owner; created if it does not exist')
+    args = parser.parse_args(argv)
+    create_python_quiz(args.files, quizzes=args.quizzes, per_quiz=args.per_quiz, title=args.title,
+                       description=args.description, duration=args.duration, lecturer_username=args.lecturer)
+
+
 if __name__ == '__main__':
-    create_python_quiz()
+    main()
@@ -0,0 +1,205 @@
+"""
+SmartQuiz - Database connection pool
+Keeps warm connections per worker process so views don't pay a TCP + auth
+handshake on every get_db() call. Used by both app.py (MySQL) and
+app_sqlite.py (SQLite).
+"""
+
+import os
+import threading
+import time
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection becomes available within the checkout timeout"""
+
+
+class PooledConnection:
+    """Proxy around a raw DB-API connection that returns it to the pool instead of closing it"""
+
+    def __init__(self, pool, raw, created_at, scoped=False):
+        self._pool = pool
+        self._raw = raw
+        self._created_at = created_at
+        # Request-scoped connections are released by the app teardown hook,
+        # so views can keep calling conn.close() as before.
+        self._scoped = scoped
+        self._released = False
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+    @property
+    def raw(self):
+        """The underlying connection, which outlives this checkout (e.g. to key per-connection caches)"""
+        return self._raw
+
+    def close(self):
+        if not self._scoped:
+            self.release()
+
+    def release(self, discard=False):
+        if self._released:
+            return
+        self._released = True
+        self._pool._put(self._raw, self._created_at, discard=discard)
+
+
+class ConnectionPool:
+    """Bounded, thread-safe pool with health-checking and max-lifetime recycling.
+
+    connect      -- zero-argument callable returning a new raw connection
+    size         -- maximum number of open connections in this process
+    max_lifetime -- seconds after which a connection is closed and replaced
+    ping         -- callable(conn) that raises if the connection is unusable
+    ping_interval-- only ping connections that sat idle longer than this (seconds)
+    timeout      -- seconds to wait for a free connection before PoolTimeout
+    """
+
+    def __init__(self, connect, size=5, max_lifetime=1800, ping=None, ping_interval=30, timeout=10):
+        self._connect = connect
+        self.size = size
+        self.max_lifetime = max_lifetime
+        self._ping = ping
+        self.ping_interval = ping_interval
+        self.timeout = timeout
+        self._cond = threading.Condition()
+        self._reset()
+
+    def _reset(self):
+        # Connections must never be shared across a fork (gunicorn workers)
+        self._pid = os.getpid()
+        self._idle = []      # [(raw, created_at, returned_at)], most recently used last
+        self._open = 0
+        self.stats_counters = {'created': 0, 'recycled': 0, 'failed_checks': 0, 'timeouts': 0, 'checkouts': 0}
+
+    def connection(self, scoped=False):
+        """Check out a connection wrapped in a PooledConnection"""
+        raw, created_at = self._get()
+        return PooledConnection(self, raw, created_at, scoped=scoped)
+
+    def _get(self):
+        deadline = time.monotonic() + self.timeout
+        while True:
+            raw = None
+            with self._cond:
+                if self._pid != os.getpid():
+                    self._reset()
+                while True:
+                    if self._idle:
+                        raw, created_at, returned_at = self._idle.pop()
+                        now = time.monotonic()
+                        if now - created_at > self.max_lifetime:
+                            self.stats_counters['recycled'] += 1
+                            self._discard(raw)
+                            raw = None
+                            continue
+                        if not (self._ping and now - returned_at > self.ping_interval):
+                            self.stats_counters['checkouts'] += 1
+                            return raw, created_at
+                        # Needs a health check: ping it below, outside the lock
+                        break
+                    if self._open < self.size:
+                        self._open += 1
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.stats_counters['timeouts'] += 1
+                        raise PoolTimeout(f'No database connection available after {self.timeout}s')
+                    self._cond.wait(remaining)
+
+            if raw is None:
+                break
+            # Like opening a connection, a ping is a server round trip; other checkouts
+            # and returns must not wait on it. The connection stays counted as open.
+            try:
+                self._ping(raw)
+            except Exception:
+                try:
+                    raw.close()
+                except Exception:
+                    pass
+                with self._cond:
+                    self.stats_counters['failed_checks'] += 1
+                    self._open -= 1
+                    self._cond.notify()
+                continue
+            with self._cond:
+                self.stats_counters['checkouts'] += 1
+            return raw, created_at
+
+        # Open the new connection outside the lock so slow handshakes don't block other checkouts
+        try:
+            raw = self._connect()
+        except Exception:
+            with self._cond:
+                self._open -= 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            self.stats_counters['created'] += 1
+            self.stats_counters['checkouts'] += 1
+        return raw, time.monotonic()
+
+    def _put(self, raw, created_at, discard=False):
+        if not discard:
+            try:
+                # Never hand out a connection with an open transaction
+                raw.rollback()
+            except Exception:
+                discard = True
+        with self._cond:
+            if self._pid != os.getpid():
+                return
+            if discard or time.monotonic() - created_at > self.max_lifetime:
+                if not discard:
+                    self.stats_counters['recycled'] += 1
+                self._discard(raw)
+            else:
+                self._idle.append((raw, created_at, time.monotonic()))
+            self._cond.notify()
+
+    def _discard(self, raw):
+        # Caller holds the lock
+        self._open -= 1
+        try:
+            raw.close()
+        except Exception:
+            pass
+
+    def close_all(self):
+        """Close every idle connection (checked-out ones are closed when returned)"""
+        with self._cond:
+            while self._idle:
+                raw, _, _ = self._idle.pop()
+                self._discard(raw)
+            self._cond.notify_all()
+
+    def stats(self):
+        """Snapshot of pool usage for diagnostics"""
+        with self._cond:
+            data = dict(self.stats_counters)
+            data.update(size=self.size, open=self._open, idle=len(self._idle),
+                        in_use=self._open - len(self._idle))
+            return data
+
+
+def default_pool_size():
+    """One connection per gunicorn thread that can be running an ordinary view.
+
+    The Procfile runs WEB_THREADS threads per worker; up to EVENTS_MAX_STREAMS of
+    them sit on /events streams, which never touch the database.
+    """
+    threads = int(os.environ.get('WEB_THREADS', 64))
+    streams = int(os.environ.get('EVENTS_MAX_STREAMS', 48))
+    return max(threads - streams, 5)
+
+
+def pool_settings():
+    """Read pool sizing from the environment"""
+    return {
+        'size': int(os.environ.get('DB_POOL_SIZE') or default_pool_size()),
+        'max_lifetime': int(os.environ.get('DB_POOL_MAX_LIFETIME', 1800)),
+        'ping_interval': int(os.environ.get('DB_POOL_PING_INTERVAL', 30)),
+        'timeout': int(os.environ.get('DB_POOL_TIMEOUT', 10)),
+    }
@@ -0,0 +1,224 @@
+"""
+SmartQuiz - Server-Sent Events push channel
+An in-process publish/subscribe bus feeds /events streams: new notifications
+go to everyone, session events (logout) to the tabs of one login. Workers on
+the same machine relay events to each other over Unix datagram sockets in a
+shared directory (one socket per worker process), so no external broker is
+needed. On platforms without Unix sockets events stay within one process.
+
+    EVENTS_SOCKET_DIR   directory for the worker sockets (default: under the system temp dir)
+    EVENTS_MAX_STREAMS  open streams allowed per worker; more get 503 and the page falls back to polling
+
+Each open stream holds a worker thread, so run gunicorn with threaded workers
+(see Procfile) and keep EVENTS_MAX_STREAMS well below --threads so ordinary
+requests still find a free thread.
+"""
+
+import glob
+import hashlib
+import json
+import os
+import socket
+import tempfile
+import threading
+import time
+from collections import deque
+
+# Datagrams larger than this are not relayed to other workers
+MAX_DATAGRAM = 60 * 1024
+
+
+def format_event(event, data):
+    """One SSE message"""
+    lines = [f'event: {event}']
+    lines.extend(f'data: {line}' for line in json.dumps(data).splitlines())
+    return '\n'.join(lines) + '\n\n'
+
+
+class Subscription:
+    """Bounded mailbox for one stream; the oldest events are dropped if the client falls behind"""
+
+    def __init__(self, channels, max_queue=100):
+        self.channels = frozenset(channels)
+        self._events = deque(maxlen=max_queue)
+        self._ready = threading.Condition()
+
+    def put(self, event):
+        with self._ready:
+            self._events.append(event)
+            self._ready.notify()
+
+    def get(self, timeout):
+        """Next (event, data), or None after `timeout` seconds without one"""
+        with self._ready:
+            if not self._events:
+                self._ready.wait(timeout)
+            return self._events.popleft() if self._events else None
+
+
+class LocalBroadcast:
+    """Relays events between the worker processes of one machine over Unix datagram sockets"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.path = None
+        self._sender = None
+        self.sent = 0
+        self.dropped = 0
+
+    def start(self, handler):
+        """Bind this process's socket and deliver incoming events to handler(channel, event, data)"""
+        os.makedirs(self.directory, mode=0o700, exist_ok=True)
+        self.path = os.path.join(self.directory, f'{os.getpid()}.sock')
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        receiver = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        receiver.bind(self.path)
+        self._sender = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._sender.setblocking(False)
+
+        def listen():
+            while True:
+                payload = receiver.recv(MAX_DATAGRAM)
+                try:
+                    channel, event, data = json.loads(payload)
+                except ValueError:
+                    continue
+                try:
+                    handler(channel, event, data)
+                except Exception as e:
+                    print(f"[ERROR] Relayed event {event} on {channel} failed: {e}")
+
+        threading.Thread(target=listen, name='events-relay', daemon=True).start()
+
+    def send(self, channel, event, data):
+        payload = json.dumps([channel, event, data]).encode()
+        if len(payload) > MAX_DATAGRAM:
+            print(f"[WARN] Event {event} on {channel} is too large to relay to other workers")
+            return
+        for path in glob.glob(os.path.join(self.directory, '*.sock')):
+            if path == self.path:
+                continue
+            try:
+                self._sender.sendto(payload, path)
+                self.sent += 1
+            except (ConnectionRefusedError, FileNotFoundError):
+                # The worker that owned this socket is gone
+                try:
+                    os.unlink(path)
+                except OSError:
+                    pass
+            except OSError:
+                # Receiver's buffer is full; it will catch up from the next event or page load
+                self.dropped += 1
+
+
+class EventBus:
+    """In-process pub/sub for SSE streams, relayed to the other workers on this machine.
+
+    max_streams -- open streams allowed per process
+    max_queue   -- undelivered events kept per stream
+    heartbeat   -- seconds between keep-alive comments on an idle stream
+    max_age     -- seconds before a stream ends and the browser reconnects (re-checking its session)
+    """
+
+    def __init__(self, directory=None, max_streams=48, max_queue=100, heartbeat=20, max_age=300):
+        self.max_streams = max_streams
+        self.max_queue = max_queue
+        self.heartbeat = heartbeat
+        self.max_age = max_age
+        self._directory = directory
+        self._subscriptions = set()
+        self._listeners = {}
+        self._lock = threading.Lock()
+        self._pid = None
+        self._relay = None
+        self.published = 0
+        self.rejected = 0
+
+    def _ensure_started(self):
+        # Each forked gunicorn worker needs its own socket and relay thread
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._subscriptions = set()
+            self._relay = None
+            if self._directory and hasattr(socket, 'AF_UNIX'):
+                relay = LocalBroadcast(self._directory)
+                try:
+                    relay.start(self._deliver)
+                    self._relay = relay
+                except OSError as e:
+                    print(f"[WARN] Events will not be relayed between workers: {e}")
+
+    def on(self, channel, callback):
+        """Call callback(event, data) in every worker whenever something is published on channel"""
+        self._listeners.setdefault(channel, []).append(callback)
+
+    def publish(self, channel, event, data):
+        self._ensure_started()
+        self.published += 1
+        self._deliver(channel, event, data)
+        if self._relay:
+            self._relay.send(channel, event, data)
+
+    def _deliver(self, channel, event, data):
+        for callback in self._listeners.get(channel, ()):
+            callback(event, data)
+        with self._lock:
+            targets = [s for s in self._subscriptions if channel in s.channels]
+        for subscription in targets:
+            subscription.put((event, data))
+
+    def subscribe(self, channels):
+        """A new Subscription, or None if this worker already has max_streams open"""
+        self._ensure_started()
+        with self._lock:
+            if len(self._subscriptions) >= self.max_streams:
+                self.rejected += 1
+                return None
+            subscription = Subscription(channels, self.max_queue)
+            self._subscriptions.add(subscription)
+            return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    def stream(self, subscription, retry=3000):
+        """SSE body for a subscription; ends after max_age so the browser reconnects with its current cookie"""
+        deadline = time.monotonic() + self.max_age
+        try:
+            yield f'retry: {retry}\n\n'
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    yield format_event('reconnect', {})
+                    return
+                item = subscription.get(min(self.heartbeat, remaining))
+                if item is None:
+                    yield ': keepalive\n\n'
+                else:
+                    yield format_event(*item)
+        finally:
+            self.unsubscribe(subscription)
+
+    def stats(self):
+        data = {'streams': len(self._subscriptions), 'published': self.published, 'rejected': self.rejected}
+        if self._relay:
+            data.update(relayed=self._relay.sent, relay_dropped=self._relay.dropped)
+        return data
+
+    def init_app(self, app):
+        """Bind the relay socket in each worker before its first request"""
+        if self._directory is None:
+            # Keyed by the app's location so two deployments on one machine don't hear each other
+            key = hashlib.sha256(app.root_path.encode()).hexdigest()[:12]
+            self._directory = os.path.join(tempfile.gettempdir(), f'smartquiz-events-{key}')
+
+        @app.before_request
+        def _start_event_relay():
+            self._ensure_started()
@@ -0,0 +1,225 @@
+"""
+SmartQuiz - EXPLAIN-based index regression check
+Dashboard queries in queries.py and app.py are registered with queries.dashboard_query(). This script
+seeds a large throwaway database, runs EXPLAIN on every registered query and
+exits non-zero if any of them does a full table scan.
+
+Usage:
+    python explain_check.py                         # MySQL, database smartquiz_explain
+    python explain_check.py --backend sqlite        # throwaway SQLite file
+    python explain_check.py --results 500000        # bigger dataset
+"""
+
+import argparse
+import os
+import random
+import re
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+from queries import DASHBOARD_QUERIES
+
+
+# -------------------- Seeding --------------------
+
+# Pre-computed hash so seeding doesn't pay for thousands of KDF runs
+_SEED_PASSWORD = 'scrypt:32768:8:1$seed$' + '0' * 128
+
+
+def _insert_many(conn, dialect, sql, rows, batch=5000):
+    ph = '%s' if dialect == 'mysql' else '?'
+    cursor = conn.cursor()
+    sql = sql.replace('?', ph)
+    for start in range(0, len(rows), batch):
+        cursor.executemany(sql, rows[start:start + batch])
+    conn.commit()
+    cursor.close()
+
+
+def _ids(conn, sql):
+    cursor = conn.cursor()
+    cursor.execute(sql)
+    ids = [row['id'] if isinstance(row, dict) else row[0] for row in cursor.fetchall()]
+    cursor.close()
+    return ids
+
+
+def seed_large_dataset(conn, dialect, students=5000, lecturers=100, quizzes=400, questions_per_quiz=20,
+                       results=200000, notifications=500, courses=100, seed=42):
+    """Fill an empty (migrated) database with a realistic volume of rows"""
+    rng = random.Random(seed)
+    now = datetime.now()
+
+    _insert_many(conn, dialect, "INSERT INTO users (username, password, role, email) VALUES (?, ?, ?, ?)",
+                 [(f'lecturer_{i}', _SEED_PASSWORD, 'lecturer', f'lecturer_{i}@example.com') for i in range(lecturers)] +
+                 [(f'student_{i}', _SEED_PASSWORD, 'student', f'student_{i}@example.com') for i in range(students)])
+    lecturer_ids = _ids(conn, "SELECT id FROM users WHERE role = 'lecturer'")
+    student_ids = _ids(conn, "SELECT id FROM users WHERE role = 'student'")
+
+    _insert_many(conn, dialect, "INSERT INTO quizzes (title, description, created_by, duration) VALUES (?, ?, ?, ?)",
+                 [(f'Quiz {i}', f'Seeded quiz {i}', rng.choice(lecturer_ids), 30) for i in range(quizzes)])
+    quiz_ids = _ids(conn, "SELECT id FROM quizzes")
+
+    _insert_many(conn, dialect,
+                 "INSERT INTO questions (quiz_id, question, option_a, option_b, option_c, option_d, correct_answer) "
+                 "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                 [(quiz_id, f'Question {n} of quiz {quiz_id}?', 'A', 'B', 'C', 'D', rng.choice('ABCD'))
+                  for quiz_id in quiz_ids for n in range(questions_per_quiz)])
+
+    result_rows = []
+    for _ in range(results):
+        completed_at = now - timedelta(seconds=rng.randint(0, 180 * 24 * 3600))
+        result_rows.append((rng.choice(student_ids), rng.choice(quiz_ids), rng.randint(0, 20), 20,
+                            completed_at.strftime('%Y-%m-%d %H:%M:%S')))
+    _insert_many(conn, dialect,
+                 "INSERT INTO results (user_id, quiz_id, score, total_questions, completed_at) VALUES (?, ?, ?, ?, ?)",
+                 result_rows)
+
+    _insert_many(conn, dialect, "INSERT INTO notifications (title, message) VALUES (?, ?)",
+                 [(f'Notice {i}', 'Seeded notification') for i in range(notifications)])
+    _insert_many(conn, dialect, "INSERT INTO courses (name, description) VALUES (?, ?)",
+                 [(f'Course {i}', 'Seeded course') for i in range(courses)])
+
+    import aggregates
+    aggregates.rebuild(conn)
+
+    return {
+        'student_id': student_ids[0],
+        'user_id': student_ids[0],
+        'lecturer_id': lecturer_ids[0],
+        'quiz_id': quiz_ids[0],
+        'role': 'student',
+        'username': 'student_0',
+        # Keyset position roughly in the middle of the results table
+        'completed_at': (now - timedelta(days=90)).strftime('%Y-%m-%d %H:%M:%S'),
+        'result_id': results // 2,
+    }
+
+
+def _analyze(conn, dialect):
+    cursor = conn.cursor()
+    if dialect == 'mysql':
+        cursor.execute("ANALYZE TABLE users, quizzes, questions, results, notifications, courses, "
+                       "student_quiz_stats, quiz_stats, daily_activity")
+        cursor.fetchall()
+    else:
+        cursor.execute("ANALYZE")
+    cursor.close()
+
+
+# -------------------- EXPLAIN --------------------
+
+_SQLITE_SCAN = re.compile(r'^SCAN (\w+)(?: AS (\w+))?$')
+
+
+def full_scans(conn, dialect, sql, params):
+    """Return the tables (or aliases) the plan reads with a full table scan"""
+    cursor = conn.cursor()
+    scans = []
+    if dialect == 'mysql':
+        cursor.execute("EXPLAIN " + sql, params)
+        columns = [d[0] for d in cursor.description]
+        for row in cursor.fetchall():
+            row = dict(zip(columns, row)) if not isinstance(row, dict) else row
+            table = row.get('table') or ''
+            if row.get('type') == 'ALL' and not table.startswith('<'):
+                scans.append(table)
+    else:
+        cursor.execute("EXPLAIN QUERY PLAN " + sql.replace('%s', '?'), params)
+        for row in cursor.fetchall():
+            detail = row['detail'] if isinstance(row, dict) else row[-1]
+            match = _SQLITE_SCAN.match(detail)
+            if match:
+                scans.extend(name for name in match.groups() if name)
+    cursor.close()
+    return scans
+
+
+def _aliases(sql, table):
+    """Names a table can appear under in a plan: itself plus any alias in the query"""
+    names = {table}
+    for match in re.finditer(r'\b%s\s+(?:AS\s+)?(\w+)' % re.escape(table), sql, re.IGNORECASE):
+        names.add(match.group(1))
+    return names
+
+
+def check(conn, dialect, samples, queries=None):
+    """EXPLAIN every registered query. Returns (failures, skipped) lists of (name, detail)."""
+    failures, skipped = [], []
+    for name, query in sorted((queries or DASHBOARD_QUERIES).items()):
+        params = tuple(samples[p] for p in query['params'])
+        sql = query['sql'].compile(dialect) if hasattr(query['sql'], 'compile') else query['sql']
+        try:
+            scans = full_scans(conn, dialect, sql, params)
+        except Exception as e:
+            # e.g. MySQL-only functions when checking against SQLite
+            skipped.append((name, str(e)))
+            continue
+        allowed = set()
+        for table in query['allow_scan']:
+            allowed |= _aliases(sql, table)
+        bad = [table for table in scans if table not in allowed]
+        if bad:
+            failures.append((name, ', '.join(bad)))
+        print(f"  {'FAIL' if bad else 'ok  '} {name}" + (f"  (full scan: {', '.join(bad)})" if bad else ''))
+    return failures, skipped
+
+
+def _connect(args):
+    if args.backend == 'mysql':
+        import mysql.connector
+        from app import DB_CONFIG
+        server = {k: v for k, v in DB_CONFIG.items() if k != 'database'}
+        conn = mysql.connector.connect(**server)
+        cursor = conn.cursor()
+        cursor.execute(f"DROP DATABASE IF EXISTS {args.database}")
+        cursor.execute(f"CREATE DATABASE {args.database}")
+        cursor.close()
+        conn.close()
+        return mysql.connector.connect(**dict(server, database=args.database)), None
+    import sqlite3
+    path = os.path.join(tempfile.mkdtemp(prefix='smartquiz_explain_'), 'explain.db')
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    return conn, path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Fail if a registered dashboard query does a full table scan.')
+    parser.add_argument('--backend', choices=['mysql', 'sqlite'], default='mysql')
+    parser.add_argument('--database', default='smartquiz_explain', help='MySQL database to (re)create')
+    parser.add_argument('--students', type=int, default=5000)
+    parser.add_argument('--quizzes', type=int, default=400)
+    parser.add_argument('--results', type=int, default=200000)
+    args = parser.parse_args(argv)
+
+    # The app's routes register the report and cache-version queries when it is imported
+    import app  # noqa: F401
+    import schema
+    registry = DASHBOARD_QUERIES
+
+    conn, path = _connect(args)
+    schema.migrate(conn, args.backend)
+    print(f"Seeding {args.results} results ({args.backend})...")
+    samples = seed_large_dataset(conn, args.backend, students=args.students, quizzes=args.quizzes,
+                                 results=args.results)
+    _analyze(conn, args.backend)
+
+    print(f"Checking {len(registry)} dashboard queries:")
+    failures, skipped = check(conn, args.backend, samples, registry)
+    conn.close()
+    if path:
+        os.remove(path)
+
+    for name, reason in skipped:
+        print(f"  skip {name}: {reason}")
+    if failures:
+        print(f"\n{len(failures)} quer{'y' if len(failures) == 1 else 'ies'} with full table scans")
+        return 1
+    print("\nNo full table scans")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
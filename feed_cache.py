@@ -0,0 +1,86 @@
+"""
+SmartQuiz - Versioned notification feed cache
+The notification feed is the same for every student and lecturer and only
+changes when an admin posts or deletes a notification, so it is loaded once
+per process and shared. Each load gets a strong ETag computed from its
+content, so every worker hands out the same tag for the same feed and
+repeat visits can be answered with 304 Not Modified without touching the
+database.
+
+Admin routes invalidate the cache in their own worker; other workers pick
+the change up when their copy expires (NOTIFICATION_CACHE_TTL).
+"""
+
+import hashlib
+import threading
+import time
+from types import MappingProxyType
+
+
+class Feed:
+    """Immutable snapshot of the feed: rows plus the version and ETag they were loaded as"""
+
+    __slots__ = ('items', 'version', 'etag', 'loaded_at')
+
+    def __init__(self, rows, version):
+        self.items = tuple(MappingProxyType(dict(row)) for row in rows)
+        self.version = version
+        self.etag = self._digest(self.items)
+        self.loaded_at = time.monotonic()
+
+    @staticmethod
+    def _digest(items):
+        digest = hashlib.sha256()
+        for item in items:
+            for key in sorted(item):
+                digest.update(f'{key}={item[key]!r}\x1f'.encode())
+            digest.update(b'\x1e')
+        return digest.hexdigest()[:32]
+
+    def __len__(self):
+        return len(self.items)
+
+
+class FeedCache:
+    """Process-level cache of one Feed.
+
+    loader -- callable() returning the feed rows, or None if they couldn't be loaded
+    """
+
+    def __init__(self, loader, ttl=30):
+        self._loader = loader
+        self.ttl = ttl
+        self.version = 0
+        self._feed = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self):
+        """The current Feed, or None if it isn't cached and the loader failed"""
+        feed = self._feed
+        if feed is not None and feed.version == self.version and time.monotonic() - feed.loaded_at < self.ttl:
+            self.hits += 1
+            return feed
+        with self._lock:
+            feed = self._feed
+            if feed is not None and feed.version == self.version and time.monotonic() - feed.loaded_at < self.ttl:
+                self.hits += 1
+                return feed
+            self.misses += 1
+            version = self.version
+            rows = self._loader()
+            if rows is None:
+                return None
+            feed = Feed(rows, version)
+            # An invalidate() during the load leaves this copy stale, so the next get() reloads
+            self._feed = feed
+            return feed
+
+    def invalidate(self):
+        """Called after the feed's rows change"""
+        self.version += 1
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'version': self.version,
+                'items': len(self._feed) if self._feed is not None else 0}
@@ -0,0 +1,218 @@
+"""
+SmartQuiz - Durable background jobs
+Slow admin work (deleting users, rebuilding the dashboard aggregates) is
+queued in the jobs table instead of running inside the request, so the
+request returns at once and gunicorn threads stay free for students. A
+separate worker process (the `worker:` line in the Procfile) runs them:
+
+    flask --app app jobs-worker
+
+Where no such process can run (Azure App Service), set JOBS_IN_PROCESS=1 and
+each web worker runs the same loop in a background thread instead.
+
+Jobs are claimed highest priority first. A claimed job is invisible to other
+workers until its visibility timeout passes. If the worker dies, another one
+picks the job up after that. Failed jobs are retried with exponential backoff
+until max_attempts, then marked failed with the error kept for the admin
+jobs page.
+"""
+
+import contextlib
+import json
+import os
+import socket
+import threading
+import time
+import traceback
+
+PLACEHOLDER = {'mysql': '%s', 'sqlite': '?'}
+
+QUEUED, RUNNING, DONE, FAILED = 'queued', 'running', 'done', 'failed'
+
+COLUMNS = ('id, kind, payload, status, priority, attempts, max_attempts, run_after, locked_until, '
+           'result, error, created_by, created_at, finished_at')
+
+
+class Task:
+    __slots__ = ('kind', 'handler', 'timeout', 'max_attempts', 'priority')
+
+    def __init__(self, kind, handler, timeout, max_attempts, priority):
+        self.kind = kind
+        self.handler = handler
+        self.timeout = timeout
+        self.max_attempts = max_attempts
+        self.priority = priority
+
+
+class JobQueue:
+    """Jobs table access plus the registry of task handlers.
+
+    connect -- callable checking out a connection for the queue's own use (conn.close()
+               hands it back), so queue writes never commit a caller's open transaction
+               and every poll starts a fresh snapshot
+    backoff -- seconds before the first retry; doubles with each attempt
+    """
+
+    def __init__(self, connect, dialect='mysql', backoff=10):
+        self._connect = connect
+        self._ph = PLACEHOLDER[dialect]
+        self.backoff = backoff
+        self.tasks = {}
+        # Zero-argument callables the worker runs with its own housekeeping (see maintain)
+        self.maintenance = []
+        self._lock = threading.Lock()
+        self._pid = None
+
+    def task(self, kind, timeout=300, max_attempts=3, priority=0):
+        """Decorator registering handler(payload) -> JSON-serialisable result for jobs of this kind.
+
+        timeout -- visibility timeout: seconds a run may take before another worker may retry the job
+        """
+        def decorator(handler):
+            self.tasks[kind] = Task(kind, handler, timeout, max_attempts, priority)
+            return handler
+        return decorator
+
+    def _execute(self, sql, params=(), fetch=None):
+        conn = self._connect()
+        if not conn:
+            raise RuntimeError('database unavailable')
+        cursor = conn.cursor(dictionary=True)
+        try:
+            cursor.execute(sql.replace('?', self._ph), params)
+            if fetch == 'one':
+                return cursor.fetchone()
+            if fetch == 'all':
+                return cursor.fetchall()
+            conn.commit()
+            return cursor.lastrowid if sql.lstrip().startswith('INSERT') else cursor.rowcount
+        finally:
+            cursor.close()
+            conn.close()
+
+    def enqueue(self, kind, payload=None, priority=None, created_by=None, delay=0):
+        """Queue a job and return its id"""
+        task = self.tasks[kind]
+        return self._execute(
+            "INSERT INTO jobs (kind, payload, status, priority, attempts, max_attempts, run_after, created_by) "
+            "VALUES (?, ?, ?, ?, 0, ?, ?, ?)",
+            (kind, json.dumps(payload or {}), QUEUED, task.priority if priority is None else priority,
+             task.max_attempts, int(time.time()) + delay, created_by))
+
+    def get(self, job_id):
+        return self._execute(f"SELECT {COLUMNS} FROM jobs WHERE id = ?", (job_id,), fetch='one')
+
+    def recent(self, limit=50):
+        return self._execute(f"SELECT {COLUMNS} FROM jobs ORDER BY id DESC LIMIT {int(limit)}", fetch='all')
+
+    def counts(self):
+        rows = self._execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status", fetch='all')
+        return {row['status']: row['n'] for row in rows}
+
+    def claim(self, worker_id, kinds=None):
+        """Take the next runnable job (or None): queued and due, or running past its visibility timeout"""
+        now = int(time.time())
+        candidates = self._execute(
+            "SELECT id, kind FROM jobs WHERE status IN ('queued', 'running') AND run_after <= ? "
+            "AND (status = 'queued' OR locked_until < ?) ORDER BY priority DESC, id LIMIT 10",
+            (now, now), fetch='all')
+        for row in candidates:
+            task = self.tasks.get(row['kind'])
+            if task is None or (kinds and row['kind'] not in kinds):
+                continue
+            # Optimistic claim: only one worker's UPDATE matches, the others move on
+            claimed = self._execute(
+                "UPDATE jobs SET status = 'running', attempts = attempts + 1, locked_by = ?, locked_until = ? "
+                "WHERE id = ? AND run_after <= ? AND (status = 'queued' OR (status = 'running' AND locked_until < ?))",
+                (worker_id, now + task.timeout, row['id'], now, now))
+            if claimed == 1:
+                return self.get(row['id'])
+        return None
+
+    def complete(self, job, result):
+        self._execute("UPDATE jobs SET status = 'done', result = ?, error = NULL, locked_by = NULL, "
+                      "finished_at = ? WHERE id = ?", (json.dumps(result), int(time.time()), job['id']))
+
+    def fail(self, job, error):
+        """Record a failed run; retried after a backoff unless it has used up its attempts"""
+        now = int(time.time())
+        if job['attempts'] < job['max_attempts']:
+            self._execute("UPDATE jobs SET status = 'queued', error = ?, locked_by = NULL, run_after = ? WHERE id = ?",
+                          (error, now + self.backoff * 2 ** (job['attempts'] - 1), job['id']))
+        else:
+            self._execute("UPDATE jobs SET status = 'failed', error = ?, locked_by = NULL, finished_at = ? "
+                          "WHERE id = ?", (error, now, job['id']))
+
+    def reap(self):
+        """Fail running jobs whose worker vanished after their last allowed attempt"""
+        now = int(time.time())
+        return self._execute("UPDATE jobs SET status = 'failed', error = 'Worker stopped before finishing', "
+                             "finished_at = ? WHERE status = 'running' AND locked_until < ? AND attempts >= max_attempts",
+                             (now, now))
+
+    def purge(self, older_than=7 * 86400):
+        """Delete finished jobs older than `older_than` seconds"""
+        return self._execute("DELETE FROM jobs WHERE status IN ('done', 'failed') AND finished_at < ?",
+                             (int(time.time()) - older_than,))
+
+    def run_one(self, job):
+        task = self.tasks[job['kind']]
+        try:
+            result = task.handler(json.loads(job['payload'] or '{}'))
+        except Exception as e:
+            print(f"[ERROR] Job {job['id']} ({job['kind']}) attempt {job['attempts']} failed: {e}")
+            self.fail(job, ''.join(traceback.format_exception_only(type(e), e)).strip()[:2000])
+            return False
+        self.complete(job, result)
+        return True
+
+    def maintain(self):
+        """Periodic housekeeping run by the worker: reap abandoned jobs, purge old ones, run the hooks"""
+        self.reap()
+        self.purge()
+        for hook in self.maintenance:
+            try:
+                hook()
+            except Exception as e:
+                # A hook with its own database (e.g. the attempt store) must not stop the queue's work
+                print(f"[ERROR] Maintenance hook {getattr(hook, '__qualname__', hook)} failed: {e}")
+
+    def start_in_process(self, **work_args):
+        """Run work(**work_args) in a daemon thread of this process, once per (forked) process"""
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            threading.Thread(target=self.work, kwargs=work_args, name='jobs-worker', daemon=True).start()
+            self._pid = os.getpid()
+
+    def work(self, poll_interval=2.0, kinds=None, burst=False, context=None, maintenance_interval=300):
+        """Worker loop: run jobs until interrupted (or, with burst, until the queue is empty).
+
+        context -- callable returning a context manager entered around every poll and job
+                   (the app passes app.app_context, so handlers get a fresh request-style
+                   connection each time instead of one held for the life of the process)
+        """
+        worker_id = f'{socket.gethostname()}:{os.getpid()}'
+        context = context or contextlib.nullcontext
+        next_maintenance = 0
+        print(f"Job worker {worker_id} running: {', '.join(sorted(kinds or self.tasks))}")
+        while True:
+            job = None
+            try:
+                with context():
+                    if time.monotonic() >= next_maintenance:
+                        next_maintenance = time.monotonic() + maintenance_interval
+                        self.maintain()
+                    job = self.claim(worker_id, kinds)
+                    if job is not None:
+                        self.run_one(job)
+            except Exception as e:
+                # e.g. the database went away; the pool replaces the connection on the next try
+                print(f"[ERROR] Job worker iteration failed: {e}")
+            if job is not None:
+                continue
+            if burst:
+                return
+            time.sleep(poll_interval)
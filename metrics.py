@@ -0,0 +1,281 @@
+"""
+SmartQuiz - Request and SQL instrumentation
+Wraps every connection the pool opens so each cursor execute is timed and
+counted, attributes the totals to the Flask endpoint that issued them, and
+serves everything at /metrics in the Prometheus text exposition format.
+
+Metrics live in process memory, so each gunicorn worker reports its own
+numbers; nothing external is needed to read them (curl /metrics). Set
+METRICS_TOKEN to require `Authorization: Bearer <token>` (or ?token=). Without
+a token it only answers requests made directly from the machine itself.
+"""
+
+import bisect
+import hmac
+import os
+import threading
+import time
+
+from flask import Response, g, has_app_context, has_request_context, request
+
+_LOOPBACK = ('127.0.0.1', '::1')
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+ROW_COUNT_BUCKETS = (0, 1, 10, 50, 100, 500, 1000, 5000, 10000, 50000)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, help, labelnames=()):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(n, '') for n in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} counter']
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f'{self.name}{_labels(self.labelnames, key)} {_number(value)}')
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}  # label values -> [bucket counts..., +Inf count], sum
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(n, '') for n in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            for key, (counts, total) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float('inf'),), counts):
+                    cumulative += count
+                    lines.append(f'{self.name}_bucket{_labels(self.labelnames, key, [("le", _number(bound))])} {cumulative}')
+                lines.append(f'{self.name}_sum{_labels(self.labelnames, key)} {_number(total)}')
+                lines.append(f'{self.name}_count{_labels(self.labelnames, key)} {cumulative}')
+        return lines
+
+
+class Gauge:
+    """Gauge read from a callback at scrape time; callback returns {label value: number}"""
+
+    def __init__(self, name, help, labelname, callback):
+        self.name, self.help, self.labelname = name, help, labelname
+        self._callback = callback
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} gauge']
+        for label, value in sorted(self._callback().items()):
+            lines.append(f'{self.name}{_labels((self.labelname,), (label,))} {_number(value)}')
+        return lines
+
+
+class _RequestSQL:
+    __slots__ = ('queries', 'seconds', 'rows')
+
+    def __init__(self):
+        self.queries = 0
+        self.seconds = 0.0
+        self.rows = 0
+
+
+class InstrumentedCursor:
+    """Cursor proxy that times executes and counts fetched rows"""
+
+    def __init__(self, raw, metrics):
+        self._raw = raw
+        self._metrics = metrics
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+    def __iter__(self):
+        for row in self._raw:
+            self._metrics._rows(1)
+            yield row
+
+    def _timed(self, method, args, kwargs):
+        start = time.perf_counter()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            self._metrics._query(time.perf_counter() - start)
+
+    def execute(self, *args, **kwargs):
+        return self._timed(self._raw.execute, args, kwargs)
+
+    def executemany(self, *args, **kwargs):
+        return self._timed(self._raw.executemany, args, kwargs)
+
+    def fetchone(self):
+        row = self._raw.fetchone()
+        if row is not None:
+            self._metrics._rows(1)
+        return row
+
+    def fetchmany(self, *args, **kwargs):
+        rows = self._raw.fetchmany(*args, **kwargs)
+        self._metrics._rows(len(rows))
+        return rows
+
+    def fetchall(self):
+        rows = self._raw.fetchall()
+        self._metrics._rows(len(rows))
+        return rows
+
+
+class InstrumentedConnection:
+    """Connection proxy whose cursors are instrumented"""
+
+    def __init__(self, raw, metrics):
+        self._raw = raw
+        self._metrics = metrics
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+    def cursor(self, *args, **kwargs):
+        return InstrumentedCursor(self._raw.cursor(*args, **kwargs), self._metrics)
+
+
+class Metrics:
+    """Registry plus the Flask hooks that feed it"""
+
+    def __init__(self, prefix='smartquiz'):
+        self._collectors = []
+        self.requests = self.counter(f'{prefix}_http_requests_total', 'HTTP requests handled',
+                                     ('endpoint', 'method', 'status'))
+        self.request_seconds = self.histogram(f'{prefix}_http_request_duration_seconds',
+                                              'Time to build the response', ('endpoint', 'method'))
+        self.sql_query_seconds = self.histogram(f'{prefix}_sql_query_duration_seconds',
+                                                'Duration of each SQL execute', ('endpoint',))
+        self.sql_queries = self.histogram(f'{prefix}_sql_queries_per_request', 'SQL executes per request',
+                                          ('endpoint',), buckets=QUERY_COUNT_BUCKETS)
+        self.sql_seconds = self.histogram(f'{prefix}_sql_seconds_per_request', 'Time spent in SQL per request',
+                                          ('endpoint',))
+        self.sql_rows = self.histogram(f'{prefix}_sql_rows_per_request', 'Rows fetched per request',
+                                       ('endpoint',), buckets=ROW_COUNT_BUCKETS)
+        self.prefix = prefix
+
+    def counter(self, name, help, labelnames=()):
+        return self._add(Counter(name, help, labelnames))
+
+    def histogram(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._add(Histogram(name, help, labelnames, buckets))
+
+    def gauge(self, name, help, labelname, callback):
+        return self._add(Gauge(name, help, labelname, callback))
+
+    def _add(self, collector):
+        self._collectors.append(collector)
+        return collector
+
+    def render(self):
+        lines = []
+        for collector in self._collectors:
+            lines.extend(collector.render())
+        return '\n'.join(lines) + '\n'
+
+    # -------------------- SQL --------------------
+
+    def instrument(self, connect):
+        """Wrap a pool's connect callable so every connection it opens is instrumented"""
+        return lambda: InstrumentedConnection(connect(), self)
+
+    def watch_pool(self, pool, name='db_pool'):
+        self.gauge(f'{self.prefix}_{name}', 'Connection pool state and lifetime counters', 'stat', pool.stats)
+
+    @staticmethod
+    def _current():
+        return g.get('_metrics_sql') if has_app_context() else None
+
+    def _query(self, seconds):
+        current = self._current()
+        if current is not None:
+            current.queries += 1
+            current.seconds += seconds
+        self.sql_query_seconds.observe(seconds, endpoint=self._endpoint())
+
+    def _rows(self, count):
+        current = self._current()
+        if current is not None:
+            current.rows += count
+
+    @staticmethod
+    def _endpoint():
+        if has_request_context():
+            return request.endpoint or 'unmatched'
+        return 'none'
+
+    # -------------------- Flask --------------------
+
+    def init_app(self, app, path='/metrics'):
+        """Register the timing hooks and the scrape endpoint. Call before other before_request hooks."""
+        token = os.environ.get('METRICS_TOKEN')
+
+        @app.before_request
+        def _start_request_metrics():
+            g._metrics_start = time.perf_counter()
+            g._metrics_sql = _RequestSQL()
+
+        @app.after_request
+        def _record_request_metrics(response):
+            start = g.pop('_metrics_start', None)
+            sql = g.pop('_metrics_sql', None)
+            if start is None:
+                return response
+            endpoint = request.endpoint or 'unmatched'
+            self.requests.inc(endpoint=endpoint, method=request.method, status=response.status_code)
+            self.request_seconds.observe(time.perf_counter() - start, endpoint=endpoint, method=request.method)
+            self.sql_queries.observe(sql.queries, endpoint=endpoint)
+            self.sql_seconds.observe(sql.seconds, endpoint=endpoint)
+            self.sql_rows.observe(sql.rows, endpoint=endpoint)
+            return response
+
+        def metrics_endpoint():
+            if token:
+                supplied = request.args.get('token') or request.headers.get('Authorization', '').removeprefix('Bearer ')
+                if not hmac.compare_digest(supplied.encode(), token.encode()):
+                    return Response('Forbidden\n', status=403, mimetype='text/plain')
+            elif request.remote_addr not in _LOOPBACK or 'X-Forwarded-For' in request.headers:
+                # A proxy on the same host connects from loopback too, but marks what it forwards
+                return Response('Forbidden: set METRICS_TOKEN to scrape /metrics remotely\n',
+                                status=403, mimetype='text/plain')
+            return Response(self.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+        app.add_url_rule(path, 'metrics', metrics_endpoint)
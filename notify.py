@@ -0,0 +1,294 @@
+"""
+SmartQuiz - Outbound notification delivery (SMS and email)
+When an admin posts a notification, the admin request only hands it to the
+dispatcher and returns. An asyncio worker running on a background thread (one
+per process) then loads the recipients in batches. It sends to them with a
+bounded number of messages in flight, under a messages-per-second limit,
+retrying transient failures with backoff. A few thousand students are
+reached in the background in seconds, and the request never waits on
+Twilio or SMTP.
+
+    NOTIFY_TRANSPORT     stub (default: log locally, no network) or live
+    NOTIFY_RATE          messages per second per worker process (default 20)
+    NOTIFY_BATCH_SIZE    recipients loaded per batch (default 200)
+    NOTIFY_CONCURRENCY   sends in flight at once (default 10)
+    NOTIFY_MAX_RETRIES   retries of a failed send (default 3)
+
+Live delivery sends SMS through Twilio (TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN,
+TWILIO_FROM_NUMBER) and email over SMTP (SMTP_HOST, SMTP_PORT, SMTP_USERNAME,
+SMTP_PASSWORD, SMTP_FROM). A channel whose settings are missing is skipped.
+"""
+
+import asyncio
+import os
+import smtplib
+import threading
+import time
+from collections import deque
+from email.message import EmailMessage
+
+# Longest SMS body sent (three concatenated segments)
+MAX_SMS_LENGTH = 459
+
+
+class SendError(Exception):
+    """A message could not be sent; retryable errors are tried again after a backoff"""
+
+    def __init__(self, message, retryable=True):
+        super().__init__(message)
+        self.retryable = retryable
+
+
+class Message:
+    __slots__ = ('channel', 'to', 'subject', 'body')
+
+    def __init__(self, channel, to, subject, body):
+        self.channel = channel
+        self.to = to
+        self.subject = subject
+        self.body = body
+
+
+def messages_for(notification, recipient, channels):
+    """The messages one recipient gets for a notification, one per channel they have an address for"""
+    title = notification.get('title') or 'SmartQuiz'
+    text = notification.get('message') or ''
+    messages = []
+    if 'sms' in channels and recipient.get('phone'):
+        messages.append(Message('sms', recipient['phone'], None, f'{title}: {text}'[:MAX_SMS_LENGTH]))
+    if 'email' in channels and recipient.get('email'):
+        messages.append(Message('email', recipient['email'], title, text))
+    return messages
+
+
+class StubTransport:
+    """Pretends to send: keeps the last messages in memory and never touches the network.
+
+    latency   -- seconds each send takes
+    fail_every -- fail every Nth send with a retryable error (0: never), to exercise retries
+    """
+
+    def __init__(self, latency=0.01, fail_every=0, keep=1000):
+        self.latency = latency
+        self.fail_every = fail_every
+        self.sent = deque(maxlen=keep)
+        self._calls = 0
+
+    async def send(self, message):
+        self._calls += 1
+        await asyncio.sleep(self.latency)
+        if self.fail_every and self._calls % self.fail_every == 0:
+            raise SendError('stub failure')
+        self.sent.append(message)
+
+
+class TwilioTransport:
+    """SMS through the Twilio REST API, using its aiohttp client"""
+
+    def __init__(self, account_sid, auth_token, from_number):
+        self._credentials = (account_sid, auth_token)
+        self.from_number = from_number
+        self._client = None
+
+    async def send(self, message):
+        from twilio.base.exceptions import TwilioRestException
+        if self._client is None:
+            # The aiohttp session has to be created on the dispatcher's event loop
+            from twilio.http.async_http_client import AsyncTwilioHttpClient
+            from twilio.rest import Client
+            self._client = Client(*self._credentials, http_client=AsyncTwilioHttpClient())
+        try:
+            await self._client.messages.create_async(to=message.to, from_=self.from_number, body=message.body)
+        except TwilioRestException as e:
+            # Throttling and server errors are worth another try; a bad number is not
+            raise SendError(f'Twilio {e.status}: {e.msg}', retryable=e.status == 429 or e.status >= 500)
+        except Exception as e:
+            raise SendError(f'Twilio request failed: {e}')
+
+
+class SmtpTransport:
+    """Email over SMTP; smtplib blocks, so each send runs on the default executor"""
+
+    def __init__(self, host, port=587, username=None, password=None, sender=None):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.sender = sender or username
+
+    def _send(self, message):
+        email = EmailMessage()
+        email['From'] = self.sender
+        email['To'] = message.to
+        email['Subject'] = message.subject
+        email.set_content(message.body)
+        with smtplib.SMTP(self.host, self.port, timeout=30) as smtp:
+            smtp.starttls()
+            if self.username:
+                smtp.login(self.username, self.password)
+            smtp.send_message(email)
+
+    async def send(self, message):
+        try:
+            await asyncio.to_thread(self._send, message)
+        except smtplib.SMTPRecipientsRefused as e:
+            raise SendError(f'SMTP refused {message.to}: {e}', retryable=False)
+        except (smtplib.SMTPException, OSError) as e:
+            raise SendError(f'SMTP failed: {e}')
+
+
+def transports_from_env():
+    """{channel: transport} for NOTIFY_TRANSPORT; stub by default, so nothing leaves the machine"""
+    if os.environ.get('NOTIFY_TRANSPORT', 'stub') != 'live':
+        return {'sms': StubTransport(), 'email': StubTransport()}
+    transports = {}
+    if os.environ.get('TWILIO_ACCOUNT_SID'):
+        transports['sms'] = TwilioTransport(os.environ['TWILIO_ACCOUNT_SID'], os.environ.get('TWILIO_AUTH_TOKEN'),
+                                            os.environ.get('TWILIO_FROM_NUMBER'))
+    if os.environ.get('SMTP_HOST'):
+        transports['email'] = SmtpTransport(os.environ['SMTP_HOST'], int(os.environ.get('SMTP_PORT', 587)),
+                                            os.environ.get('SMTP_USERNAME'), os.environ.get('SMTP_PASSWORD'),
+                                            os.environ.get('SMTP_FROM'))
+    return transports
+
+
+def dispatcher_settings():
+    """Dispatcher keyword arguments from the NOTIFY_* environment variables"""
+    return {
+        'rate': float(os.environ.get('NOTIFY_RATE', 20)),
+        'batch_size': int(os.environ.get('NOTIFY_BATCH_SIZE', 200)),
+        'concurrency': int(os.environ.get('NOTIFY_CONCURRENCY', 10)),
+        'max_retries': int(os.environ.get('NOTIFY_MAX_RETRIES', 3)),
+    }
+
+
+class RateLimiter:
+    """Token bucket allowing `rate` acquisitions per second (bursts up to one second's worth)"""
+
+    def __init__(self, rate):
+        self.rate = rate
+        self._tokens = rate
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.rate, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class Dispatcher:
+    """Fans notifications out to recipients from a background event loop.
+
+    recipients  -- callable(after_id, limit) returning up to `limit` recipient rows
+                   (id, email, phone) with id > after_id, in id order; called on a worker thread
+    transports  -- {channel: transport}; channels without one are not sent
+    max_pending -- notifications waiting for the worker; submit() refuses more instead of blocking
+    """
+
+    def __init__(self, recipients, transports, rate=20, batch_size=200, concurrency=10, max_retries=3,
+                 backoff=1.0, max_pending=100):
+        self.recipients = recipients
+        self.transports = transports
+        self.rate = rate
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_pending = max_pending
+        self._lock = threading.Lock()
+        self._pid = None
+        self._loop = None
+        self._queue = None
+        self.pending = 0
+        self.rejected = 0
+        self.broadcasts = 0
+        self.sent = 0
+        self.retried = 0
+        self.failed = 0
+
+    def _ensure_started(self):
+        # Each forked gunicorn worker needs its own loop thread
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            ready = threading.Event()
+
+            def run():
+                self._loop = asyncio.new_event_loop()
+                asyncio.set_event_loop(self._loop)
+                self._queue = asyncio.Queue()
+                ready.set()
+                self._loop.run_until_complete(self._worker())
+
+            self.pending = 0
+            threading.Thread(target=run, name='notify-dispatcher', daemon=True).start()
+            ready.wait()
+            self._pid = os.getpid()
+
+    def submit(self, notification):
+        """Queue a notification (dict with id, title, message) for delivery; False if the queue is full"""
+        if not self.transports:
+            return True
+        self._ensure_started()
+        with self._lock:
+            if self.pending >= self.max_pending:
+                self.rejected += 1
+                return False
+            self.pending += 1
+        self._loop.call_soon_threadsafe(self._queue.put_nowait, dict(notification))
+        return True
+
+    async def _worker(self):
+        limiter = RateLimiter(self.rate)
+        slots = asyncio.Semaphore(self.concurrency)
+        while True:
+            notification = await self._queue.get()
+            try:
+                await self._broadcast(notification, limiter, slots)
+            except Exception as e:
+                print(f"[ERROR] Delivering notification {notification.get('id')} failed: {e}")
+            finally:
+                with self._lock:
+                    self.pending -= 1
+
+    async def _broadcast(self, notification, limiter, slots):
+        self.broadcasts += 1
+        after = 0
+        while True:
+            rows = await asyncio.to_thread(self.recipients, after, self.batch_size)
+            if not rows:
+                return
+            after = rows[-1]['id']
+            messages = [m for row in rows for m in messages_for(notification, row, self.transports)]
+            await asyncio.gather(*(self._deliver(m, limiter, slots) for m in messages))
+            if len(rows) < self.batch_size:
+                return
+
+    async def _deliver(self, message, limiter, slots):
+        async with slots:
+            for attempt in range(self.max_retries + 1):
+                await limiter.acquire()
+                try:
+                    await self.transports[message.channel].send(message)
+                    self.sent += 1
+                    return
+                except SendError as e:
+                    if not e.retryable or attempt == self.max_retries:
+                        self.failed += 1
+                        print(f"[WARN] {message.channel} to {message.to} not sent: {e}")
+                        return
+                    self.retried += 1
+                await asyncio.sleep(self.backoff * 2 ** attempt)
+
+    def stats(self):
+        return {'pending': self.pending, 'rejected': self.rejected, 'broadcasts': self.broadcasts,
+                'sent': self.sent, 'retried': self.retried, 'failed': self.failed}
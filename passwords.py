@@ -0,0 +1,163 @@
+"""
+SmartQuiz - Password hashing in a bounded process pool
+Key derivation (scrypt by default) is deliberately expensive. During a login
+storm at the start of an exam it is run in a small dedicated process pool,
+and admission control turns logins away quickly once too many hashes are
+queued, instead of letting every web worker pin a CPU while quiz
+submissions wait behind them.
+
+    PASSWORD_HASH_METHOD   werkzeug method string (default scrypt:32768:8:1)
+    PASSWORD_HASH_WORKERS  hashing processes per app process (0 = hash inline)
+    PASSWORD_HASH_QUEUE    hashes running or waiting before new ones are refused
+
+Stored hashes made with a different method or cost are upgraded the next
+time their owner logs in (see needs_rehash).
+
+Pool processes come from a forkserver (spawn on Windows), so, as with any
+spawned process, the entry script is re-imported in them and must keep its
+startup code under `if __name__ == '__main__':`.
+"""
+
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+DEFAULT_METHOD = 'scrypt:32768:8:1'
+
+
+class HasherBusy(Exception):
+    """Raised when the hashing queue is full and the caller should retry later"""
+
+
+# Module-level so the pool can pickle them by reference
+def _hash(password, method):
+    return generate_password_hash(password, method=method)
+
+
+def _verify(pwhash, password):
+    return check_password_hash(pwhash, password)
+
+
+def _mp_context():
+    """Start pool processes from a clean server process, never by forking a threaded web worker.
+
+    A fork copies locks other threads happen to hold (logging, stdio, the MySQL
+    driver), which can deadlock the child. The forkserver only imports this module.
+    """
+    if 'forkserver' not in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('spawn')  # Windows
+    context = multiprocessing.get_context('forkserver')
+    context.set_forkserver_preload([__name__])
+    return context
+
+
+def hash_method(pwhash):
+    """The method/cost prefix of a werkzeug hash, e.g. 'scrypt:32768:8:1'"""
+    if not pwhash or '$' not in pwhash:
+        return None
+    return pwhash.split('$', 1)[0]
+
+
+class PasswordHasher:
+    """Hash and verify passwords in a bounded process pool.
+
+    method            -- werkzeug method string used for new hashes
+    workers           -- pool processes; 0 runs everything inline
+    max_pending       -- hashes allowed in flight (running + queued) per app process
+    admission_timeout -- seconds to wait for a free slot before raising HasherBusy
+    timeout           -- seconds to wait for a single hash to finish
+    """
+
+    def __init__(self, method=DEFAULT_METHOD, workers=2, max_pending=32, admission_timeout=2.0, timeout=30):
+        self.method = method
+        self.workers = workers
+        self.max_pending = max_pending
+        self.admission_timeout = admission_timeout
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        # Prefix werkzeug actually stores for self.method (see needs_rehash)
+        self._stored_method = None
+        self._reset()
+
+    def _reset(self):
+        # A forked gunicorn worker must not reuse its parent's pool
+        self._pid = os.getpid()
+        self._pool = None
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self.stats_counters = {'hashed': 0, 'verified': 0, 'rejected': 0, 'rehashed': 0}
+
+    def _executor(self):
+        with self._lock:
+            if self._pid != os.getpid():
+                self._reset()
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=_mp_context())
+            return self._pool
+
+    def _run(self, fn, *args):
+        if not self.workers:
+            return fn(*args)
+        executor = self._executor()
+        if not self._slots.acquire(timeout=self.admission_timeout):
+            self.stats_counters['rejected'] += 1
+            raise HasherBusy('Too many password hashes in progress')
+        try:
+            return executor.submit(fn, *args).result(timeout=self.timeout)
+        except FutureTimeout:
+            raise HasherBusy(f'Password hash did not finish within {self.timeout}s')
+        except BrokenProcessPool:
+            # A pool process died; start a fresh pool next time and finish this one inline
+            with self._lock:
+                self._pool = None
+            return fn(*args)
+        finally:
+            self._slots.release()
+
+    def hash(self, password):
+        """Hash a new password with the configured method"""
+        self.stats_counters['hashed'] += 1
+        return self._run(_hash, password, self.method)
+
+    def verify(self, pwhash, password):
+        """Check a password against a stored hash"""
+        if not pwhash or not password:
+            return False
+        self.stats_counters['verified'] += 1
+        return self._run(_verify, pwhash, password)
+
+    def rehash(self, password):
+        """Hash an existing user's password again after needs_rehash() said so"""
+        self.stats_counters['rehashed'] += 1
+        return self.hash(password)
+
+    def needs_rehash(self, pwhash):
+        """True if the stored hash was made with a different method or cost"""
+        if self._stored_method is None:
+            # werkzeug fills in defaults ('scrypt' is stored as 'scrypt:32768:8:1'), so learn
+            # the stored prefix from one real hash instead of comparing with the setting
+            self._stored_method = hash_method(_hash('needs-rehash', self.method))
+        return hash_method(pwhash) != self._stored_method
+
+    def stats(self):
+        data = dict(self.stats_counters)
+        data.update(workers=self.workers, max_pending=self.max_pending)
+        return data
+
+    def shutdown(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+
+
+def hasher_settings():
+    """Read hasher configuration from the environment"""
+    return {
+        'method': os.environ.get('PASSWORD_HASH_METHOD', DEFAULT_METHOD),
+        'workers': int(os.environ.get('PASSWORD_HASH_WORKERS', 2)),
+        'max_pending': int(os.environ.get('PASSWORD_HASH_QUEUE', 32)),
+    }
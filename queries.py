@@ -0,0 +1,456 @@
+"""
+SmartQuiz - Shared data-access layer
+Queries used by both app.py (MySQL) and app_sqlite.py (SQLite) are written
+once here, with `?` placeholders and a few macros for the date functions the
+two databases spell differently:
+
+    {month(col)}      'YYYY-MM' of a date column
+    {days_ago(n)}     the date n days before today
+    {months_ago(n)}   the date n months before today
+    {for_update()}    row lock for the rest of the transaction (nothing on SQLite,
+                      which locks the whole database on the first write)
+
+Query.compile(dialect) builds the dialect's SQL text once and keeps it.
+Repository runs queries on pooled connections and returns dict rows. On
+MySQL each connection keeps an LRU of server-side prepared statements, so a
+query is parsed and planned once per connection instead of on every execute.
+On SQLite the sqlite3 module's per-connection statement cache does the same
+(open connections with cached_statements=STATEMENT_CACHE_SIZE).
+"""
+
+import re
+import threading
+import weakref
+from collections import OrderedDict
+from datetime import timedelta
+
+PLACEHOLDER = {'mysql': '%s', 'sqlite': '?'}
+
+# Prepared statements kept per connection (override with DB_STATEMENT_CACHE; 0 disables them on MySQL)
+STATEMENT_CACHE_SIZE = 64
+
+_MACROS = {
+    'mysql': {
+        'month': "DATE_FORMAT({0}, '%Y-%m')",
+        'days_ago': 'DATE_SUB(CURDATE(), INTERVAL {0} DAY)',
+        'months_ago': 'DATE_SUB(CURDATE(), INTERVAL {0} MONTH)',
+        'for_update': ' FOR UPDATE',
+    },
+    'sqlite': {
+        'month': "strftime('%Y-%m', {0})",
+        'days_ago': "date('now', '-{0} days')",
+        'months_ago': "date('now', '-{0} months')",
+        'for_update': '',
+    },
+}
+_MACRO = re.compile(r'\{(\w+)\(([^)]*)\)\}')
+
+
+class Query:
+    """One SQL statement in the shared dialect; compiled text is cached per dialect"""
+
+    __slots__ = ('sql', '_compiled')
+
+    def __init__(self, sql):
+        self.sql = sql
+        self._compiled = {}
+
+    def compile(self, dialect):
+        compiled = self._compiled.get(dialect)
+        if compiled is None:
+            macros = _MACROS[dialect]
+            compiled = _MACRO.sub(lambda m: macros[m.group(1)].format(m.group(2).strip()), self.sql)
+            compiled = compiled.replace('?', PLACEHOLDER[dialect])
+            # Always hand out the same string: MySQL prepared cursors only re-prepare a different object
+            compiled = self._compiled.setdefault(dialect, compiled)
+        return compiled
+
+    def __repr__(self):
+        return f'Query({self.sql!r})'
+
+
+# name -> {'sql': ..., 'params': (...), 'allow_scan': (...)}; checked by explain_check.py
+DASHBOARD_QUERIES = {}
+
+
+def dashboard_query(name, sql, params=(), allow_scan=()):
+    """Register a dashboard query for the EXPLAIN check and return the SQL unchanged.
+
+    sql        -- a Query (compiled for the backend being checked), or MySQL SQL text
+    params     -- symbolic names of the query parameters, e.g. ('student_id',)
+    allow_scan -- tables that are expected to be read in full (e.g. small lists)
+    """
+    DASHBOARD_QUERIES[name] = {'sql': sql, 'params': tuple(params), 'allow_scan': tuple(allow_scan)}
+    return sql
+
+
+def _close(cursor):
+    try:
+        cursor.close()
+    except Exception:
+        pass
+
+
+class Repository:
+    """Runs Query objects on connections from get_db and returns dict rows.
+
+    get_db     -- callable returning a connection (conn.close() hands it back); on
+                  SQLite the connection should use a dict row factory
+    cache_size -- prepared statements kept per MySQL connection, least recently used dropped
+    """
+
+    def __init__(self, get_db, dialect='mysql', cache_size=STATEMENT_CACHE_SIZE):
+        self._get_db = get_db
+        self.dialect = dialect
+        self.cache_size = cache_size
+        # underlying connection -> OrderedDict(compiled sql -> prepared cursor); entries go with the connection
+        self._statements = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+        self.prepared = 0
+        self.reused = 0
+        self.evicted = 0
+
+    def _cursor(self, conn, sql):
+        """(cursor, cached) for sql; cached cursors stay open for the connection's next checkout"""
+        if self.dialect != 'mysql':
+            return conn.cursor(), False
+        if not self.cache_size:
+            return conn.cursor(dictionary=True), False
+        key = getattr(conn, 'raw', conn)
+        with self._lock:
+            statements = self._statements.get(key)
+            if statements is None:
+                statements = self._statements[key] = OrderedDict()
+        # Only the thread holding the connection touches its statements
+        cursor = statements.get(sql)
+        if cursor is not None:
+            statements.move_to_end(sql)
+            self.reused += 1
+            return cursor, True
+        cursor = conn.cursor(prepared=True, dictionary=True)
+        statements[sql] = cursor
+        self.prepared += 1
+        if len(statements) > self.cache_size:
+            _close(statements.popitem(last=False)[1])
+            self.evicted += 1
+        return cursor, True
+
+    def _forget(self, conn, sql):
+        statements = self._statements.get(getattr(conn, 'raw', conn))
+        if statements is not None and sql in statements:
+            _close(statements.pop(sql))
+
+    def _run(self, query, params, fetch, commit=False, conn=None, many=False):
+        sql = query.compile(self.dialect)
+        owner = conn is None
+        if owner:
+            conn = self._get_db()
+        if not conn:
+            raise RuntimeError('database unavailable')
+        try:
+            cursor, cached = self._cursor(conn, sql)
+            try:
+                if many:
+                    cursor.executemany(sql, [tuple(row) for row in params])
+                else:
+                    cursor.execute(sql, tuple(params))
+                if fetch:
+                    rows = cursor.fetchall()
+                    if rows and not isinstance(rows[0], dict):
+                        columns = [d[0] for d in cursor.description]
+                        rows = [dict(zip(columns, row)) for row in rows]
+                    return rows
+                if commit:
+                    conn.commit()
+                if many:
+                    return cursor.rowcount
+                return cursor.lastrowid if sql.lstrip().upper().startswith('INSERT') else cursor.rowcount
+            except Exception:
+                # The statement may be gone with a broken connection; prepare it afresh next time
+                if cached:
+                    self._forget(conn, sql)
+                raise
+            finally:
+                if not cached:
+                    cursor.close()
+        finally:
+            if owner:
+                conn.close()
+
+    # conn -- run on this connection instead of one from get_db; the caller hands it back
+
+    def all(self, query, params=(), conn=None):
+        return self._run(query, params, fetch=True, conn=conn)
+
+    def one(self, query, params=(), conn=None):
+        rows = self._run(query, params, fetch=True, conn=conn)
+        return rows[0] if rows else None
+
+    def execute(self, query, params=(), commit=False, conn=None):
+        """Run a write; returns the new row id for INSERT, otherwise the affected row count.
+
+        Without commit the write joins the connection's open transaction (the
+        request's connection in the apps), for the caller to commit.
+        """
+        return self._run(query, params, fetch=False, commit=commit, conn=conn)
+
+    def executemany(self, query, rows, commit=False, conn=None):
+        """Run a write once per parameter tuple in rows; returns the affected row count"""
+        return self._run(query, rows, fetch=False, commit=commit, conn=conn, many=True)
+
+    def stats(self):
+        return {'prepared': self.prepared, 'reused': self.reused, 'evicted': self.evicted,
+                'connections': len(self._statements)}
+
+
+# ==================== ACCOUNTS AND QUIZZES ====================
+
+USER_BY_USERNAME = Query("SELECT * FROM users WHERE username = ?")
+
+INSERT_USER = Query("INSERT INTO users (username, password, role, email) VALUES (?, ?, ?, ?)")
+
+ALL_USERS = Query("SELECT id, username, email, role FROM users")
+
+COUNT_USERS = Query("SELECT COUNT(*) as count FROM users")
+
+ALL_QUIZZES = Query("SELECT * FROM quizzes")
+
+COUNT_QUIZZES = Query("SELECT COUNT(*) as count FROM quizzes")
+
+INSERT_QUIZ = Query("INSERT INTO quizzes (title, description, created_by, duration) VALUES (?, ?, ?, ?)")
+
+COUNT_RESULTS = Query("SELECT COUNT(*) as count FROM results")
+
+NOTIFICATION_RECIPIENTS = Query(
+    "SELECT id, email, phone FROM users WHERE role IN ('student', 'lecturer') "
+    "AND id > ? AND (email IS NOT NULL OR phone IS NOT NULL) ORDER BY id LIMIT ?")
+
+USER_BY_ID = Query("SELECT id, username, email, phone, role FROM users WHERE id = ?")
+
+STUDENT_BY_ID = Query("SELECT id, username FROM users WHERE id = ? AND role = 'student'")
+
+UPDATE_USER = Query("UPDATE users SET username = ?, email = ?, phone = ? WHERE id = ?")
+
+UPDATE_USER_WITH_PASSWORD = Query("UPDATE users SET username = ?, email = ?, phone = ?, password = ? WHERE id = ?")
+
+UPDATE_PASSWORD = Query("UPDATE users SET password = ? WHERE id = ?")
+
+SET_USER_ROLE = Query("UPDATE users SET role = ? WHERE id = ?")
+
+DELETE_USER = Query("DELETE FROM users WHERE id = ?")
+
+QUIZ_TITLES = Query("SELECT id, title FROM quizzes ORDER BY title")
+
+QUIZ_BY_ID = Query("SELECT id, title, description, duration, created_by FROM quizzes WHERE id = ?")
+
+QUIZ_OWNER = Query("SELECT id, created_by FROM quizzes WHERE id = ?")
+
+# Held until commit, so concurrent imports into one quiz can't both pass the size check
+QUIZ_OWNER_FOR_UPDATE = Query("SELECT id, created_by FROM quizzes WHERE id = ?{for_update()}")
+
+DELETE_QUIZ = Query("DELETE FROM quizzes WHERE id = ?")
+
+QUESTION_COUNT = Query("SELECT COUNT(id) AS count FROM questions WHERE quiz_id = ?")
+
+QUIZ_QUESTIONS = Query("SELECT * FROM questions WHERE quiz_id = ? ORDER BY id")
+
+INSERT_QUESTION = Query(
+    "INSERT INTO questions (quiz_id, question, option_a, option_b, option_c, option_d, correct_answer, "
+    "difficulty_level) VALUES (?, ?, ?, ?, ?, ?, ?, ?)")
+
+INSERT_RESULT = Query("INSERT INTO results (user_id, quiz_id, score, total_questions) VALUES (?, ?, ?, ?)")
+
+INSERT_ATTEMPT_ANSWER = Query(
+    "INSERT INTO attempt_answers (result_id, question_id, answer, is_correct, time_taken, difficulty) "
+    "VALUES (?, ?, ?, ?, ?, ?)")
+
+STUDENT_RESULT = Query(
+    "SELECT r.*, q.title FROM results r JOIN quizzes q ON r.quiz_id = q.id WHERE r.id = ? AND r.user_id = ?")
+
+# Deleting a user: results go in id batches (their attempt_answers cascade), the rest at once
+USER_RESULT_BATCH = Query("SELECT id FROM results WHERE user_id = ? ORDER BY id LIMIT ?")
+
+DELETE_USER_RESULTS_UPTO = Query("DELETE FROM results WHERE user_id = ? AND id <= ?")
+
+DELETE_USER_ROWS = (
+    Query("DELETE FROM student_quiz_stats WHERE user_id = ?"),
+    Query("DELETE FROM daily_activity WHERE user_id = ?"),
+    Query("DELETE FROM quiz_attempts WHERE user_id = ?"),
+)
+
+INSERT_NOTIFICATION = Query("INSERT INTO notifications (title, message) VALUES (?, ?)")
+
+ALL_NOTIFICATIONS = Query("SELECT * FROM notifications ORDER BY created_at DESC")
+
+DELETE_NOTIFICATION = Query("DELETE FROM notifications WHERE id = ?")
+
+INSERT_COURSE = Query("INSERT INTO courses (name, description) VALUES (?, ?)")
+
+ALL_COURSES = Query("SELECT * FROM courses ORDER BY created_at DESC")
+
+DELETE_COURSE = Query("DELETE FROM courses WHERE id = ?")
+
+# ==================== ADMIN REPORTS ====================
+
+_REPORT_QUERIES = {}
+
+
+def report_query(filters, after=None, limit=None):
+    """(Query, params) for the filtered results report, starting after the keyset position `after`.
+
+    Each combination of filters gets one Query, kept for reuse, so its compiled text
+    (and prepared statements) is shared by every request with the same filters.
+    """
+    clauses, params = [], []
+    if 'quiz_id' in filters:
+        clauses.append("r.quiz_id = ?")
+        params.append(filters['quiz_id'])
+    if 'user' in filters:
+        clauses.append("u.username = ?")
+        params.append(filters['user'])
+    if 'date_from' in filters:
+        clauses.append("r.completed_at >= ?")
+        params.append(filters['date_from'])
+    if 'date_to' in filters:
+        # date_to is inclusive of the whole day
+        clauses.append("r.completed_at < ?")
+        params.append(filters['date_to'] + timedelta(days=1))
+    if after:
+        # The leading <= gives the planner an index range; the OR only trims ties on completed_at
+        clauses.append("r.completed_at <= ? AND (r.completed_at < ? OR r.id < ?)")
+        params.extend([after[0], after[0], after[1]])
+    key = (tuple(clauses), int(limit) if limit else None)
+    query = _REPORT_QUERIES.get(key)
+    if query is None:
+        sql = """SELECT r.id, u.username, q.title, r.score, r.total_questions, r.completed_at
+             FROM results r
+             JOIN users u ON r.user_id = u.id
+             JOIN quizzes q ON r.quiz_id = q.id"""
+        if clauses:
+            sql += "\n             WHERE " + " AND ".join(clauses)
+        sql += "\n             ORDER BY r.completed_at DESC, r.id DESC"
+        if limit:
+            sql += f"\n             LIMIT {int(limit)}"
+        query = _REPORT_QUERIES.setdefault(key, Query(sql))
+    return query, params
+
+# ==================== DASHBOARD QUERIES ====================
+# Registered with dashboard_query() so `python explain_check.py` can verify
+# each one is served by an index (see schema.py migration 5), on either backend.
+
+RECENT_COURSES = dashboard_query('recent_courses', Query(
+    "SELECT id, name, description FROM courses ORDER BY created_at DESC LIMIT 10"))
+
+COUNT_USERS_BY_ROLE = dashboard_query('count_users_by_role', Query(
+    "SELECT COUNT(*) as count FROM users WHERE role = ?"), params=('role',))
+
+PENDING_USERS = dashboard_query('pending_users', Query(
+    "SELECT id, username, email, role, created_at FROM users WHERE role = 'pending'"))
+
+TOTAL_ATTEMPTS = dashboard_query('total_attempts', Query(
+    "SELECT COALESCE(SUM(attempts), 0) as count FROM quiz_stats"), allow_scan=('quiz_stats',))
+
+OVERALL_AVG = dashboard_query('overall_avg', Query(
+    "SELECT SUM(ratio_sum) / NULLIF(SUM(rated_attempts), 0) as avg_ratio FROM quiz_stats"), allow_scan=('quiz_stats',))
+
+LECTURER_QUIZZES = dashboard_query('lecturer_quizzes', Query(
+    "SELECT * FROM quizzes WHERE created_by = ?"), params=('lecturer_id',))
+
+LECTURER_QUIZ_COUNT = dashboard_query('lecturer_quiz_count', Query(
+    "SELECT COUNT(*) as count FROM quizzes WHERE created_by = ?"), params=('lecturer_id',))
+
+LECTURER_QUESTION_COUNT = dashboard_query('lecturer_question_count', Query(
+    "SELECT COUNT(q.id) as total_questions FROM questions q JOIN quizzes qu ON q.quiz_id = qu.id WHERE qu.created_by = ?"),
+    params=('lecturer_id',))
+
+LECTURER_STUDENT_COUNT = dashboard_query('lecturer_student_count', Query(
+    "SELECT COUNT(DISTINCT s.user_id) as total_students FROM student_quiz_stats s JOIN quizzes qu ON s.quiz_id = qu.id WHERE qu.created_by = ?"),
+    params=('lecturer_id',))
+
+# (read from the per-student/per-quiz aggregates rather than scanning results)
+LECTURER_STUDENTS = dashboard_query('lecturer_students', Query("""
+    SELECT u.id, u.username, u.email,
+           SUM(s.attempts) as total_attempts,
+           COUNT(*) as quizzes_attempted,
+           MAX(s.last_attempt_at) as last_attempt,
+           SUM(s.ratio_sum) / NULLIF(SUM(s.rated_attempts), 0) * 100 as avg_score
+    FROM student_quiz_stats s
+    JOIN quizzes q ON s.quiz_id = q.id
+    JOIN users u ON u.id = s.user_id
+    WHERE q.created_by = ? AND u.role = 'student'
+    GROUP BY u.id, u.username, u.email
+    ORDER BY MAX(s.last_attempt_at) DESC
+"""), params=('lecturer_id',))
+
+LECTURER_STUDENT_RESULTS = dashboard_query('lecturer_student_results', Query("""
+    SELECT r.id, r.quiz_id, r.score, r.total_questions, r.completed_at, q.title
+    FROM results r
+    JOIN quizzes q ON r.quiz_id = q.id
+    WHERE r.user_id = ? AND q.created_by = ?
+    ORDER BY r.completed_at DESC
+"""), params=('student_id', 'lecturer_id'))
+
+LECTURER_COHORT_RESULTS = dashboard_query('lecturer_cohort_results', Query("""
+    SELECT r.user_id, r.quiz_id, r.score, r.total_questions, r.completed_at, q.title
+    FROM quizzes q
+    JOIN results r ON r.quiz_id = q.id
+    WHERE q.created_by = ?
+"""), params=('lecturer_id',))
+
+STUDENT_RESULTS = dashboard_query('student_results', Query("""
+    SELECT r.id, r.quiz_id, r.score, r.total_questions, r.completed_at, q.title
+    FROM results r
+    JOIN quizzes q ON r.quiz_id = q.id
+    WHERE r.user_id = ?
+    ORDER BY r.completed_at DESC
+"""), params=('student_id',))
+
+STUDENT_DASHBOARD_RESULTS = dashboard_query('student_dashboard_results', Query(
+    "SELECT * FROM results WHERE user_id = ? ORDER BY completed_at DESC"), params=('student_id',))
+
+STUDENT_AVG = dashboard_query('student_avg', Query(
+    "SELECT SUM(ratio_sum) / NULLIF(SUM(rated_attempts), 0) as avg_ratio FROM student_quiz_stats WHERE user_id = ?"),
+    params=('student_id',))
+
+NOTIFICATION_FEED = dashboard_query('notification_feed', Query(
+    "SELECT * FROM notifications ORDER BY created_at DESC LIMIT 20"))
+
+MONTHLY_ACTIVITY = dashboard_query('monthly_activity', Query(
+    "SELECT {month(activity_date)} as month, COUNT(DISTINCT user_id) as unique_students, SUM(attempts) as total_attempts FROM daily_activity WHERE activity_date >= {months_ago(6)} GROUP BY month ORDER BY month"))
+
+# Every quiz is ranked by its attempt count, so quizzes is read in full by design
+TOP_QUIZZES = dashboard_query('top_quizzes', Query(
+    "SELECT q.title, COALESCE(s.attempts, 0) as attempts, s.ratio_sum / NULLIF(s.rated_attempts, 0) * 100 as avg_score FROM quizzes q LEFT JOIN quiz_stats s ON q.id = s.quiz_id ORDER BY attempts DESC LIMIT 6"),
+    allow_scan=('quizzes',))
+
+RECENT_ACTIVITY = dashboard_query('recent_activity', Query(
+    "SELECT activity_date as date, COUNT(*) as active_students, SUM(attempts) as quiz_attempts FROM daily_activity WHERE activity_date >= {days_ago(7)} GROUP BY activity_date ORDER BY activity_date DESC"))
+
+
+def overview_stats(repo):
+    """Headline counts shown on the admin analytics pages"""
+    avg_ratio = repo.one(OVERALL_AVG)['avg_ratio']
+    return {
+        'total_students': repo.one(COUNT_USERS_BY_ROLE, ('student',))['count'],
+        'total_lecturers': repo.one(COUNT_USERS_BY_ROLE, ('lecturer',))['count'],
+        'total_quizzes': repo.one(COUNT_QUIZZES)['count'],
+        'avg_score_pct': round(float(avg_ratio) * 100, 2) if avg_ratio else 0,
+    }
+
+
+def analytics_dashboard(repo):
+    """Template context for AnalyticsDashboard.html: overview, last 6 months, top quizzes, last 7 days"""
+    monthly_rows = repo.all(MONTHLY_ACTIVITY)
+    top_rows = repo.all(TOP_QUIZZES)
+    return {
+        'stats': overview_stats(repo),
+        'monthly_labels': [r['month'] for r in monthly_rows],
+        'monthly_unique_students': [r['unique_students'] for r in monthly_rows],
+        'monthly_total_attempts': [int(r['total_attempts']) for r in monthly_rows],
+        'quiz_labels': [r['title'] for r in top_rows],
+        'quiz_attempts': [r['attempts'] or 0 for r in top_rows],
+        'quiz_avg_scores': [round(r['avg_score'] or 0, 2) for r in top_rows],
+        'user_activity': [{'date': r['date'], 'active_students': r['active_students'],
+                           'quiz_attempts': int(r['quiz_attempts'])}
+                          for r in repo.all(RECENT_ACTIVITY)],
+    }
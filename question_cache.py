@@ -0,0 +1,135 @@
+"""
+SmartQuiz - Per-quiz question bundle cache
+Loads a quiz and its full question set (answers included) once per process
+and serves every step of an attempt from memory. Entries expire after a TTL
+and are invalidated explicitly when a lecturer edits or deletes the quiz.
+"""
+
+import threading
+import time
+from collections import namedtuple
+from types import MappingProxyType
+
+# Attempts draw questions stratum by stratum in this order, shuffled within each
+# stratum; levels not listed (including unset) come first, as ORDER BY FIELD(...) did
+DIFFICULTY_ORDER = ('Medium', 'Easy', 'Hard')
+
+Question = namedtuple('Question', ['id', 'quiz_id', 'question', 'option_a', 'option_b', 'option_c',
+                                   'option_d', 'correct_answer', 'difficulty_level'])
+
+
+class QuizBundle:
+    """Immutable snapshot of a quiz: metadata plus its questions in id order"""
+
+    __slots__ = ('quiz_id', 'quiz', 'questions', '_by_id', 'strata', 'loaded_at')
+
+    def __init__(self, quiz, questions):
+        self.quiz_id = quiz['id']
+        self.quiz = MappingProxyType(dict(quiz))
+        self.questions = tuple(questions)
+        self._by_id = MappingProxyType({q.id: q for q in self.questions})
+        self.strata = self._stratify(self.questions)
+        self.loaded_at = time.monotonic()
+
+    @staticmethod
+    def _stratify(questions):
+        """Question IDs bucketed by difficulty, as a tuple of tuples in draw order"""
+        buckets = {level: [] for level in DIFFICULTY_ORDER}
+        other = []
+        for q in questions:
+            buckets.get(q.difficulty_level, other).append(q.id)
+        return tuple(tuple(ids) for ids in [other] + [buckets[level] for level in DIFFICULTY_ORDER] if ids)
+
+    @classmethod
+    def from_rows(cls, quiz_row, question_rows):
+        questions = [Question(id=r['id'], quiz_id=r['quiz_id'], question=r['question'],
+                              option_a=r.get('option_a'), option_b=r.get('option_b'),
+                              option_c=r.get('option_c'), option_d=r.get('option_d'),
+                              correct_answer=r.get('correct_answer'),
+                              difficulty_level=r.get('difficulty_level') or 'Unknown')
+                     for r in question_rows]
+        return cls(quiz_row, questions)
+
+    def question(self, question_id):
+        return self._by_id.get(question_id)
+
+    def draw(self, count, rng):
+        """Pick up to `count` question IDs for one attempt.
+
+        Takes whole strata in DIFFICULTY_ORDER and a random sample of the last
+        one needed, shuffled within each stratum. Costs O(count), not O(bank size).
+        """
+        picked = []
+        for stratum in self.strata:
+            need = count - len(picked)
+            if need <= 0:
+                break
+            picked.extend(rng.sample(stratum, min(need, len(stratum))))
+        return picked
+
+    def __len__(self):
+        return len(self.questions)
+
+
+class QuestionCache:
+    """Process-level cache of QuizBundle objects keyed by quiz_id.
+
+    loader -- callable(quiz_id) returning a QuizBundle, or None if the quiz doesn't exist
+    stripes -- load locks; quizzes share lock quiz_id % stripes, so the lock table never grows
+    """
+
+    def __init__(self, loader, ttl=300, max_quizzes=512, stripes=64):
+        self._loader = loader
+        self.ttl = ttl
+        self.max_quizzes = max_quizzes
+        self._bundles = {}
+        self._lock = threading.Lock()
+        self._load_locks = tuple(threading.Lock() for _ in range(stripes))
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, quiz_id):
+        bundle = self._bundles.get(quiz_id)
+        if bundle is not None and time.monotonic() - bundle.loaded_at < self.ttl:
+            self.hits += 1
+            return bundle
+
+        # One loader per quiz at a time, so a class starting together triggers a single query.
+        # Two quizzes on the same stripe only wait for each other's (rare) cold load.
+        with self._load_locks[hash(quiz_id) % len(self._load_locks)]:
+            bundle = self._bundles.get(quiz_id)
+            if bundle is not None and time.monotonic() - bundle.loaded_at < self.ttl:
+                self.hits += 1
+                return bundle
+            self.misses += 1
+            bundle = self._loader(quiz_id)
+            with self._lock:
+                if bundle is None:
+                    self._bundles.pop(quiz_id, None)
+                else:
+                    if len(self._bundles) >= self.max_quizzes and quiz_id not in self._bundles:
+                        oldest = min(self._bundles, key=lambda k: self._bundles[k].loaded_at)
+                        del self._bundles[oldest]
+                    self._bundles[quiz_id] = bundle
+            return bundle
+
+    def lookup(self, quiz_id, question_id):
+        """Return (bundle, question); reloads once if the question isn't in the cached bundle"""
+        bundle = self.get(quiz_id)
+        question = bundle.question(question_id) if bundle else None
+        if bundle is not None and question is None:
+            self.invalidate(quiz_id)
+            bundle = self.get(quiz_id)
+            question = bundle.question(question_id) if bundle else None
+        return bundle, question
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'quizzes': len(self._bundles)}
+
+    def invalidate(self, quiz_id=None):
+        """Drop one quiz (or everything) from the cache"""
+        with self._lock:
+            if quiz_id is None:
+                self._bundles.clear()
+            else:
+                self._bundles.pop(quiz_id, None)
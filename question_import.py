@@ -0,0 +1,102 @@
+"""
+SmartQuiz - Bulk question import
+Parses a CSV or JSON question file, validates every row up front and inserts
+the whole set with one executemany, so a question bank is built in a single
+request (or a single CLI run) instead of one form post per question.
+
+CSV files need a header row with the column names below; JSON files hold a
+list of objects with the same keys (or {"questions": [...]}).
+
+    question, option_a, option_b, option_c, option_d, correct_answer, difficulty_level
+
+correct_answer is A-D; difficulty_level is Easy, Medium or Hard and may be left empty.
+"""
+
+import csv
+import io
+import json
+
+from question_cache import DIFFICULTY_ORDER
+
+FIELDS = ('question', 'option_a', 'option_b', 'option_c', 'option_d', 'correct_answer', 'difficulty_level')
+REQUIRED = FIELDS[:-1]
+ANSWERS = ('A', 'B', 'C', 'D')
+
+# Largest upload the web form accepts
+MAX_IMPORT_BYTES = 2 * 1024 * 1024
+
+PLACEHOLDER = {'mysql': '%s', 'sqlite': '?'}
+
+INSERT_QUESTION = ("INSERT INTO questions (quiz_id, question, option_a, option_b, option_c, option_d, correct_answer, "
+                   "difficulty_level) VALUES (?, ?, ?, ?, ?, ?, ?, ?)")
+
+
+class QuestionImportError(ValueError):
+    """The file can't be imported; `errors` lists every problem found"""
+
+    def __init__(self, errors):
+        super().__init__('; '.join(errors))
+        self.errors = errors
+
+
+def parse_file(data, filename=''):
+    """Decode an uploaded file into a list of raw row dicts (CSV or JSON, by extension or content)"""
+    if isinstance(data, bytes):
+        try:
+            data = data.decode('utf-8-sig')
+        except UnicodeDecodeError:
+            raise QuestionImportError(['The file must be UTF-8 encoded'])
+    if not data.strip():
+        raise QuestionImportError(['The file is empty'])
+    if filename.lower().endswith('.json') or (not filename.lower().endswith('.csv') and data.lstrip()[:1] in '[{'):
+        try:
+            rows = json.loads(data)
+        except ValueError as e:
+            raise QuestionImportError([f'Invalid JSON: {e}'])
+        if isinstance(rows, dict):
+            rows = rows.get('questions')
+        if not isinstance(rows, list) or not all(isinstance(row, dict) for row in rows):
+            raise QuestionImportError(['JSON must be a list of question objects'])
+        return rows
+
+    reader = csv.DictReader(io.StringIO(data))
+    missing = [name for name in REQUIRED if name not in (reader.fieldnames or ())]
+    if missing:
+        raise QuestionImportError([f"CSV header is missing: {', '.join(missing)}"])
+    return list(reader)
+
+
+def validate(rows):
+    """Normalise raw rows into question dicts; raises QuestionImportError listing every bad row"""
+    questions, errors = [], []
+    for number, row in enumerate(rows, 1):
+        values = {name: (str(row.get(name)).strip() if row.get(name) is not None else '') for name in FIELDS}
+        problems = [f'{name} is empty' for name in REQUIRED if not values[name]]
+        values['correct_answer'] = values['correct_answer'].upper()
+        if values['correct_answer'] and values['correct_answer'] not in ANSWERS:
+            problems.append('correct_answer must be A, B, C or D')
+        level = values['difficulty_level'].capitalize() or None
+        if level and level not in DIFFICULTY_ORDER:
+            problems.append('difficulty_level must be Easy, Medium or Hard')
+        values['difficulty_level'] = level
+        if problems:
+            errors.append(f"Question {number}: {', '.join(problems)}")
+        else:
+            questions.append(values)
+    if not questions and not errors:
+        errors.append('The file contains no questions')
+    if errors:
+        raise QuestionImportError(errors)
+    return questions
+
+
+def load(data, filename=''):
+    """parse_file + validate"""
+    return validate(parse_file(data, filename))
+
+
+def insert_questions(cursor, dialect, quiz_id, questions):
+    """Insert validated questions into one quiz with a single executemany (caller commits)"""
+    cursor.executemany(INSERT_QUESTION.replace('?', PLACEHOLDER[dialect]),
+                       [(quiz_id,) + tuple(q[name] for name in FIELDS) for q in questions])
+    return len(questions)
@@ -0,0 +1,447 @@
+"""
+SmartQuiz - Versioned schema bootstrap
+Applies numbered migrations once and records them in the schema_version table,
+so the request path never has to run DDL. Works for both the MySQL (app.py)
+and SQLite (app_sqlite.py) builds.
+
+Usage:
+    flask --app app init-db            # MySQL, before starting gunicorn
+    flask --app app_sqlite init-db     # SQLite
+"""
+
+from werkzeug.security import generate_password_hash
+
+import aggregates
+
+PLACEHOLDER = {'mysql': '%s', 'sqlite': '?'}
+
+# Each migration is (version, description, {dialect: [statements]}).
+# Never edit a migration that has shipped - append a new one instead.
+MIGRATIONS = [
+    (1, 'Initial schema', {
+        'mysql': [
+            # Users table
+            '''CREATE TABLE IF NOT EXISTS users
+               (id INT AUTO_INCREMENT PRIMARY KEY,
+                username VARCHAR(255) UNIQUE NOT NULL,
+                password VARCHAR(255) NOT NULL,
+                role VARCHAR(50) NOT NULL,
+                email VARCHAR(255),
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''',
+            # Quizzes table
+            '''CREATE TABLE IF NOT EXISTS quizzes
+               (id INT AUTO_INCREMENT PRIMARY KEY,
+                title VARCHAR(255) NOT NULL,
+                description TEXT,
+                created_by INT NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                duration INT,
+                FOREIGN KEY(created_by) REFERENCES users(id))''',
+            # Questions table
+            '''CREATE TABLE IF NOT EXISTS questions
+               (id INT AUTO_INCREMENT PRIMARY KEY,
+                quiz_id INT NOT NULL,
+                question TEXT NOT NULL,
+                option_a VARCHAR(255),
+                option_b VARCHAR(255),
+                option_c VARCHAR(255),
+                option_d VARCHAR(255),
+                correct_answer VARCHAR(1),
+                FOREIGN KEY(quiz_id) REFERENCES quizzes(id) ON DELETE CASCADE)''',
+            # Results table
+            '''CREATE TABLE IF NOT EXISTS results
+               (id INT AUTO_INCREMENT PRIMARY KEY,
+                user_id INT NOT NULL,
+                quiz_id INT NOT NULL,
+                score INT,
+                total_questions INT,
+                completed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY(user_id) REFERENCES users(id),
+                FOREIGN KEY(quiz_id) REFERENCES quizzes(id) ON DELETE CASCADE)''',
+            # Notifications table
+            '''CREATE TABLE IF NOT EXISTS notifications
+               (id INT AUTO_INCREMENT PRIMARY KEY,
+                title VARCHAR(255),
+                message TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''',
+            # Courses table
+            '''CREATE TABLE IF NOT EXISTS courses
+               (id INT AUTO_INCREMENT PRIMARY KEY,
+                name VARCHAR(255) NOT NULL,
+                description TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''',
+        ],
+        'sqlite': [
+            # Users table
+            '''CREATE TABLE IF NOT EXISTS users
+               (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                username TEXT UNIQUE NOT NULL,
+                password TEXT NOT NULL,
+                role TEXT NOT NULL,
+                email TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''',
+            # Quizzes table
+            '''CREATE TABLE IF NOT EXISTS quizzes
+               (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                title TEXT NOT NULL,
+                description TEXT,
+                created_by INTEGER NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                duration INTEGER,
+                FOREIGN KEY(created_by) REFERENCES users(id))''',
+            # Questions table
+            '''CREATE TABLE IF NOT EXISTS questions
+               (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                quiz_id INTEGER NOT NULL,
+                question TEXT NOT NULL,
+                option_a TEXT,
+                option_b TEXT,
+                option_c TEXT,
+                option_d TEXT,
+                correct_answer TEXT,
+                FOREIGN KEY(quiz_id) REFERENCES quizzes(id) ON DELETE CASCADE)''',
+            # Results table
+            '''CREATE TABLE IF NOT EXISTS results
+               (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER NOT NULL,
+                quiz_id INTEGER NOT NULL,
+                score INTEGER,
+                total_questions INTEGER,
+                completed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY(user_id) REFERENCES users(id),
+                FOREIGN KEY(quiz_id) REFERENCES quizzes(id) ON DELETE CASCADE)''',
+            # Notifications table
+            '''CREATE TABLE IF NOT EXISTS notifications
+               (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                title TEXT,
+                message TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''',
+            # Courses table
+            '''CREATE TABLE IF NOT EXISTS courses
+               (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT NOT NULL,
+                description TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''',
+            # Review submissions table
+            '''CREATE TABLE IF NOT EXISTS review_submissions
+               (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER NOT NULL,
+                title TEXT,
+                details TEXT,
+                status TEXT DEFAULT 'pending',
+                submitted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY(user_id) REFERENCES users(id) ON DELETE CASCADE)''',
+        ],
+    }),
+    (2, 'Server-side quiz attempt state', {
+        'mysql': [
+            '''CREATE TABLE IF NOT EXISTS quiz_attempts
+               (id CHAR(32) PRIMARY KEY,
+                user_id INT NOT NULL,
+                quiz_id INT NOT NULL,
+                state MEDIUMTEXT NOT NULL,
+                updated_at BIGINT NOT NULL,
+                INDEX idx_quiz_attempts_updated (updated_at),
+                FOREIGN KEY(user_id) REFERENCES users(id) ON DELETE CASCADE,
+                FOREIGN KEY(quiz_id) REFERENCES quizzes(id) ON DELETE CASCADE)''',
+        ],
+        'sqlite': [
+            '''CREATE TABLE IF NOT EXISTS quiz_attempts
+               (id TEXT PRIMARY KEY,
+                user_id INTEGER NOT NULL,
+                quiz_id INTEGER NOT NULL,
+                state TEXT NOT NULL,
+                updated_at INTEGER NOT NULL,
+                FOREIGN KEY(user_id) REFERENCES users(id) ON DELETE CASCADE,
+                FOREIGN KEY(quiz_id) REFERENCES quizzes(id) ON DELETE CASCADE)''',
+            'CREATE INDEX IF NOT EXISTS idx_quiz_attempts_updated ON quiz_attempts (updated_at)',
+        ],
+    }),
+    (3, 'Per-question answers of finished attempts', {
+        'mysql': [
+            '''CREATE TABLE IF NOT EXISTS attempt_answers
+               (id INT AUTO_INCREMENT PRIMARY KEY,
+                result_id INT NOT NULL,
+                question_id INT NOT NULL,
+                answer VARCHAR(1),
+                is_correct BOOLEAN NOT NULL DEFAULT FALSE,
+                time_taken FLOAT,
+                difficulty VARCHAR(20),
+                INDEX idx_attempt_answers_question (question_id),
+                FOREIGN KEY(result_id) REFERENCES results(id) ON DELETE CASCADE)''',
+        ],
+        'sqlite': [
+            '''CREATE TABLE IF NOT EXISTS attempt_answers
+               (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                result_id INTEGER NOT NULL,
+                question_id INTEGER NOT NULL,
+                answer TEXT,
+                is_correct INTEGER NOT NULL DEFAULT 0,
+                time_taken REAL,
+                difficulty TEXT,
+                FOREIGN KEY(result_id) REFERENCES results(id) ON DELETE CASCADE)''',
+            'CREATE INDEX IF NOT EXISTS idx_attempt_answers_result ON attempt_answers (result_id)',
+            'CREATE INDEX IF NOT EXISTS idx_attempt_answers_question ON attempt_answers (question_id)',
+        ],
+    }),
+    (4, 'Dashboard aggregate tables (see aggregates.py)', {
+        'mysql': [
+            '''CREATE TABLE IF NOT EXISTS student_quiz_stats
+               (user_id INT NOT NULL,
+                quiz_id INT NOT NULL,
+                attempts INT NOT NULL DEFAULT 0,
+                rated_attempts INT NOT NULL DEFAULT 0,
+                total_score INT NOT NULL DEFAULT 0,
+                total_questions INT NOT NULL DEFAULT 0,
+                ratio_sum DOUBLE NOT NULL DEFAULT 0,
+                best_ratio DOUBLE NOT NULL DEFAULT 0,
+                last_attempt_at TIMESTAMP NULL,
+                PRIMARY KEY (user_id, quiz_id),
+                INDEX idx_student_quiz_stats_quiz (quiz_id),
+                FOREIGN KEY(user_id) REFERENCES users(id) ON DELETE CASCADE,
+                FOREIGN KEY(quiz_id) REFERENCES quizzes(id) ON DELETE CASCADE)''',
+            '''CREATE TABLE IF NOT EXISTS quiz_stats
+               (quiz_id INT PRIMARY KEY,
+                attempts INT NOT NULL DEFAULT 0,
+                rated_attempts INT NOT NULL DEFAULT 0,
+                total_score INT NOT NULL DEFAULT 0,
+                total_questions INT NOT NULL DEFAULT 0,
+                ratio_sum DOUBLE NOT NULL DEFAULT 0,
+                last_attempt_at TIMESTAMP NULL,
+                FOREIGN KEY(quiz_id) REFERENCES quizzes(id) ON DELETE CASCADE)''',
+            '''CREATE TABLE IF NOT EXISTS daily_activity
+               (activity_date DATE NOT NULL,
+                user_id INT NOT NULL,
+                attempts INT NOT NULL DEFAULT 0,
+                PRIMARY KEY (activity_date, user_id),
+                FOREIGN KEY(user_id) REFERENCES users(id) ON DELETE CASCADE)''',
+        ] + aggregates.BACKFILL,
+        'sqlite': [
+            '''CREATE TABLE IF NOT EXISTS student_quiz_stats
+               (user_id INTEGER NOT NULL,
+                quiz_id INTEGER NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                rated_attempts INTEGER NOT NULL DEFAULT 0,
+                total_score INTEGER NOT NULL DEFAULT 0,
+                total_questions INTEGER NOT NULL DEFAULT 0,
+                ratio_sum REAL NOT NULL DEFAULT 0,
+                best_ratio REAL NOT NULL DEFAULT 0,
+                last_attempt_at TIMESTAMP,
+                PRIMARY KEY (user_id, quiz_id),
+                FOREIGN KEY(user_id) REFERENCES users(id) ON DELETE CASCADE,
+                FOREIGN KEY(quiz_id) REFERENCES quizzes(id) ON DELETE CASCADE)''',
+            'CREATE INDEX IF NOT EXISTS idx_student_quiz_stats_quiz ON student_quiz_stats (quiz_id)',
+            '''CREATE TABLE IF NOT EXISTS quiz_stats
+               (quiz_id INTEGER PRIMARY KEY,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                rated_attempts INTEGER NOT NULL DEFAULT 0,
+                total_score INTEGER NOT NULL DEFAULT 0,
+                total_questions INTEGER NOT NULL DEFAULT 0,
+                ratio_sum REAL NOT NULL DEFAULT 0,
+                last_attempt_at TIMESTAMP,
+                FOREIGN KEY(quiz_id) REFERENCES quizzes(id) ON DELETE CASCADE)''',
+            '''CREATE TABLE IF NOT EXISTS daily_activity
+               (activity_date DATE NOT NULL,
+                user_id INTEGER NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (activity_date, user_id),
+                FOREIGN KEY(user_id) REFERENCES users(id) ON DELETE CASCADE)''',
+        ] + aggregates.BACKFILL,
+    }),
+    # Designed from the dashboard queries registered in app.py; `python explain_check.py`
+    # fails if any of them falls back to a full table scan.
+    (5, 'Indexes for dashboard and analytics queries', {
+        'mysql': [
+            'CREATE INDEX idx_users_role ON users (role)',
+            'CREATE INDEX idx_quizzes_created_by ON quizzes (created_by)',
+            'CREATE INDEX idx_questions_quiz ON questions (quiz_id, id)',
+            'CREATE INDEX idx_results_user_completed ON results (user_id, completed_at, quiz_id, score, total_questions)',
+            'CREATE INDEX idx_results_quiz_user ON results (quiz_id, user_id)',
+            'CREATE INDEX idx_results_completed ON results (completed_at, id)',
+            'CREATE INDEX idx_notifications_created ON notifications (created_at)',
+            'CREATE INDEX idx_courses_created ON courses (created_at)',
+        ],
+        'sqlite': [
+            'CREATE INDEX IF NOT EXISTS idx_users_role ON users (role)',
+            'CREATE INDEX IF NOT EXISTS idx_quizzes_created_by ON quizzes (created_by)',
+            'CREATE INDEX IF NOT EXISTS idx_questions_quiz ON questions (quiz_id, id)',
+            'CREATE INDEX IF NOT EXISTS idx_results_user_completed ON results (user_id, completed_at, quiz_id, score, total_questions)',
+            'CREATE INDEX IF NOT EXISTS idx_results_quiz_user ON results (quiz_id, user_id)',
+            'CREATE INDEX IF NOT EXISTS idx_results_completed ON results (completed_at, id)',
+            'CREATE INDEX IF NOT EXISTS idx_notifications_created ON notifications (created_at)',
+            'CREATE INDEX IF NOT EXISTS idx_courses_created ON courses (created_at)',
+        ],
+    }),
+    # Keyset pagination of the admin report filtered by quiz walks (completed_at, id) within one quiz
+    (6, 'Index for the per-quiz admin report', {
+        'mysql': [
+            'CREATE INDEX idx_results_quiz_completed ON results (quiz_id, completed_at, id)',
+        ],
+        'sqlite': [
+            'CREATE INDEX IF NOT EXISTS idx_results_quiz_completed ON results (quiz_id, completed_at, id)',
+        ],
+    }),
+    # take_quiz orders attempts by difficulty; some older databases already have the column
+    (7, 'Question difficulty level', {
+        'mysql': [
+            'ALTER TABLE questions ADD COLUMN difficulty_level VARCHAR(20) DEFAULT NULL',
+        ],
+        'sqlite': [
+            'ALTER TABLE questions ADD COLUMN difficulty_level TEXT DEFAULT NULL',
+        ],
+    }),
+    # Counters bumped by writes so cached pages can be revalidated cheaply (see cache_policy.py)
+    (8, 'Data versions for HTTP cache validation', {
+        'mysql': [
+            '''CREATE TABLE IF NOT EXISTS data_versions
+               (name VARCHAR(64) PRIMARY KEY,
+                version BIGINT NOT NULL DEFAULT 0,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP)''',
+        ],
+        'sqlite': [
+            '''CREATE TABLE IF NOT EXISTS data_versions
+               (name TEXT PRIMARY KEY,
+                version INTEGER NOT NULL DEFAULT 0,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''',
+        ],
+    }),
+    # Mobile number for SMS delivery of notifications (see notify.py)
+    (9, 'User phone numbers', {
+        'mysql': [
+            'ALTER TABLE users ADD COLUMN phone VARCHAR(32) DEFAULT NULL',
+        ],
+        'sqlite': [
+            'ALTER TABLE users ADD COLUMN phone TEXT DEFAULT NULL',
+        ],
+    }),
+    # Durable background job queue (see jobs.py); times are epoch seconds like quiz_attempts
+    (10, 'Background jobs', {
+        'mysql': [
+            '''CREATE TABLE IF NOT EXISTS jobs
+               (id INT AUTO_INCREMENT PRIMARY KEY,
+                kind VARCHAR(64) NOT NULL,
+                payload TEXT,
+                status VARCHAR(16) NOT NULL,
+                priority INT NOT NULL DEFAULT 0,
+                attempts INT NOT NULL DEFAULT 0,
+                max_attempts INT NOT NULL DEFAULT 3,
+                run_after BIGINT NOT NULL,
+                locked_by VARCHAR(128),
+                locked_until BIGINT,
+                result TEXT,
+                error TEXT,
+                created_by INT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                finished_at BIGINT,
+                INDEX idx_jobs_claim (status, priority, id))''',
+        ],
+        'sqlite': [
+            '''CREATE TABLE IF NOT EXISTS jobs
+               (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                kind TEXT NOT NULL,
+                payload TEXT,
+                status TEXT NOT NULL,
+                priority INTEGER NOT NULL DEFAULT 0,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                max_attempts INTEGER NOT NULL DEFAULT 3,
+                run_after INTEGER NOT NULL,
+                locked_by TEXT,
+                locked_until INTEGER,
+                result TEXT,
+                error TEXT,
+                created_by INTEGER,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                finished_at INTEGER)''',
+            'CREATE INDEX IF NOT EXISTS idx_jobs_claim ON jobs (status, priority, id)',
+        ],
+    }),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+_VERSION_TABLE = {
+    'mysql': '''CREATE TABLE IF NOT EXISTS schema_version
+                (version INT PRIMARY KEY,
+                 description VARCHAR(255),
+                 applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''',
+    'sqlite': '''CREATE TABLE IF NOT EXISTS schema_version
+                 (version INTEGER PRIMARY KEY,
+                  description TEXT,
+                  applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''',
+}
+
+# Serialises concurrent bootstraps (e.g. several gunicorn workers starting at once)
+_MYSQL_LOCK_NAME = 'smartquiz_schema_migrate'
+
+# ER_DUP_FIELDNAME, ER_DUP_KEYNAME
+_MYSQL_ALREADY_EXISTS = {1060, 1061}
+
+
+def _already_exists(error):
+    # MySQL reports duplicate columns/indexes by errno; SQLite only has the message
+    return getattr(error, 'errno', None) in _MYSQL_ALREADY_EXISTS or 'duplicate column name' in str(error)
+
+
+def current_version(conn, dialect='mysql'):
+    """Return the highest applied migration version (0 for a fresh database)"""
+    cursor = conn.cursor()
+    cursor.execute(_VERSION_TABLE[dialect])
+    cursor.execute("SELECT MAX(version) FROM schema_version")
+    row = cursor.fetchone()
+    cursor.close()
+    if isinstance(row, dict):
+        row = list(row.values())
+    return (row[0] or 0) if row else 0
+
+
+def migrate(conn, dialect='mysql', target=None):
+    """Apply every pending migration up to target (default: latest). Returns applied versions."""
+    target = LATEST_VERSION if target is None else target
+    ph = PLACEHOLDER[dialect]
+    cursor = conn.cursor()
+
+    if dialect == 'mysql':
+        cursor.execute("SELECT GET_LOCK(%s, 30)", (_MYSQL_LOCK_NAME,))
+        cursor.fetchall()
+
+    applied = []
+    try:
+        version = current_version(conn, dialect)
+        for number, description, statements in MIGRATIONS:
+            if number <= version or number > target:
+                continue
+            for statement in statements[dialect]:
+                try:
+                    cursor.execute(statement)
+                except Exception as e:
+                    # Neither dialect has IF NOT EXISTS for every index/column; tolerate a
+                    # re-run after a partially applied migration (DDL auto-commits in MySQL)
+                    if not _already_exists(e):
+                        raise
+            cursor.execute(f"INSERT INTO schema_version (version, description) VALUES ({ph}, {ph})",
+                           (number, description))
+            conn.commit()
+            applied.append(number)
+        ensure_admin(conn, dialect)
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        if dialect == 'mysql':
+            cursor.execute("SELECT RELEASE_LOCK(%s)", (_MYSQL_LOCK_NAME,))
+            cursor.fetchall()
+        cursor.close()
+    return applied
+
+
+def ensure_admin(conn, dialect='mysql'):
+    """Create the default admin user if it doesn't exist"""
+    ph = PLACEHOLDER[dialect]
+    cursor = conn.cursor()
+    cursor.execute(f"SELECT id FROM users WHERE username = {ph}", ('admin',))
+    if not cursor.fetchone():
+        admin_password = generate_password_hash('admin123')
+        cursor.execute(f"INSERT INTO users (username, password, role, email) VALUES ({ph}, {ph}, {ph}, {ph})",
+                       ('admin', admin_password, 'admin', 'admin@smartquiz.com'))
+        conn.commit()
+    cursor.close()
@@ -0,0 +1,128 @@
+"""
+SmartQuiz - Session probes answered outside Flask
+/session_status (checked by base.html on back/forward navigation) and the
+/session_check beacon (sent when a page unloads) are answered by a small
+WSGI middleware in front of the Flask app. They never enter Flask's request
+cycle, so they run no before/after_request hooks, no schema bootstrap and no
+database work. The session is validated from the signed cookie alone.
+
+The beacon doubles as a presence signal: users seen by either probe in the
+last few minutes are counted per role for the active-user gauge. Counts are
+per worker process, like the other metrics.
+"""
+
+import json
+import threading
+import time
+
+from itsdangerous import BadSignature
+from werkzeug.http import parse_cookie
+
+NO_CACHE_HEADERS = [
+    ('Cache-Control', 'no-cache, no-store, must-revalidate, max-age=0'),
+    ('Pragma', 'no-cache'),
+    ('Expires', '0'),
+    # Vary by Cookie to prevent intermediaries from serving stale results
+    ('Vary', 'Cookie'),
+]
+
+
+class Presence:
+    """Users seen within the last `window` seconds, by role"""
+
+    def __init__(self, window=300):
+        self.window = window
+        self._seen = {}  # user_id -> (role, last seen)
+        self._lock = threading.Lock()
+        self._next_prune = time.monotonic() + window
+
+    def touch(self, user_id, role):
+        now = time.monotonic()
+        with self._lock:
+            self._seen[user_id] = (role, now)
+            if now >= self._next_prune:
+                self._prune(now)
+
+    def _prune(self, now):
+        cutoff = now - self.window
+        self._seen = {user_id: entry for user_id, entry in self._seen.items() if entry[1] >= cutoff}
+        self._next_prune = now + self.window
+
+    def counts(self):
+        with self._lock:
+            self._prune(time.monotonic())
+            counts = {}
+            for role, _ in self._seen.values():
+                counts[role] = counts.get(role, 0) + 1
+            return counts
+
+
+class SessionProbe:
+    """WSGI middleware that answers the session probes and passes everything else to the app.
+
+    app     -- the Flask app, for its session cookie settings and secret key
+    metrics -- optional Metrics registry; probe requests are counted in its request counter
+    """
+
+    def __init__(self, app, wsgi_app, metrics=None, window=300):
+        self.app = app
+        self.wsgi_app = wsgi_app
+        self.metrics = metrics
+        self.presence = Presence(window)
+        self._serializer = None
+        self._routes = {
+            '/session_status': self.session_status,
+            '/session_check': self.session_check,
+        }
+
+    def __call__(self, environ, start_response):
+        handler = self._routes.get(environ.get('PATH_INFO'))
+        if handler is None:
+            return self.wsgi_app(environ, start_response)
+        status, headers, body = handler(environ)
+        if self.metrics is not None:
+            self.metrics.requests.inc(endpoint=handler.__name__, method=environ.get('REQUEST_METHOD', ''),
+                                      status=int(status.split()[0]))
+        start_response(status, headers + [('Content-Length', str(len(body)))])
+        return [body]
+
+    def _session(self, environ):
+        """The session dict from the signed cookie, or {} if missing, tampered with or expired"""
+        cookie = parse_cookie(environ).get(self.app.config['SESSION_COOKIE_NAME'])
+        if not cookie:
+            return {}
+        if self._serializer is None:
+            self._serializer = self.app.session_interface.get_signing_serializer(self.app)
+            if self._serializer is None:
+                return {}
+        try:
+            return self._serializer.loads(cookie, max_age=int(self.app.permanent_session_lifetime.total_seconds()))
+        except BadSignature:
+            return {}
+
+    def _seen(self, environ):
+        session = self._session(environ)
+        if 'user_id' not in session:
+            return False
+        self.presence.touch(session['user_id'], session.get('role') or 'unknown')
+        return True
+
+    def session_status(self, environ):
+        """200 {"status": "ok"} while the session is valid, else 401 {"status": "expired"}"""
+        if self._seen(environ):
+            status, body = '200 OK', {'status': 'ok'}
+        else:
+            status, body = '401 UNAUTHORIZED', {'status': 'expired'}
+        return status, [('Content-Type', 'application/json')] + NO_CACHE_HEADERS, json.dumps(body).encode()
+
+    def session_check(self, environ):
+        """Presence beacon from navigator.sendBeacon; always 204"""
+        if environ.get('REQUEST_METHOD') != 'POST':
+            return '405 METHOD NOT ALLOWED', [('Allow', 'POST'), ('Content-Type', 'text/plain')], b'Method Not Allowed\n'
+        # The body is just 'active'; read it so the connection can be reused
+        try:
+            environ['wsgi.input'].read(min(int(environ.get('CONTENT_LENGTH') or 0), 1024))
+        except (ValueError, OSError):
+            pass
+        self._seen(environ)
+        return '204 NO CONTENT', NO_CACHE_HEADERS, b''
@@ -80,6 +80,9 @@ except Exception as e:
     exit /b 1
 )
 
+REM Build fingerprinted CSS/JS into static\dist (the app only reads the manifest)
+python assets.py
+
 REM Start application
 echo.
 echo Starting SmartQuiz application...
@@ -82,6 +82,11 @@ else
     exit 1
 fi
 
+# Build fingerprinted CSS/JS into static/dist (the app only reads the manifest)
+echo -e "\n${YELLOW}Building static assets...${NC}"
+python3 assets.py
+echo -e "${GREEN}✓ Assets built${NC}"
+
 # Start application
 echo -e "\n${YELLOW}Starting SmartQuiz application...${NC}"
 echo -e "${GREEN}✓ Application starting on http://localhost:5000${NC}"